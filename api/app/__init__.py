@@ -21,6 +21,11 @@ def create_app(config_class=Config):
         except OperationalError as e:
             app.logger.error(f'❌ Error al conectar con la base de datos: {e}')
 
+    # Los archivos subidos se escriben en un temporal propio mientras se calcula su SHA-256
+    from app.services.upload_stream import HashingRequest
+
+    app.request_class = HashingRequest
+
     ######## Endpoints for login ########
 
     from app.login.controllers.login_controller import users_bp
@@ -33,12 +38,45 @@ def create_app(config_class=Config):
     from app.cameras.controllers.cameras_controller import cameras_bp
     from app.cameras.controllers.alerts_controller import alerts_bp
     from app.cameras.controllers.zones_controller import zones_bp
+    from app.cameras.controllers.dashboard_controller import dashboard_bp
 
     app.register_blueprint(cameras_bp)
     app.register_blueprint(zones_bp)
     app.register_blueprint(alerts_bp)
+    app.register_blueprint(dashboard_bp)
+
+
+    ######## Endpoints for retention ########
+
+    from app.cameras.controllers.retention_controller import retention_bp
+
+    app.register_blueprint(retention_bp)
+
+
+    ######## Endpoints for media (backend de almacenamiento local) ########
+
+    from app.cameras.controllers.media_controller import media_bp
+
+    app.register_blueprint(media_bp)
+
+
+    ######## CLI commands ########
+
+    from app.commands import register_commands
+
+    register_commands(app)
+
+
+    ######## Profiler opt-in ########
+
+    from app.services.profiler import RequestProfiler
+
+    RequestProfiler(app)
+
+    from app.services.query_stats import init_query_stats
+
+    init_query_stats(app, db)
 
- 
 
     
     return app
\ No newline at end of file
@@ -1,22 +1,43 @@
-import multiprocessing
-import tempfile
 import threading
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, current_app, redirect, request, jsonify, send_file, stream_with_context
 from telegram import Bot
 from app import db
 from app.cameras.models.CamerasModel import AlertsModel, CamerasModel, ZonesModel
 from datetime import datetime, timedelta, date
-from sqlalchemy import extract, func
+from sqlalchemy import extract, func, select
 
 from app.login.utils.token import token_required
 
-from app.services.blob_storage import get_blob_sas_url, upload_video_to_blob
-from app.services.telegram_bot import notify_intruder
+from app.services.alert_export import EXPORT_FORMATS, export_alerts, export_statement
+from app.services.alert_serialization import ALERT_JSON_COLUMNS, stream_alert_rows
+from app.services.alert_stats import (
+    HEATMAP_GROUPS, STATS_GRANULARITIES, STATS_METRICS, alert_heatmap, alert_time_series, get_timezone, previous_period
+)
+from app.services.alert_ingest import TEMP_VIDEO_DIR, create_alert_from_file, notify_stored_video
+from app.services.blob_storage import delete_blobs, get_blob_size, get_local_blob_path, iter_blob_range
+from app.services.direct_upload import (
+    UPLOAD_MAX_BYTES, create_upload_session, is_upload_session_expired, lock_upload_session
+)
+from app.services.fast_json import json_response
+from app.services.media_worker import submit_alert_media
+from app.services.tenant_snapshot import find_zone, get_tenant_snapshot
+from app.services.resumable_upload import (
+    RESUMABLE_FINALIZE_TIMEOUT, append_chunk, create_resumable_upload, get_resumable_upload, partial_path,
+    partial_sha256, received_offset, remove_partial
+)
+from app.services.video_cache import get_video_cache
+from app.services.upload_stream import save_upload
+from app.services.video_dedup import (
+    claim_idempotency_key, complete_idempotency_key, releasable_blob_names, release_idempotency_key
+)
 import uuid
 import os
 
 alerts_bp = Blueprint('alerts', __name__)
 
+# Tamaño de cada lectura a Blob Storage al servir rangos que no están en la caché local
+VIDEO_STREAM_CHUNK_BYTES = int(os.getenv("VIDEO_STREAM_CHUNK_BYTES", str(1024 * 1024)))
+
 
 @alerts_bp.route('/alerts', methods=['GET'])
 @token_required
@@ -45,6 +66,15 @@ def get_alerts(current_user):
               video_url:
                 type: string
                 description: URL del video asociado a la alerta
+              poster_url:
+                type: string
+                description: URL de la miniatura (JPEG) del clip, null mientras se genera
+              preview_url:
+                type: string
+                description: URL del preview animado (WebP) del clip, null mientras se genera
+              duration:
+                type: number
+                description: Duración del clip en segundos
               created_at:
                 type: string
                 format: date-time
@@ -63,13 +93,120 @@ def get_alerts(current_user):
         description: No autorizado
     """
     # Obtener todas las cámaras del usuario
-    cameras = CamerasModel.query.filter_by(user_id=current_user.id).all()
+    camera_ids = get_tenant_snapshot(current_user.id).camera_ids
     
     # Obtener todas las alertas de las zonas que pertenecen a las cámaras del usuario
-    alerts = AlertsModel.query.join(ZonesModel).filter(ZonesModel.camera_id.in_([camera.id for camera in cameras])).all()
+    statement = select(*ALERT_JSON_COLUMNS).join(ZonesModel).where(ZonesModel.camera_id.in_(camera_ids))
 
     # Retornar las alertas en formato JSON
-    return jsonify([alert.to_json() for alert in alerts]), 200
+    return stream_alert_rows(statement)
+
+
+@alerts_bp.route('/alerts/export', methods=['GET'])
+@token_required
+def export_alerts_history(current_user):
+    """
+    Exportar el historial de alertas en NDJSON o CSV. La respuesta se transmite por partes mientras se lee la base de datos, sin armarla en memoria.
+    ---
+    tags:
+      - Alerts
+    parameters:
+      - name: format
+        in: query
+        type: string
+        enum: [ndjson, csv]
+        default: ndjson
+        description: Formato de la exportación (una alerta por línea)
+      - name: start_date
+        in: query
+        type: string
+        format: date
+        required: false
+        description: Primer día incluido (YYYY-MM-DD). Por defecto, sin límite.
+      - name: end_date
+        in: query
+        type: string
+        format: date
+        required: false
+        description: Último día incluido (YYYY-MM-DD). Por defecto, sin límite.
+      - name: camera_id
+        in: query
+        type: array
+        items:
+          type: integer
+        collectionFormat: multi
+        required: false
+        description: Solo estas cámaras (se puede repetir)
+      - name: zone_id
+        in: query
+        type: array
+        items:
+          type: integer
+        collectionFormat: multi
+        required: false
+        description: Solo estas zonas (se puede repetir)
+      - name: gzip
+        in: query
+        type: boolean
+        required: false
+        description: Comprimir con gzip (Content-Encoding). Por defecto, si el cliente lo acepta en Accept-Encoding.
+    security:
+      - ApiKeyAuth: []
+    produces:
+      - application/x-ndjson
+      - text/csv
+    responses:
+      200:
+        description: "Alertas en orden cronológico con id, alert_time, camera_id, camera_name, zone_id, zone_type, person_count, duration y video_url"
+      400:
+        description: Parámetros inválidos
+      401:
+        description: No autorizado
+      404:
+        description: Cámara o zona no encontrada o no pertenece al usuario
+    """
+    export_format = request.args.get('format', 'ndjson').lower()
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'message': 'Formato inválido. Usar ndjson o csv'}), 400
+    try:
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+        start = datetime.strptime(start_date, '%Y-%m-%d') if start_date else None
+        end = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1) if end_date else None
+    except ValueError:
+        return jsonify({'message': 'Formato de fecha inválido. Usar YYYY-MM-DD'}), 400
+    try:
+        camera_filter = [int(value) for value in request.args.getlist('camera_id')]
+        zone_filter = [int(value) for value in request.args.getlist('zone_id')]
+    except ValueError:
+        return jsonify({'message': 'camera_id y zone_id deben ser enteros'}), 400
+    if start is not None and end is not None and end <= start:
+        return jsonify({'message': 'La fecha de fin debe ser igual o posterior a la fecha de inicio'}), 400
+
+    # Los filtros se validan contra la configuración en memoria del usuario
+    snapshot = get_tenant_snapshot(current_user.id)
+    for camera_id in camera_filter:
+        if camera_id not in snapshot.cameras:
+            return jsonify({'message': f'Cámara {camera_id} no encontrada'}), 404
+    for zone_id in zone_filter:
+        if zone_id not in snapshot.zones:
+            return jsonify({'message': f'Zona {zone_id} no encontrada'}), 404
+
+    gzip_param = request.args.get('gzip')
+    if gzip_param is None:
+        compress = 'gzip' in request.headers.get('Accept-Encoding', '').lower()
+    else:
+        compress = gzip_param.lower() in ('1', 'true', 'yes')
+
+    statement = export_statement(camera_filter or snapshot.camera_ids, zone_filter, start, end)
+    body = export_alerts(statement, export_format, compress=compress)
+    response = Response(stream_with_context(body), mimetype=EXPORT_FORMATS[export_format])
+    filename = f"alerts_{start_date or 'inicio'}_{end_date or 'hoy'}.{export_format}"
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.headers['Vary'] = 'Accept-Encoding'
+    if compress:
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
 
 
 @alerts_bp.route('/alerts/<int:id>', methods=['GET'])
@@ -119,10 +256,10 @@ def get_alert(current_user, id):
         description: No autorizado
     """
     # Obtener todas las cámaras del usuario
-    cameras = CamerasModel.query.filter_by(user_id=current_user.id).all()
+    camera_ids = get_tenant_snapshot(current_user.id).camera_ids
 
     # Buscar la alerta, asegurándose de que pertenece a una cámara del usuario
-    alert = AlertsModel.query.join(ZonesModel).filter(ZonesModel.camera_id.in_([camera.id for camera in cameras])).filter(AlertsModel.id == id).first()
+    alert = AlertsModel.query.join(ZonesModel).filter(ZonesModel.camera_id.in_(camera_ids)).filter(AlertsModel.id == id).first()
     
     if alert is None:
         return jsonify({'message': 'Alert not found'}), 404
@@ -130,20 +267,91 @@ def get_alert(current_user, id):
     return jsonify(alert.to_json()), 200
 
 
-TEMP_VIDEO_PATH = os.path.join(tempfile.gettempdir(), "intruder_temp.mp4")  # Ruta temporal dinámica para almacenar el video
-# Enviar mensaje de texto a Telegram (sin bloquear)
-def send_telegram_video(path, chat_id):
-    try:
-        notify_intruder(path, chat_id)
-    except Exception as e:
-        # Loguea el error, pero no bloquees la respuesta al usuario
-        print(f"Error al enviar el video por Telegram: {e}")
-    finally:
-        # esto solo se ejecuta cuando notify_intruder cierra el archivo
-        if os.path.exists(path):
-            os.remove(path)
+@alerts_bp.route('/alerts/<int:id>/video', methods=['GET'])
+@token_required
+def stream_alert_video(current_user, id):
+    """
+    Reproducir el video de una alerta, con soporte para solicitudes HTTP Range.
+    ---
+    tags:
+      - Alerts
+    produces:
+      - video/mp4
+    parameters:
+      - name: id
+        in: path
+        type: integer
+        required: true
+        description: ID de la alerta
+      - name: Range
+        in: header
+        type: string
+        required: false
+        description: Rango de bytes (p. ej. bytes=0-1048575)
+    security:
+      - ApiKeyAuth: []
+    responses:
+      200:
+        description: Video completo
+      206:
+        description: Rango parcial del video
+      404:
+        description: Alerta o video no encontrado
+      416:
+        description: Rango no satisfacible
+      401:
+        description: No autorizado
+    """
+    # Obtener todas las cámaras del usuario
+    camera_ids = get_tenant_snapshot(current_user.id).camera_ids
 
+    # Buscar la alerta, asegurándose de que pertenece a una cámara del usuario
+    alert = AlertsModel.query.join(ZonesModel).filter(ZonesModel.camera_id.in_(camera_ids)).filter(AlertsModel.id == id).first()
+
+    if alert is None or not alert.video_url:
+        return jsonify({'message': 'Alert not found'}), 404
+
+    # Alertas antiguas que guardaban la SAS URL completa
+    if alert.video_url.startswith(('http://', 'https://')):
+        return redirect(alert.video_url)
+
+    # En disco (backend local o caché): send_file resuelve Range/If-Range y usa wsgi.file_wrapper (sendfile) si el servidor lo soporta
+    cache = get_video_cache()
+    path = get_local_blob_path(alert.video_url) or cache.get(alert.video_url)
+    if path:
+        response = send_file(path, mimetype='video/mp4', conditional=True, max_age=3600)
+        response.headers['Cache-Control'] = 'private, max-age=3600'
+        return response
+
+    size = get_blob_size(alert.video_url)
+    if size is None:
+        return jsonify({'message': 'Video not found'}), 404
 
+    # Traer el clip completo a la caché en segundo plano; este rango se sirve desde Blob Storage
+    cache.fill_async(alert.video_url)
+
+    byte_range = request.range
+    if byte_range is not None and len(byte_range.ranges) == 1:
+        bounds = byte_range.range_for_length(size)
+        if bounds is None:
+            return Response(status=416, headers={'Content-Range': f'bytes */{size}'})
+        start, stop = bounds
+        status = 206
+    else:
+        start, stop, status = 0, size, 200
+
+    response = Response(
+        iter_blob_range(alert.video_url, start, stop - start, VIDEO_STREAM_CHUNK_BYTES),
+        status=status,
+        mimetype='video/mp4',
+        direct_passthrough=True
+    )
+    response.headers['Accept-Ranges'] = 'bytes'
+    response.headers['Content-Length'] = str(stop - start)
+    response.headers['Cache-Control'] = 'private, max-age=3600'
+    if status == 206:
+        response.headers['Content-Range'] = f'bytes {start}-{stop - 1}/{size}'
+    return response
 
 
 @alerts_bp.route('/alerts', methods=['POST'])
@@ -167,51 +375,431 @@ def create_alert(current_user):
         type: file
         required: true
         description: Archivo de video MP4
+      - name: Idempotency-Key
+        in: header
+        type: string
+        required: false
+        description: Clave única por alerta; los reintentos con la misma clave devuelven la alerta original
     security:
       - ApiKeyAuth: []
     responses:
       201:
-        description: Alerta creada exitosamente
+        description: Alerta creada exitosamente (o reintento, con el header Idempotent-Replayed)
         schema:
           type: object
       400:
         description: Datos inválidos
       401:
         description: No autorizado
+      409:
+        description: Ya hay una solicitud en curso con el mismo Idempotency-Key
     """
+    # Reintento con el mismo Idempotency-Key: devolver la alerta original sin leer el video
+    idempotency_key = request.headers.get('Idempotency-Key')
+    if idempotency_key:
+        if len(idempotency_key) > 255:
+            return jsonify({'message': 'Idempotency-Key inválido'}), 400
+        status, original = claim_idempotency_key(current_user.id, idempotency_key)
+        if status == 'in_progress':
+            return jsonify({'message': 'Ya hay una solicitud en curso con este Idempotency-Key'}), 409
+        if status == 'replay' and original is not None:
+            response = jsonify(original.to_json())
+            response.status_code = 201
+            response.headers['Idempotent-Replayed'] = 'true'
+            return response
+
+    alert_id = None
+    try:
+        response, alert_id = _create_alert(current_user)
+    finally:
+        if idempotency_key:
+            if alert_id is None:
+                release_idempotency_key(current_user.id, idempotency_key)
+            else:
+                complete_idempotency_key(current_user.id, idempotency_key, alert_id)
+    return response
+
+
+# Devuelve (respuesta, id de la alerta creada o None)
+def _create_alert(current_user):
     if 'video' not in request.files or 'zone_id' not in request.form:
-        return jsonify({'message': 'Datos inválidos'}), 400
+        return (jsonify({'message': 'Datos inválidos'}), 400), None
 
     video_file = request.files['video']
     zone_id = request.form['zone_id']
     
-    zone = ZonesModel.query.filter_by(id=zone_id).first()
+    # Solo zonas de las cámaras del usuario; la alerta se crea con la fila actual de la zona
+    zone = find_zone(current_user.id, zone_id)
+    zone = db.session.get(ZonesModel, zone['id']) if zone else None
 
+    if not zone:
+        return (jsonify({'message': 'Zona no encontrada'}), 404), None
+
+    # Guardar el video temporalmente (una ruta por solicitud); el SHA-256 se calcula mientras se recibe
+    temp_path = os.path.join(TEMP_VIDEO_DIR, f"intruder_{uuid.uuid4().hex}.mp4")
+    content_hash, _ = save_upload(video_file, temp_path)
+
+    try:
+        alert = create_alert_from_file(current_user.id, zone, temp_path, content_hash)
+    finally:
+        os.remove(temp_path)
+
+    return (jsonify(alert.to_json()), 201), alert.id
+
+
+@alerts_bp.route('/alerts/uploads', methods=['POST'])
+@token_required
+def create_upload(current_user):
+    """
+    Iniciar una subida directa: devuelve una URL firmada de solo escritura para subir el clip al almacenamiento sin pasar por la API.
+    ---
+    tags:
+      - Alerts
+    parameters:
+      - name: body
+        in: body
+        required: true
+        schema:
+          type: object
+          properties:
+            zone_id:
+              type: integer
+              description: ID de la zona asociada a la alerta
+            content_type:
+              type: string
+              default: video/mp4
+    security:
+      - ApiKeyAuth: []
+    responses:
+      201:
+        description: Sesión creada; subir el clip con upload.method a upload.url enviando upload.headers y luego confirmar
+        schema:
+          type: object
+          properties:
+            upload_id:
+              type: string
+            blob_name:
+              type: string
+            expires_at:
+              type: string
+            upload:
+              type: object
+      400:
+        description: Datos inválidos
+      404:
+        description: Zona no encontrada
+    """
+    data = request.get_json(silent=True) or request.form
+    zone_id = data.get('zone_id')
+    content_type = data.get('content_type') or 'video/mp4'
+    if zone_id is None:
+        return jsonify({'message': 'Datos inválidos'}), 400
+
+    zone = find_zone(current_user.id, zone_id)
     if not zone:
         return jsonify({'message': 'Zona no encontrada'}), 404
 
-    # Guardar el video temporalmente
-    video_file.save(TEMP_VIDEO_PATH)
+    session, target = create_upload_session(current_user.id, zone['id'], content_type)
+    return jsonify({**session.to_json(), 'upload': target}), 201
 
 
-    process = multiprocessing.Process(target=send_telegram_video, args=(TEMP_VIDEO_PATH, zone.alert_telegram))
-    process.start()
+@alerts_bp.route('/alerts/uploads/<string:upload_id>/complete', methods=['POST'])
+@token_required
+def complete_upload(current_user, upload_id):
+    """
+    Confirmar una subida directa: verifica que el clip esté en el almacenamiento, crea la alerta y envía las notificaciones.
+    ---
+    tags:
+      - Alerts
+    parameters:
+      - name: upload_id
+        in: path
+        type: string
+        required: true
+    security:
+      - ApiKeyAuth: []
+    responses:
+      201:
+        description: Alerta creada (o reintento de una subida ya confirmada, con el header Idempotent-Replayed)
+      404:
+        description: Subida no encontrada o vencida
+      409:
+        description: El clip todavía no se subió
+      413:
+        description: El clip supera el tamaño máximo
+    """
+    session = lock_upload_session(current_user.id, upload_id)
+    if session is None or (session.status == 'pending' and is_upload_session_expired(session)):
+        db.session.rollback()
+        return jsonify({'message': 'Subida no encontrada'}), 404
 
-    # Sube a blob y crea la alerta en base de datos
-    blob_name = upload_video_to_blob(TEMP_VIDEO_PATH, current_user.id)
-    
-    # Obtener SAS Url del video subido
-    if blob_name:
-        blob_url = get_blob_sas_url(blob_name)
-    else:
-        blob_url = ""
-    
-    alert = AlertsModel(zone_id=zone_id, video_url=blob_url)
+    # Reintento de una confirmación ya procesada: devolver la misma alerta
+    if session.status == 'completed':
+        alert = db.session.get(AlertsModel, session.alert_id) if session.alert_id else None
+        db.session.rollback()
+        if alert is None:
+            return jsonify({'message': 'Alerta no encontrada'}), 404
+        response = jsonify(alert.to_json())
+        response.status_code = 201
+        response.headers['Idempotent-Replayed'] = 'true'
+        return response
+
+    blob_name = session.blob_name
+    size = get_blob_size(blob_name)
+    if not size:
+        db.session.rollback()
+        return jsonify({'message': 'El video todavía no se subió'}), 409
+    if size > UPLOAD_MAX_BYTES:
+        db.session.delete(session)
+        db.session.commit()
+        delete_blobs([blob_name])
+        return jsonify({'message': 'El video supera el tamaño máximo'}), 413
+
+    zone = db.session.get(ZonesModel, session.zone_id)
+    alert = AlertsModel(zone_id=session.zone_id, video_url=blob_name)
     db.session.add(alert)
+    db.session.flush()
+    session.status = 'completed'
+    session.alert_id = alert.id
+    db.session.commit()
+
+    # El clip nunca pasó por este proceso: Telegram y el media worker lo leen del almacenamiento
+    notify_stored_video(blob_name, zone.alert_telegram)
+    submit_alert_media(current_app._get_current_object(), alert.id, blob_name)
+
+    return jsonify(alert.to_json()), 201
+
+
+def _resumable_headers(response, upload, offset):
+    response.headers['Upload-Offset'] = str(offset)
+    response.headers['Upload-Length'] = str(upload.upload_length)
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+@alerts_bp.route('/alerts/resumable', methods=['POST'])
+@token_required
+def create_resumable_upload_route(current_user):
+    """
+    Iniciar una subida por partes de un clip (para enlaces inestables): luego enviar los bytes con PATCH y finalizar.
+    ---
+    tags:
+      - Alerts
+    parameters:
+      - name: Upload-Length
+        in: header
+        type: integer
+        required: true
+        description: Tamaño total del clip en bytes
+      - name: body
+        in: body
+        required: true
+        schema:
+          type: object
+          properties:
+            zone_id:
+              type: integer
+    security:
+      - ApiKeyAuth: []
+    responses:
+      201:
+        description: Subida creada; Location apunta al recurso de la subida y Upload-Offset es 0
+      400:
+        description: Datos inválidos
+      404:
+        description: Zona no encontrada
+      413:
+        description: El clip supera el tamaño máximo
+    """
+    data = request.get_json(silent=True) or request.form
+    zone_id = data.get('zone_id')
+    try:
+        upload_length = int(request.headers.get('Upload-Length', data.get('upload_length')))
+    except (TypeError, ValueError):
+        return jsonify({'message': 'Datos inválidos'}), 400
+    if zone_id is None or upload_length <= 0:
+        return jsonify({'message': 'Datos inválidos'}), 400
+    if upload_length > UPLOAD_MAX_BYTES:
+        return jsonify({'message': 'El video supera el tamaño máximo'}), 413
+
+    zone = find_zone(current_user.id, zone_id)
+    if not zone:
+        return jsonify({'message': 'Zona no encontrada'}), 404
+
+    upload = create_resumable_upload(current_user.id, zone['id'], upload_length)
+    response = jsonify(upload.to_json())
+    response.status_code = 201
+    response.headers['Location'] = f"/alerts/resumable/{upload.id}"
+    return _resumable_headers(response, upload, 0)
+
+
+@alerts_bp.route('/alerts/resumable/<string:upload_id>', methods=['HEAD'])
+@token_required
+def get_resumable_upload_offset(current_user, upload_id):
+    """
+    Consultar cuántos bytes de la subida ya recibió el servidor (header Upload-Offset), para retomarla tras un corte.
+    ---
+    tags:
+      - Alerts
+    parameters:
+      - name: upload_id
+        in: path
+        type: string
+        required: true
+    security:
+      - ApiKeyAuth: []
+    responses:
+      200:
+        description: Upload-Offset y Upload-Length en los headers
+      404:
+        description: Subida no encontrada
+    """
+    upload = get_resumable_upload(current_user.id, upload_id)
+    offset = received_offset(upload) if upload is not None else None
+    if offset is None:
+        return '', 404
+    return _resumable_headers(Response(status=200), upload, offset)
+
+
+@alerts_bp.route('/alerts/resumable/<string:upload_id>', methods=['PATCH'])
+@token_required
+def patch_resumable_upload(current_user, upload_id):
+    """
+    Enviar una parte del clip a partir de Upload-Offset (cuerpo application/offset+octet-stream).
+    ---
+    tags:
+      - Alerts
+    consumes:
+      - application/offset+octet-stream
+    parameters:
+      - name: upload_id
+        in: path
+        type: string
+        required: true
+      - name: Upload-Offset
+        in: header
+        type: integer
+        required: true
+        description: Offset en el que empieza esta parte; debe coincidir con lo ya recibido
+    security:
+      - ApiKeyAuth: []
+    responses:
+      204:
+        description: Parte recibida; Upload-Offset indica el nuevo offset
+      404:
+        description: Subida no encontrada
+      409:
+        description: Upload-Offset no coincide con lo recibido (o la subida ya se finalizó, u otro PATCH está en curso)
+      413:
+        description: La parte excede Upload-Length
+      415:
+        description: Content-Type distinto de application/offset+octet-stream
+    """
+    upload = get_resumable_upload(current_user.id, upload_id)
+    if upload is None:
+        return jsonify({'message': 'Subida no encontrada'}), 404
+    if upload.status != 'pending':
+        return jsonify({'message': 'La subida ya se finalizó'}), 409
+    if request.mimetype != 'application/offset+octet-stream':
+        return jsonify({'message': 'Content-Type debe ser application/offset+octet-stream'}), 415
+
+    try:
+        offset = int(request.headers['Upload-Offset'])
+    except (KeyError, ValueError):
+        return jsonify({'message': 'Upload-Offset inválido'}), 400
+    if offset + (request.content_length or 0) > upload.upload_length:
+        return jsonify({'message': 'La parte excede Upload-Length'}), 413
+
+    status, current = append_chunk(upload, offset, request.stream)
+    if status == 'missing':
+        return jsonify({'message': 'Subida no encontrada'}), 404
+    if status == 'locked':
+        return jsonify({'message': 'Ya hay otra parte de esta subida en curso'}), 409
+    if status == 'conflict':
+        response = jsonify({'message': 'Upload-Offset no coincide con lo recibido'})
+        response.status_code = 409
+        return _resumable_headers(response, upload, current)
+    return _resumable_headers(Response(status=204), upload, current)
+
+
+@alerts_bp.route('/alerts/resumable/<string:upload_id>/finalize', methods=['POST'])
+@token_required
+def finalize_resumable_upload(current_user, upload_id):
+    """
+    Finalizar una subida por partes completa: crea la alerta con el mismo flujo que POST /alerts.
+    ---
+    tags:
+      - Alerts
+    parameters:
+      - name: upload_id
+        in: path
+        type: string
+        required: true
+    security:
+      - ApiKeyAuth: []
+    responses:
+      201:
+        description: Alerta creada (o reintento de una subida ya finalizada, con el header Idempotent-Replayed)
+      404:
+        description: Subida o zona no encontrada
+      409:
+        description: Faltan bytes por recibir (ver Upload-Offset) o la subida se está finalizando
+    """
+    upload = get_resumable_upload(current_user.id, upload_id, lock=True)
+    if upload is None:
+        db.session.rollback()
+        return jsonify({'message': 'Subida no encontrada'}), 404
+
+    if upload.status == 'completed':
+        alert = db.session.get(AlertsModel, upload.alert_id) if upload.alert_id else None
+        db.session.rollback()
+        if alert is None:
+            return jsonify({'message': 'Alerta no encontrada'}), 404
+        response = jsonify(alert.to_json())
+        response.status_code = 201
+        response.headers['Idempotent-Replayed'] = 'true'
+        return response
+    # Un 'finalizing' más viejo que RESUMABLE_FINALIZE_TIMEOUT quedó de un proceso caído: se retoma
+    if upload.status == 'finalizing' and upload.updated_at >= datetime.utcnow() - RESUMABLE_FINALIZE_TIMEOUT:
+        db.session.rollback()
+        return jsonify({'message': 'La subida se está finalizando'}), 409
+
+    offset = received_offset(upload)
+    if offset != upload.upload_length:
+        db.session.rollback()
+        response = jsonify({'message': 'Faltan bytes por recibir'})
+        response.status_code = 409 if offset is not None else 404
+        return _resumable_headers(response, upload, offset or 0)
+
+    # Reservar la subida: un finalize concurrente recibe 409 en lugar de duplicar la alerta
+    upload.status = 'finalizing'
+    upload.updated_at = datetime.utcnow()
+    db.session.commit()
+
+    zone = db.session.get(ZonesModel, upload.zone_id)
+    if zone is None:
+        # La zona se eliminó después de reservar la subida: ya no hay dónde crear la alerta
+        db.session.delete(upload)
+        db.session.commit()
+        remove_partial(upload_id)
+        return jsonify({'message': 'Zona no encontrada'}), 404
+
+    try:
+        alert = create_alert_from_file(current_user.id, zone, partial_path(upload.id), partial_sha256(upload))
+    except Exception:
+        db.session.rollback()
+        upload.status = 'pending'
+        db.session.commit()
+        raise
+
+    upload.status = 'completed'
+    upload.alert_id = alert.id
     db.session.commit()
+    remove_partial(upload.id)
 
     return jsonify(alert.to_json()), 201
 
+
 @alerts_bp.route('/alerts/<int:id>', methods=['DELETE'])
 @token_required
 def delete_alert(current_user, id):
@@ -237,22 +825,273 @@ def delete_alert(current_user, id):
         description: No autorizado
     """
     # Obtener todas las cámaras del usuario
-    cameras = CamerasModel.query.filter_by(user_id=current_user.id).all()
+    camera_ids = get_tenant_snapshot(current_user.id).camera_ids
 
     # Buscar la alerta y verificar que pertenece a una cámara del usuario
-    alert = AlertsModel.query.join(ZonesModel).filter(ZonesModel.camera_id.in_([camera.id for camera in cameras])).filter(AlertsModel.id == id).first()
+    alert = AlertsModel.query.join(ZonesModel).filter(ZonesModel.camera_id.in_(camera_ids)).filter(AlertsModel.id == id).first()
 
     # Verificar si la alerta fue encontrada
     if alert is None:
         return jsonify({'message': 'Alert not found or does not belong to your cameras'}), 404
 
-    # Eliminar la alerta
+    # Eliminar la alerta y, ya confirmado el borrado, su video y derivados (si otra alerta
+    # no reutiliza el mismo clip)
+    blob_group = (alert.video_url, alert.blob_names())
     db.session.delete(alert)
     db.session.commit()
+    delete_blobs(releasable_blob_names([blob_group]))
 
     return jsonify({'message': 'Alert deleted'}), 200
 
 
+def _stats_params(current_user):
+    """
+    Parámetros comunes de las estadísticas por zona horaria: tz, start_date y end_date
+    (días locales, por defecto los últimos 30 días hasta hoy) y los filtros camera_id y
+    zone_id, validados contra la configuración en memoria del usuario. Devuelve
+    ((tz, start_date, end_date, camera_filter, zone_filter, snapshot), None) o
+    (None, respuesta de error).
+    """
+    try:
+        tz = get_timezone(request.args.get('tz', 'UTC'))
+    except ValueError as e:
+        return None, (jsonify({'message': str(e)}), 400)
+    try:
+        today = datetime.now(tz).date()
+        start_date = datetime.strptime(request.args['start_date'], '%Y-%m-%d').date() if 'start_date' in request.args else today - timedelta(days=30)
+        end_date = datetime.strptime(request.args['end_date'], '%Y-%m-%d').date() if 'end_date' in request.args else today
+    except ValueError:
+        return None, (jsonify({'message': 'Formato de fecha inválido. Usar YYYY-MM-DD'}), 400)
+    if end_date < start_date:
+        return None, (jsonify({'message': 'La fecha de fin debe ser igual o posterior a la fecha de inicio'}), 400)
+    try:
+        camera_filter = [int(value) for value in request.args.getlist('camera_id')]
+        zone_filter = [int(value) for value in request.args.getlist('zone_id')]
+    except ValueError:
+        return None, (jsonify({'message': 'camera_id y zone_id deben ser enteros'}), 400)
+
+    snapshot = get_tenant_snapshot(current_user.id)
+    for camera_id in camera_filter:
+        if camera_id not in snapshot.cameras:
+            return None, (jsonify({'message': f'Cámara {camera_id} no encontrada'}), 404)
+    for zone_id in zone_filter:
+        if zone_id not in snapshot.zones:
+            return None, (jsonify({'message': f'Zona {zone_id} no encontrada'}), 404)
+    return (tz, start_date, end_date, camera_filter, zone_filter, snapshot), None
+
+
+@alerts_bp.route('/stats/timeseries', methods=['GET'])
+@token_required
+def get_alert_time_series(current_user):
+    """
+    Serie temporal de alertas con la granularidad, zona horaria y métricas indicadas. Los intervalos sin alertas se completan con 0 en la misma consulta.
+    ---
+    tags:
+      - Stats
+    parameters:
+      - name: start_date
+        in: query
+        type: string
+        format: date
+        required: false
+        description: Primer día local incluido (YYYY-MM-DD). Por defecto es hace 30 días.
+      - name: end_date
+        in: query
+        type: string
+        format: date
+        required: false
+        description: Último día local incluido (YYYY-MM-DD). Por defecto es hoy.
+      - name: granularity
+        in: query
+        type: string
+        enum: [minute, hour, day, week, month]
+        default: day
+        description: Tamaño de cada intervalo (las semanas empiezan el lunes)
+      - name: tz
+        in: query
+        type: string
+        default: UTC
+        description: Zona horaria IANA del cliente (por ejemplo America/Argentina/Buenos_Aires)
+      - name: metrics
+        in: query
+        type: string
+        default: alerts
+        description: "Métricas separadas por coma: alerts (cantidad de alertas), persons (suma de personas), max_persons (máximo de personas en una alerta)"
+      - name: camera_id
+        in: query
+        type: array
+        items:
+          type: integer
+        collectionFormat: multi
+        required: false
+        description: Solo estas cámaras (se puede repetir)
+      - name: zone_id
+        in: query
+        type: array
+        items:
+          type: integer
+        collectionFormat: multi
+        required: false
+        description: Solo estas zonas (se puede repetir)
+    security:
+      - ApiKeyAuth: []
+    responses:
+      200:
+        description: Intervalos en orden, con su inicio en hora local (ISO 8601 con desplazamiento) y una clave por métrica
+        schema:
+          type: object
+          properties:
+            granularity:
+              type: string
+            timezone:
+              type: string
+            metrics:
+              type: array
+              items:
+                type: string
+            buckets:
+              type: array
+              items:
+                type: object
+                properties:
+                  bucket:
+                    type: string
+                    format: date-time
+                    description: Inicio del intervalo
+      400:
+        description: Parámetros inválidos o demasiados intervalos para el rango
+      401:
+        description: No autorizado
+      404:
+        description: Cámara o zona no encontrada o no pertenece al usuario
+    """
+    params, error = _stats_params(current_user)
+    if error:
+        return error
+    tz, start_date, end_date, camera_filter, zone_filter, snapshot = params
+    granularity = request.args.get('granularity', 'day')
+    if granularity not in STATS_GRANULARITIES:
+        return jsonify({'message': f"Granularidad inválida. Usar {', '.join(STATS_GRANULARITIES)}"}), 400
+    metrics = [metric.strip() for metric in request.args.get('metrics', 'alerts').split(',') if metric.strip()]
+    if not metrics or any(metric not in STATS_METRICS for metric in metrics):
+        return jsonify({'message': f"Métricas inválidas. Usar {', '.join(STATS_METRICS)}"}), 400
+
+    try:
+        series = alert_time_series(
+            camera_filter or snapshot.camera_ids, start_date, end_date, granularity, tz, metrics, zone_filter
+        )
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    return json_response({
+        'granularity': granularity,
+        'timezone': tz.key,
+        'metrics': metrics,
+        'buckets': [dict(zip(['bucket', *metrics], (bucket.isoformat(), *values))) for bucket, *values in series],
+    })
+
+
+@alerts_bp.route('/stats/heatmap', methods=['GET'])
+@token_required
+def get_alert_heatmap(current_user):
+    """
+    Mapa de calor día de la semana × hora de alertas y personas por cámara o zona, con la comparación contra el período anterior de igual largo. Reemplaza combinar hourly-distribution y daily-count en el cliente.
+    ---
+    tags:
+      - Stats
+    parameters:
+      - name: start_date
+        in: query
+        type: string
+        format: date
+        required: false
+        description: Primer día local incluido (YYYY-MM-DD). Por defecto es hace 30 días.
+      - name: end_date
+        in: query
+        type: string
+        format: date
+        required: false
+        description: Último día local incluido (YYYY-MM-DD). Por defecto es hoy.
+      - name: tz
+        in: query
+        type: string
+        default: UTC
+        description: Zona horaria IANA del cliente, en la que se toman el día y la hora
+      - name: group_by
+        in: query
+        type: string
+        enum: [camera, zone]
+        default: camera
+        description: Un mapa por cámara o por zona
+      - name: compare
+        in: query
+        type: boolean
+        default: true
+        description: Incluir el período anterior (los mismos días inmediatamente antes de start_date) y la variación
+      - name: camera_id
+        in: query
+        type: array
+        items:
+          type: integer
+        collectionFormat: multi
+        required: false
+        description: Solo estas cámaras (se puede repetir)
+      - name: zone_id
+        in: query
+        type: array
+        items:
+          type: integer
+        collectionFormat: multi
+        required: false
+        description: Solo estas zonas (se puede repetir)
+    security:
+      - ApiKeyAuth: []
+    responses:
+      200:
+        description: "Por grupo y en summary (todos los grupos): alerts y persons como matrices de 7 filas (lunes a domingo) por 24 horas, total_alerts y total_persons; con compare, previous con lo mismo del período anterior y change con la variación porcentual de los totales (null si el período anterior no tiene alertas)"
+      400:
+        description: Parámetros inválidos
+      401:
+        description: No autorizado
+      404:
+        description: Cámara o zona no encontrada o no pertenece al usuario
+    """
+    params, error = _stats_params(current_user)
+    if error:
+        return error
+    tz, start_date, end_date, camera_filter, zone_filter, snapshot = params
+    group_by = request.args.get('group_by', 'camera')
+    if group_by not in HEATMAP_GROUPS:
+        return jsonify({'message': f"Agrupación inválida. Usar {', '.join(HEATMAP_GROUPS)}"}), 400
+    compare = request.args.get('compare', 'true').lower() in ('1', 'true', 'yes')
+
+    # Grupos a devolver, también los que no tienen alertas
+    camera_ids = camera_filter or snapshot.camera_ids
+    zones = [
+        zone for zone in snapshot.zones.values()
+        if zone['camera_id'] in camera_ids and (not zone_filter or zone['id'] in zone_filter)
+    ]
+    if group_by == 'zone':
+        group_ids = [zone['id'] for zone in zones]
+    else:
+        group_ids = sorted({zone['camera_id'] for zone in zones}) if zone_filter else camera_ids
+
+    heatmap = alert_heatmap(group_by, group_ids, camera_ids, start_date, end_date, tz, zone_filter, compare)
+    if group_by == 'zone':
+        for group in heatmap['groups']:
+            group['camera_id'] = snapshot.zones[group['zone_id']]['camera_id']
+    response_data = {
+        'timezone': tz.key,
+        'group_by': group_by,
+        'period': {'start_date': start_date.isoformat(), 'end_date': end_date.isoformat()},
+        **heatmap,
+    }
+    if compare:
+        previous_start, previous_end = previous_period(start_date, end_date)
+        response_data['previous_period'] = {'start_date': previous_start.isoformat(), 'end_date': previous_end.isoformat()}
+    return json_response(response_data)
+
+
 @alerts_bp.route('/stats/daily-count', methods=['GET'])
 @token_required
 def get_daily_alert_count(current_user):
@@ -274,6 +1113,11 @@ def get_daily_alert_count(current_user):
         format: date
         required: false
         description: Fecha de fin (formato YYYY-MM-DD). Por defecto es hoy.
+      - name: tz
+        in: query
+        type: string
+        default: UTC
+        description: Zona horaria IANA en la que se cuentan los días
     security:
       - ApiKeyAuth: []
     responses:
@@ -297,6 +1141,10 @@ def get_daily_alert_count(current_user):
         description: No autorizado
     """
     # Obtener parámetros de la solicitud
+    try:
+        tz = get_timezone(request.args.get('tz', 'UTC'))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     try:
         start_date_str = request.args.get('start_date', (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d'))
         end_date_str = request.args.get('end_date', datetime.now().strftime('%Y-%m-%d'))
@@ -311,37 +1159,14 @@ def get_daily_alert_count(current_user):
         return jsonify({'message': 'Formato de fecha inválido. Usar YYYY-MM-DD'}), 400
     
     # Obtener todas las cámaras del usuario
-    cameras = CamerasModel.query.filter_by(user_id=current_user.id).all()
-    camera_ids = [camera.id for camera in cameras]
-    
-    # Obtener todas las alertas por día
-    result = db.session.query(
-        func.date(AlertsModel.alert_time).label('date'),
-        func.count(AlertsModel.id).label('count')
-    ).join(ZonesModel).filter(
-        ZonesModel.camera_id.in_(camera_ids),
-        func.date(AlertsModel.alert_time) >= start_date,
-        func.date(AlertsModel.alert_time) <= end_date
-    ).group_by(
-        func.date(AlertsModel.alert_time)
-    ).order_by(
-        func.date(AlertsModel.alert_time)
-    ).all()
-    
-    # Crear un diccionario para almacenar resultados, incluyendo días sin alertas
-    daily_counts = {}
-    current_date = start_date
-    while current_date <= end_date:
-        daily_counts[current_date.strftime('%Y-%m-%d')] = 0
-        current_date += timedelta(days=1)
-    
-    # Llenar con datos reales
-    for date_obj, count in result:
-        date_str = date_obj.strftime('%Y-%m-%d')
-        daily_counts[date_str] = count
+    camera_ids = get_tenant_snapshot(current_user.id).camera_ids
     
-    # Convertir a lista para la respuesta JSON
-    response_data = [{'date': date_str, 'count': count} for date_str, count in daily_counts.items()]
+    # Conteo por día local, con los días sin alertas ya completados por la base de datos
+    try:
+        series = alert_time_series(camera_ids, start_date, end_date, 'day', tz, ('alerts',))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    response_data = [{'date': bucket.strftime('%Y-%m-%d'), 'count': count} for bucket, count in series]
     
     return jsonify(response_data), 200
 
@@ -379,17 +1204,16 @@ def get_alerts_by_day(current_user, date):
         return jsonify({'message': 'Formato de fecha inválido. Usar YYYY-MM-DD'}), 400
     
     # Obtener todas las cámaras del usuario
-    cameras = CamerasModel.query.filter_by(user_id=current_user.id).all()
-    camera_ids = [camera.id for camera in cameras]
+    camera_ids = get_tenant_snapshot(current_user.id).camera_ids
     
     # Obtener alertas del día específico
-    alerts = AlertsModel.query.join(ZonesModel).filter(
+    statement = select(*ALERT_JSON_COLUMNS).join(ZonesModel).where(
         ZonesModel.camera_id.in_(camera_ids),
         AlertsModel.alert_time >= datetime.combine(target_date, datetime.min.time()),
         AlertsModel.alert_time < datetime.combine(next_date, datetime.min.time())
-    ).all()
+    )
     
-    return jsonify([alert.to_json() for alert in alerts]), 200
+    return stream_alert_rows(statement)
 
 
 @alerts_bp.route('/stats/person-count', methods=['GET'])
@@ -413,6 +1237,11 @@ def get_daily_person_count(current_user):
         format: date
         required: false
         description: Fecha de fin (formato YYYY-MM-DD). Por defecto es hoy.
+      - name: tz
+        in: query
+        type: string
+        default: UTC
+        description: Zona horaria IANA en la que se cuentan los días
     security:
       - ApiKeyAuth: []
     responses:
@@ -436,6 +1265,10 @@ def get_daily_person_count(current_user):
         description: No autorizado
     """
     # Obtener parámetros de la solicitud
+    try:
+        tz = get_timezone(request.args.get('tz', 'UTC'))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     try:
         start_date_str = request.args.get('start_date', (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d'))
         end_date_str = request.args.get('end_date', datetime.now().strftime('%Y-%m-%d'))
@@ -450,37 +1283,14 @@ def get_daily_person_count(current_user):
         return jsonify({'message': 'Formato de fecha inválido. Usar YYYY-MM-DD'}), 400
     
     # Obtener todas las cámaras del usuario
-    cameras = CamerasModel.query.filter_by(user_id=current_user.id).all()
-    camera_ids = [camera.id for camera in cameras]
-    
-    # Obtener el conteo diario de personas
-    result = db.session.query(
-        func.date(AlertsModel.alert_time).label('date'),
-        func.sum(AlertsModel.person_count).label('count')
-    ).join(ZonesModel).filter(
-        ZonesModel.camera_id.in_(camera_ids),
-        func.date(AlertsModel.alert_time) >= start_date,
-        func.date(AlertsModel.alert_time) <= end_date
-    ).group_by(
-        func.date(AlertsModel.alert_time)
-    ).order_by(
-        func.date(AlertsModel.alert_time)
-    ).all()
-    
-    # Crear un diccionario para almacenar resultados, incluyendo días sin alertas
-    daily_counts = {}
-    current_date = start_date
-    while current_date <= end_date:
-        daily_counts[current_date.strftime('%Y-%m-%d')] = 0
-        current_date += timedelta(days=1)
-    
-    # Llenar con datos reales
-    for date_obj, count in result:
-        date_str = date_obj.strftime('%Y-%m-%d')
-        daily_counts[date_str] = count
+    camera_ids = get_tenant_snapshot(current_user.id).camera_ids
     
-    # Convertir a lista para la respuesta JSON
-    response_data = [{'date': date_str, 'count': count} for date_str, count in daily_counts.items()]
+    # Conteo por día local, con los días sin personas ya completados por la base de datos
+    try:
+        series = alert_time_series(camera_ids, start_date, end_date, 'day', tz, ('persons',))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    response_data = [{'date': bucket.strftime('%Y-%m-%d'), 'count': count} for bucket, count in series]
     
     return jsonify(response_data), 200
 
@@ -548,8 +1358,7 @@ def get_alerts_by_zone(current_user):
         return jsonify({'message': 'Formato de fecha inválido. Usar YYYY-MM-DD'}), 400
     
     # Obtener todas las cámaras del usuario
-    cameras = CamerasModel.query.filter_by(user_id=current_user.id).all()
-    camera_ids = [camera.id for camera in cameras]
+    camera_ids = get_tenant_snapshot(current_user.id).camera_ids
     
     # Obtener alertas agrupadas por zona
     result = db.session.query(
@@ -639,8 +1448,7 @@ def get_hourly_distribution(current_user):
         return jsonify({'message': 'Formato de fecha inválido. Usar YYYY-MM-DD'}), 400
     
     # Obtener todas las cámaras del usuario
-    cameras = CamerasModel.query.filter_by(user_id=current_user.id).all()
-    camera_ids = [camera.id for camera in cameras]
+    camera_ids = get_tenant_snapshot(current_user.id).camera_ids
     
     # Obtener la distribución de alertas por hora
     result = db.session.query(
@@ -2,6 +2,8 @@ from flask import Blueprint, request, jsonify
 from app import db
 from app.cameras.models.CamerasModel import CamerasModel
 from app.login.utils.token import token_required
+from app.services.fast_json import json_response
+from app.services.tenant_snapshot import find_camera, get_tenant_snapshot, invalidate_tenant
 
 from cryptography.fernet import Fernet
 import os
@@ -39,8 +41,8 @@ def get_cameras(current_user):
       401:
         description: No autorizado
     """
-    cameras = CamerasModel.query.filter_by(user_id=current_user.id).all()
-    return jsonify([camera.to_json() for camera in cameras]), 200
+    cameras = get_tenant_snapshot(current_user.id).cameras.values()
+    return json_response(list(cameras))
 
 
 @cameras_bp.route('/cameras/<int:id>', methods=['GET'])
@@ -69,13 +71,13 @@ def get_camera(current_user, id):
       401:
         description: No autorizado
     """
-    # Filtrar la cámara por id y user_id del usuario actual
-    camera = CamerasModel.query.filter_by(id=id, user_id=current_user.id).first()
+    # Filtrar la cámara por id entre las del usuario actual
+    camera = find_camera(current_user.id, id)
 
     if not camera:
         return jsonify({'error': 'Cámara no encontrada o no pertenece al usuario.'}), 404
 
-    return jsonify(camera.to_json()), 200
+    return jsonify(camera), 200
 
 
 @cameras_bp.route('/cameras', methods=['POST'])
@@ -142,6 +144,7 @@ def create_camera(current_user):
     )
     db.session.add(camera)
     db.session.commit()
+    invalidate_tenant(current_user.id)
     return jsonify(camera.to_json()), 201
 
 
@@ -212,6 +215,7 @@ def update_camera(current_user, id):
     camera.location = data.get('location', camera.location)
     camera.status = data.get('status', camera.status)
     db.session.commit()
+    invalidate_tenant(current_user.id)
     return jsonify(camera.to_json()), 200
 
 
@@ -250,5 +254,6 @@ def delete_camera(current_user, id):
     # Eliminar la cámara
     db.session.delete(camera)
     db.session.commit()
+    invalidate_tenant(current_user.id)
     return jsonify({'message': 'Cámara eliminada exitosamente.'}), 200
 
@@ -0,0 +1,105 @@
+from datetime import datetime
+from flask import Blueprint, request, jsonify
+from sqlalchemy import select, true
+from app import db
+from app.cameras.models.CamerasModel import AlertsModel, ZonesModel
+from app.login.utils.token import token_required
+from app.services.alert_serialization import ALERT_JSON_COLUMNS, alert_rows_to_json
+from app.services.alert_stats import get_timezone, zone_alert_counts
+from app.services.fast_json import json_response
+from app.services.tenant_snapshot import get_tenant_snapshot
+
+dashboard_bp = Blueprint('dashboard', __name__)
+
+
+# Última alerta de cada zona: un LIMIT 1 por zona sobre idx_alerts_zone_time (zone_id,
+# alert_time), que lee una entrada del índice por zona sin importar cuántas alertas tenga
+def latest_zone_alerts(zone_ids):
+    latest = select(*ALERT_JSON_COLUMNS).where(AlertsModel.zone_id == ZonesModel.id).order_by(
+        AlertsModel.alert_time.desc(), AlertsModel.id.desc()
+    ).limit(1).lateral('latest')
+    statement = select(*latest.c).select_from(ZonesModel).join(latest, true()).where(ZonesModel.id.in_(zone_ids))
+    return {alert['zone_id']: alert for alert in alert_rows_to_json(db.session.execute(statement).all())}
+
+
+@dashboard_bp.route('/dashboard', methods=['GET'])
+@token_required
+def get_dashboard(current_user):
+    """
+    Datos iniciales del panel en una sola solicitud: cámaras con sus zonas, la última alerta de cada zona y los conteos de hoy. Reemplaza llamar a /cameras, /zones, /alerts y /stats/* al cargar.
+    ---
+    tags:
+      - Dashboard
+    parameters:
+      - name: tz
+        in: query
+        type: string
+        default: UTC
+        description: Zona horaria IANA del cliente, que define el día de hoy
+    security:
+      - ApiKeyAuth: []
+    responses:
+      200:
+        description: "cameras (como en /cameras) con zones (como en /zones), cada zona con latest_alert (como en /alerts, null si no tiene) y today; today con alerts y persons por zona, por cámara y en total"
+        schema:
+          type: object
+          properties:
+            timezone:
+              type: string
+            date:
+              type: string
+              format: date
+              description: Día de hoy en la zona horaria indicada
+            today:
+              type: object
+              properties:
+                alerts:
+                  type: integer
+                persons:
+                  type: integer
+            cameras:
+              type: array
+              items:
+                type: object
+      400:
+        description: Zona horaria inválida
+      401:
+        description: No autorizado
+    """
+    try:
+        tz = get_timezone(request.args.get('tz', 'UTC'))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    today = datetime.now(tz).date()
+
+    # Cámaras y zonas salen de la configuración en memoria; la base de datos se consulta
+    # dos veces, sin importar cuántas cámaras o zonas tenga el usuario
+    snapshot = get_tenant_snapshot(current_user.id)
+    zone_ids = list(snapshot.zones)
+    latest_alerts = latest_zone_alerts(zone_ids) if zone_ids else {}
+    today_counts = zone_alert_counts(zone_ids, today, today, tz) if zone_ids else {}
+
+    cameras = []
+    total_alerts = total_persons = 0
+    for camera_id, camera in snapshot.cameras.items():
+        zones = []
+        camera_alerts = camera_persons = 0
+        for zone in snapshot.camera_zones(camera_id):
+            alerts, persons = today_counts.get(zone['id'], (0, 0))
+            camera_alerts += alerts
+            camera_persons += persons
+            zones.append({
+                **zone,
+                'latest_alert': latest_alerts.get(zone['id']),
+                'today': {'alerts': alerts, 'persons': persons},
+            })
+        total_alerts += camera_alerts
+        total_persons += camera_persons
+        cameras.append({**camera, 'zones': zones, 'today': {'alerts': camera_alerts, 'persons': camera_persons}})
+
+    return json_response({
+        'timezone': tz.key,
+        'date': today.isoformat(),
+        'today': {'alerts': total_alerts, 'persons': total_persons},
+        'cameras': cameras,
+    })
@@ -0,0 +1,124 @@
+import mimetypes
+from datetime import datetime, timezone
+from flask import Blueprint, redirect, request, jsonify, send_file
+from app.services.blob_storage import get_storage, upload_stream_to_blob
+from app.services.direct_upload import UPLOAD_MAX_BYTES
+
+media_bp = Blueprint('media', __name__)
+
+
+@media_bp.route('/media/<path:blob_name>', methods=['GET'])
+def get_media(blob_name):
+    """
+    Servir un archivo del backend de almacenamiento local (URL firmada, equivalente a una SAS URL).
+    ---
+    tags:
+      - Media
+    parameters:
+      - name: blob_name
+        in: path
+        type: string
+        required: true
+      - name: se
+        in: query
+        type: integer
+        required: true
+        description: Expiración (epoch en segundos)
+      - name: sig
+        in: query
+        type: string
+        required: true
+        description: Firma HMAC del nombre y la expiración
+    responses:
+      200:
+        description: Contenido del archivo (admite Range)
+      302:
+        description: Archivo desalojado del disco local, redirige a Blob Storage (backend tiered)
+      206:
+        description: Rango parcial del archivo
+      403:
+        description: Firma inválida o vencida
+      404:
+        description: Archivo no encontrado
+    """
+    storage = get_storage()
+    if not hasattr(storage, 'verify_signature'):
+        return jsonify({'message': 'Not found'}), 404
+
+    if not storage.verify_signature(blob_name, request.args.get('se'), request.args.get('sig')):
+        return jsonify({'message': 'Invalid or expired signature'}), 403
+
+    path = storage.local_path(blob_name)
+    if path is None:
+        # Backend tiered: el archivo ya se desalojó del disco, seguir en Blob Storage
+        if hasattr(storage, 'fallback_url'):
+            expiry = datetime.fromtimestamp(int(request.args['se']), timezone.utc)
+            return redirect(storage.fallback_url(blob_name, expiry))
+        return jsonify({'message': 'Not found'}), 404
+
+    # send_file resuelve Range/If-Range y usa wsgi.file_wrapper (sendfile) si el servidor lo soporta
+    mimetype = mimetypes.guess_type(blob_name)[0] or 'application/octet-stream'
+    response = send_file(path, mimetype=mimetype, conditional=True, max_age=3600)
+    response.headers['Cache-Control'] = 'private, max-age=3600'
+    return response
+
+
+@media_bp.route('/media/<path:blob_name>', methods=['PUT'])
+def put_media(blob_name):
+    """
+    Subida directa de un clip al backend de almacenamiento local (URL de escritura de POST /alerts/uploads).
+    ---
+    tags:
+      - Media
+    consumes:
+      - application/octet-stream
+      - video/mp4
+    parameters:
+      - name: blob_name
+        in: path
+        type: string
+        required: true
+      - name: se
+        in: query
+        type: integer
+        required: true
+        description: Expiración (epoch en segundos)
+      - name: sp
+        in: query
+        type: string
+        required: true
+        description: Permiso de la firma (w)
+      - name: sig
+        in: query
+        type: string
+        required: true
+        description: Firma HMAC del nombre, la expiración y el permiso
+    responses:
+      201:
+        description: Archivo guardado
+      403:
+        description: Firma inválida o vencida
+      411:
+        description: Falta Content-Length
+      413:
+        description: El archivo supera el tamaño máximo
+    """
+    storage = get_storage()
+    if not hasattr(storage, 'verify_signature'):
+        return jsonify({'message': 'Not found'}), 404
+
+    if request.args.get('sp') != 'w' or not storage.verify_signature(
+            blob_name, request.args.get('se'), request.args.get('sig'), permission='w'):
+        return jsonify({'message': 'Invalid or expired signature'}), 403
+
+    if request.content_length is None:
+        return jsonify({'message': 'Content-Length required'}), 411
+    if request.content_length > UPLOAD_MAX_BYTES:
+        return jsonify({'message': 'File too large'}), 413
+
+    # El cuerpo se copia por chunks al almacenamiento, sin pasar por un archivo temporal de Werkzeug
+    content_type = request.mimetype or mimetypes.guess_type(blob_name)[0] or 'application/octet-stream'
+    size = upload_stream_to_blob(request.stream, blob_name, content_type)
+    if size is None:
+        return jsonify({'message': 'Error al guardar el archivo'}), 500
+    return jsonify({'blob_name': blob_name, 'size': size}), 201
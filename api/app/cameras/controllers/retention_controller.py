@@ -0,0 +1,134 @@
+from flask import Blueprint, request, jsonify
+from app import db
+from app.cameras.models.RetentionModel import RetentionPoliciesModel
+from app.login.utils.token import token_required
+from app.services.retention_worker import RETENTION_DEFAULT_DAYS
+from app.services.tenant_snapshot import find_zone
+
+retention_bp = Blueprint('retention', __name__)
+
+
+@retention_bp.route('/retention', methods=['GET'])
+@token_required
+def get_retention_policies(current_user):
+    """
+    Obtener las políticas de retención del usuario autenticado.
+    ---
+    tags:
+      - Retention
+    security:
+      - ApiKeyAuth: []
+    responses:
+      200:
+        description: Retención general del usuario y por zona (en días)
+        examples:
+          application/json:
+            default_days: 90
+            user_days: 30
+            zones:
+              - zone_id: 5
+                retention_days: 7
+      401:
+        description: No autorizado
+    """
+    policies = RetentionPoliciesModel.query.filter_by(user_id=current_user.id).all()
+    user_policy = next((policy for policy in policies if policy.zone_id is None), None)
+
+    return jsonify({
+        'default_days': RETENTION_DEFAULT_DAYS or None,
+        'user_days': user_policy.retention_days if user_policy else None,
+        'zones': [policy.to_json() for policy in policies if policy.zone_id is not None]
+    }), 200
+
+
+@retention_bp.route('/retention', methods=['PUT'])
+@token_required
+def set_retention_policy(current_user):
+    """
+    Definir la retención del usuario (sin zone_id) o de una de sus zonas.
+    ---
+    tags:
+      - Retention
+    security:
+      - ApiKeyAuth: []
+    parameters:
+      - name: body
+        in: body
+        required: true
+        schema:
+          type: object
+          properties:
+            retention_days:
+              type: integer
+              description: Días que se conservan las alertas y sus videos
+            zone_id:
+              type: integer
+              description: Zona a la que aplica (opcional)
+    responses:
+      200:
+        description: Política guardada
+      400:
+        description: Datos inválidos
+      401:
+        description: No autorizado
+      404:
+        description: Zona no encontrada o no pertenece al usuario
+    """
+    data = request.json or {}
+    retention_days = data.get('retention_days')
+    zone_id = data.get('zone_id')
+
+    # bool es subclase de int: true no debe guardarse como una política de 1 día
+    if isinstance(retention_days, bool) or not isinstance(retention_days, int) or retention_days < 1:
+        return jsonify({'error': 'retention_days debe ser un entero mayor a 0'}), 400
+    if isinstance(zone_id, bool):
+        return jsonify({'error': 'zone_id debe ser un entero'}), 400
+
+    if zone_id is not None:
+        zone = find_zone(current_user.id, zone_id)
+        if not zone:
+            return jsonify({'error': f'Zone {zone_id} not found or not authorized'}), 404
+
+    policy = RetentionPoliciesModel.query.filter_by(user_id=current_user.id, zone_id=zone_id).first()
+    if policy is None:
+        policy = RetentionPoliciesModel(user_id=current_user.id, zone_id=zone_id, retention_days=retention_days)
+        db.session.add(policy)
+    else:
+        policy.retention_days = retention_days
+    db.session.commit()
+
+    return jsonify(policy.to_json()), 200
+
+
+@retention_bp.route('/retention', methods=['DELETE'])
+@token_required
+def delete_retention_policy(current_user):
+    """
+    Eliminar la retención del usuario o de una zona (query param zone_id).
+    ---
+    tags:
+      - Retention
+    security:
+      - ApiKeyAuth: []
+    parameters:
+      - name: zone_id
+        in: query
+        type: integer
+        required: false
+        description: Zona cuya política se elimina; sin este parámetro se elimina la del usuario
+    responses:
+      200:
+        description: Política eliminada
+      404:
+        description: Política no encontrada
+      401:
+        description: No autorizado
+    """
+    zone_id = request.args.get('zone_id', type=int)
+    policy = RetentionPoliciesModel.query.filter_by(user_id=current_user.id, zone_id=zone_id).first()
+    if not policy:
+        return jsonify({'error': 'Retention policy not found'}), 404
+
+    db.session.delete(policy)
+    db.session.commit()
+    return jsonify({'message': 'Retention policy deleted'}), 200
@@ -1,7 +1,14 @@
-from flask import Blueprint, request, jsonify, g
+from flask import Blueprint, abort, request, jsonify, g
 from app import db
 from app.cameras.models.CamerasModel import ZonesModel, CamerasModel
 from app.login.utils.token import token_required
+from app.services.zone_geometry import apply_zone_geometry
+from app.services.zone_index import geometry_from_json, get_zone_index, invalidate_zone_index
+from app.services.fast_json import json_response
+from app.services.tenant_snapshot import find_camera, find_zone, get_tenant_snapshot, invalidate_tenant
+
+# Relaciones admitidas entre la geometría consultada y cada zona (predicados de STRtree)
+ZONE_QUERY_PREDICATES = ('intersects', 'contains', 'contains_properly', 'within', 'covers', 'covered_by', 'overlaps', 'touches')
 
 zones_bp = Blueprint('zones', __name__)
 
@@ -92,11 +99,11 @@ def get_zones(current_user):
 
     print("Current User ID:", current_user.id)  # Debugging line
 
-    # Filtrar las zonas relacionadas con las cámaras del usuario
-    zones = ZonesModel.query.join(CamerasModel).filter(CamerasModel.user_id == current_user.id).all()
+    # Zonas de las cámaras del usuario, desde su configuración en memoria
+    zones = list(get_tenant_snapshot(current_user.id).zones.values())
 
     print("Zona:", zones)
-    return jsonify([zone.to_json() for zone in zones]), 200
+    return json_response(zones)
 
 @zones_bp.route('/camera/zones/<int:camera_id>', methods=['GET'])
 @token_required
@@ -142,8 +149,215 @@ def get_camera_zones(current_user, camera_id):
         description: Cámara no encontrada o no pertenece al usuario
     """
     # Filtrar las zonas relacionadas con las cámaras del usuario
-    zones = ZonesModel.query.join(CamerasModel).filter(CamerasModel.user_id == current_user.id, ZonesModel.camera_id == camera_id).all()
-    return jsonify([zone.to_json() for zone in zones]), 200
+    return json_response(get_tenant_snapshot(current_user.id).camera_zones(camera_id))
+
+def _user_camera(current_user, camera_id):
+    return find_camera(current_user.id, camera_id)
+
+
+@zones_bp.route('/camera/zones/<int:camera_id>/query', methods=['POST'])
+@token_required
+def query_camera_zones(current_user, camera_id):
+    """
+    Zonas de la cámara que intersecan (o cumplen otro predicado con) una caja o un polígono.
+    ---
+    tags:
+      - Zones
+    parameters:
+      - name: camera_id
+        in: path
+        type: integer
+        required: true
+        description: ID de la cámara
+      - name: body
+        in: body
+        required: true
+        schema:
+          type: object
+          properties:
+            bbox:
+              type: array
+              description: "[x1, y1, x2, y2] en píxeles de la cámara"
+              items:
+                type: number
+            polygon:
+              type: array
+              description: Puntos {x, y} en píxeles de la cámara (alternativa a bbox)
+              items:
+                type: object
+            predicate:
+              type: string
+              description: "Relación de la geometría consultada con cada zona: intersects (por defecto), contains, contains_properly, within, covers, covered_by, overlaps o touches"
+        examples:
+          application/json:
+            bbox: [100, 80, 240, 300]
+    security:
+      - ApiKeyAuth: []
+    responses:
+      200:
+        description: Zonas que cumplen el predicado, con el área en común
+        examples:
+          application/json:
+            zones:
+              - zone_id: 3
+                intersection_area: 5400.0
+                zone_area: 22000.0
+      400:
+        description: Geometría o predicado inválidos
+      401:
+        description: No autorizado
+      404:
+        description: Cámara no encontrada o no pertenece al usuario
+    """
+    data = request.get_json(silent=True) or {}
+    predicate = data.get('predicate', 'intersects')
+    if predicate not in ZONE_QUERY_PREDICATES:
+        return jsonify({'error': f'predicate debe ser uno de {", ".join(ZONE_QUERY_PREDICATES)}'}), 400
+    try:
+        geometry = geometry_from_json(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if not _user_camera(current_user, camera_id):
+        return jsonify({'error': f'Camera {camera_id} not found or not authorized'}), 404
+
+    index = get_zone_index(camera_id)
+    return jsonify({'zones': [
+        {'zone_id': zone_id, 'intersection_area': area, 'zone_area': index.area(zone_id)}
+        for zone_id, area in index.query(geometry, predicate)
+    ]}), 200
+
+
+@zones_bp.route('/camera/zones/<int:camera_id>/overlaps', methods=['GET'])
+@token_required
+def get_camera_zone_overlaps(current_user, camera_id):
+    """
+    Pares de zonas de la cámara que se superponen y el área que comparten.
+    ---
+    tags:
+      - Zones
+    parameters:
+      - name: camera_id
+        in: path
+        type: integer
+        required: true
+        description: ID de la cámara
+      - name: min_area
+        in: query
+        type: number
+        required: false
+        description: Ignorar superposiciones de hasta esta área (píxeles²)
+    security:
+      - ApiKeyAuth: []
+    responses:
+      200:
+        description: Superposiciones; ratio_a y ratio_b son la fracción de cada zona que cubre la otra
+        examples:
+          application/json:
+            overlaps:
+              - zone_a: 3
+                zone_b: 7
+                area: 5400.0
+                ratio_a: 0.25
+                ratio_b: 0.9
+      400:
+        description: min_area inválido
+      401:
+        description: No autorizado
+      404:
+        description: Cámara no encontrada o no pertenece al usuario
+    """
+    min_area = request.args.get('min_area', 0, type=float)
+    if min_area is None or min_area < 0:
+        return jsonify({'error': 'min_area debe ser un número no negativo'}), 400
+    if not _user_camera(current_user, camera_id):
+        return jsonify({'error': f'Camera {camera_id} not found or not authorized'}), 404
+
+    index = get_zone_index(camera_id)
+    overlaps = []
+    for zone_a, zone_b, area in index.overlaps(min_area):
+        area_a, area_b = index.area(zone_a), index.area(zone_b)
+        overlaps.append({
+            'zone_a': zone_a,
+            'zone_b': zone_b,
+            'area': area,
+            'ratio_a': area / area_a if area_a else 0.0,
+            'ratio_b': area / area_b if area_b else 0.0
+        })
+    return jsonify({'overlaps': overlaps}), 200
+
+
+@zones_bp.route('/camera/zones/<int:camera_id>/resolve', methods=['POST'])
+@token_required
+def resolve_camera_zone(current_user, camera_id):
+    """
+    Zona principal de una detección: la más chica que contiene el punto de apoyo (centro del
+    borde inferior de la caja) o, si ninguna lo contiene, la de mayor área en común con la caja.
+    Es la misma regla con que los workers de cámaras evitan alertas duplicadas en zonas
+    superpuestas.
+    ---
+    tags:
+      - Zones
+    parameters:
+      - name: camera_id
+        in: path
+        type: integer
+        required: true
+        description: ID de la cámara
+      - name: body
+        in: body
+        required: true
+        schema:
+          type: object
+          properties:
+            box:
+              type: array
+              description: "Caja de la detección [x1, y1, x2, y2]"
+              items:
+                type: number
+            point:
+              type: object
+              description: Punto {x, y} (alternativa a box)
+            zone_ids:
+              type: array
+              description: Limitar a estas zonas (por ejemplo, las activas en su horario)
+              items:
+                type: integer
+        examples:
+          application/json:
+            box: [120, 60, 180, 260]
+    security:
+      - ApiKeyAuth: []
+    responses:
+      200:
+        description: Zona principal (null si la detección no cae en ninguna) y candidatas
+        examples:
+          application/json:
+            zone_id: 7
+            candidates: [3, 7]
+      400:
+        description: Falta box o point, o son inválidos
+      401:
+        description: No autorizado
+      404:
+        description: Cámara no encontrada o no pertenece al usuario
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        if data.get('box') is not None:
+            x1, y1, x2, y2 = (float(value) for value in data['box'])
+            coords = (x1, y1, x2, y2)
+        elif data.get('point') is not None:
+            coords = (float(data['point']['x']), float(data['point']['y']))
+        else:
+            return jsonify({'error': 'Se requiere box o point'}), 400
+        zone_ids = None if data.get('zone_ids') is None else {int(zone_id) for zone_id in data['zone_ids']}
+    except (TypeError, KeyError, ValueError):
+        return jsonify({'error': 'box debe ser [x1, y1, x2, y2], point {x, y} y zone_ids una lista de enteros'}), 400
+    if not _user_camera(current_user, camera_id):
+        return jsonify({'error': f'Camera {camera_id} not found or not authorized'}), 404
+
+    zone_id, candidates = get_zone_index(camera_id).primary_zone(*coords, zone_ids=zone_ids)
+    return jsonify({'zone_id': zone_id, 'candidates': candidates}), 200
 
 @zones_bp.route('/zones/<int:id>', methods=['GET'])
 @token_required
@@ -223,8 +437,10 @@ def get_zone(current_user, id):
         description: Zona no encontrada o no pertenece al usuario
     """
     # Filtrar la zona por el `id` y asegurarse de que pertenece a una cámara del usuario
-    zone = ZonesModel.query.join(CamerasModel).filter(ZonesModel.id == id, CamerasModel.user_id == current_user.id).first_or_404()
-    return jsonify(zone.to_json()), 200
+    zone = find_zone(current_user.id, id)
+    if zone is None:
+        abort(404)
+    return jsonify(zone), 200
 
 @zones_bp.route('/zones', methods=['POST'])
 @token_required
@@ -343,7 +559,7 @@ def create_zones(current_user):
           items:
             type: object
       400:
-        description: Datos inválidos
+        description: Datos inválidos o coordenadas que no forman un polígono válido
       401:
         description: No autorizado
       404:
@@ -358,7 +574,7 @@ def create_zones(current_user):
     for zone_data in data['zones']:
         camera_id = zone_data.get('id')
         # Verificar que la cámara pertenece al usuario
-        camera = CamerasModel.query.filter_by(id=camera_id, user_id=current_user.id).first()
+        camera = find_camera(current_user.id, camera_id)
         if not camera:
             return jsonify({'error': f'Camera {camera_id} not found or not authorized'}), 404
 
@@ -372,10 +588,18 @@ def create_zones(current_user):
             alert_telegram=zone_data.get('alertTelegram'),
             alert_email=zone_data.get('alertEmail'),
         )
+        try:
+            apply_zone_geometry(zone, zone_data.get('coords'))
+        except ValueError as e:
+            db.session.rollback()
+            return jsonify({'error': f'Invalid coords for camera {camera_id}: {e}'}), 400
         db.session.add(zone)
         created_zones.append(zone)
 
     db.session.commit()
+    for camera_id in {zone.camera_id for zone in created_zones}:
+        invalidate_zone_index(camera_id)
+    invalidate_tenant(current_user.id)
     return jsonify([zone.to_json() for zone in created_zones]), 201
 
 @zones_bp.route('/zones/<int:id>', methods=['PUT'])
@@ -421,6 +645,8 @@ def update_zone(current_user, id):
         description: Zona actualizada exitosamente
         schema:
           type: object
+      400:
+        description: Coordenadas inválidas (sin área o con lados que se cruzan)
       401:
         description: No autorizado
       404:
@@ -429,7 +655,11 @@ def update_zone(current_user, id):
     # Asegurarse de que la zona pertenece a una cámara del usuario
     zone = ZonesModel.query.join(CamerasModel).filter(ZonesModel.id == id, CamerasModel.user_id == current_user.id).first_or_404()
     data = request.json
-    zone.coords = data.get('coords', zone.coords)
+    if 'coords' in data:
+        try:
+            apply_zone_geometry(zone, data['coords'])
+        except ValueError as e:
+            return jsonify({'error': f'Invalid coords: {e}'}), 400
     zone.type = data.get('type', zone.type)
     zone.alert_threshold = data.get('alert_threshold', zone.alert_threshold)
     zone.schedule_start = data.get('schedule_start', zone.schedule_start)
@@ -437,6 +667,8 @@ def update_zone(current_user, id):
     zone.alert_telegram = data.get('alert_telegram', zone.alert_telegram)
     zone.alert_email = data.get('alert_email', zone.alert_email)
     db.session.commit()
+    invalidate_zone_index(zone.camera_id)
+    invalidate_tenant(current_user.id)
     return jsonify(zone.to_json()), 200
 
 @zones_bp.route('/zones/<int:id>', methods=['DELETE'])
@@ -467,6 +699,9 @@ def delete_zone(current_user, id):
     """
     # Asegurarse de que la zona pertenece a una cámara del usuario
     zone = ZonesModel.query.join(CamerasModel).filter(ZonesModel.id == id, CamerasModel.user_id == current_user.id).first_or_404()
+    camera_id = zone.camera_id
     db.session.delete(zone)
     db.session.commit()
+    invalidate_zone_index(camera_id)
+    invalidate_tenant(current_user.id)
     return jsonify({'message': 'Zone deleted'}), 200
@@ -1,4 +1,6 @@
 from app import db
+from app.services.blob_storage import get_blob_sas_urls
+from app.services.fast_json import utc_isoformat
 from datetime import datetime, timezone
 
 
@@ -48,6 +50,14 @@ class ZonesModel(db.Model):
     schedule_end = db.Column(db.Time, nullable=False)
     alert_telegram = db.Column(db.String(255), nullable=True)
     alert_email = db.Column(db.String(255), nullable=True)
+    # Derivadas de coords al guardar (zone_geometry): caja envolvente, área en píxeles² y
+    # vértices, para descartar por caja antes de evaluar el polígono
+    bbox_min_x = db.Column(db.Float, nullable=True)
+    bbox_min_y = db.Column(db.Float, nullable=True)
+    bbox_max_x = db.Column(db.Float, nullable=True)
+    bbox_max_y = db.Column(db.Float, nullable=True)
+    area = db.Column(db.Float, nullable=True)
+    vertex_count = db.Column(db.Integer, nullable=True)
 
     alerts = db.relationship('AlertsModel', backref='zone', cascade="all, delete", lazy=True)
 
@@ -64,9 +74,17 @@ class ZonesModel(db.Model):
             'schedule_start': self.schedule_start.isoformat() if self.schedule_start else None,
             'schedule_end': self.schedule_end.isoformat() if self.schedule_end else None,
             'alert_telegram': self.alert_telegram,
-            'alert_email': self.alert_email
+            'alert_email': self.alert_email,
+            'bbox': self.bbox(),
+            'area': self.area,
+            'vertex_count': self.vertex_count
         }
 
+    def bbox(self):
+        if self.bbox_min_x is None:
+            return None
+        return [self.bbox_min_x, self.bbox_min_y, self.bbox_max_x, self.bbox_max_y]
+
 
 class AlertsModel(db.Model):
     __tablename__ = 'alerts'
@@ -74,20 +92,44 @@ class AlertsModel(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     zone_id = db.Column(db.Integer, db.ForeignKey('zones.id', ondelete="CASCADE"), nullable=False)
     alert_time = db.Column(db.DateTime, default=datetime.now, nullable=False)
-    video_url = db.Column(db.String(255), nullable=False)
+    video_url = db.Column(db.String(255), nullable=False, index=True)  # Nombre del blob; la SAS URL se firma al leer
     person_count = db.Column(db.Integer, default=1, nullable=False)
 
+    # Derivados generados por el media worker (poster, preview animado y metadata del clip)
+    poster_blob = db.Column(db.String(255), nullable=True)
+    preview_blob = db.Column(db.String(255), nullable=True)
+    duration = db.Column(db.Float, nullable=True)
+    fps = db.Column(db.Float, nullable=True)
+    width = db.Column(db.Integer, nullable=True)
+    height = db.Column(db.Integer, nullable=True)
+
+    # SHA-256 del clip: los reintentos con el mismo video reutilizan el blob existente
+    content_hash = db.Column(db.String(64), nullable=True, index=True)
+
     def __repr__(self):
         return f'<Alert {self.id}>'
 
-    def to_json(self):
+    def blob_names(self):
+        return [name for name in (self.video_url, self.poster_blob, self.preview_blob) if name]
+
+    def to_json(self, signed_urls=None):
         
-        alert_time_str = self.alert_time.isoformat() + "Z"  # Z indica UTC
+        alert_time_str = utc_isoformat(self.alert_time)  # Z indica UTC
+
+        # signed_urls: {blob_name: sas_url} firmado en lote para una página de alertas
+        if signed_urls is None:
+            signed_urls = get_blob_sas_urls(self.blob_names())
         
         return {
             'id': self.id,
             'zone_id': self.zone_id,
             'alert_time': alert_time_str,
-            'video_url': self.video_url,
+            'video_url': signed_urls.get(self.video_url, self.video_url),
+            'poster_url': signed_urls.get(self.poster_blob) if self.poster_blob else None,
+            'preview_url': signed_urls.get(self.preview_blob) if self.preview_blob else None,
+            'duration': self.duration,
+            'fps': self.fps,
+            'width': self.width,
+            'height': self.height,
             'person_count': self.person_count
         }
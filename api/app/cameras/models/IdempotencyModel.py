@@ -0,0 +1,15 @@
+from app import db
+from datetime import datetime
+
+
+class IdempotencyKeysModel(db.Model):
+    __tablename__ = 'idempotency_keys'
+
+    # Header Idempotency-Key de POST /alerts: un reintento con la misma clave devuelve la alerta original
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete="CASCADE"), primary_key=True)
+    key = db.Column(db.String(255), primary_key=True)
+    alert_id = db.Column(db.Integer, db.ForeignKey('alerts.id', ondelete="CASCADE"), nullable=True)  # NULL mientras se procesa
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f'<IdempotencyKey {self.user_id}:{self.key} alert={self.alert_id}>'
@@ -0,0 +1,44 @@
+from app import db
+from datetime import datetime
+
+
+class RetentionPoliciesModel(db.Model):
+    __tablename__ = 'retention_policies'
+
+    # Política por usuario (zone_id NULL) o por zona; la de zona tiene prioridad
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete="CASCADE"), nullable=False)
+    zone_id = db.Column(db.Integer, db.ForeignKey('zones.id', ondelete="CASCADE"), nullable=True)
+    retention_days = db.Column(db.Integer, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<RetentionPolicy user={self.user_id} zone={self.zone_id} days={self.retention_days}>'
+
+    def to_json(self):
+        return {
+            'zone_id': self.zone_id,
+            'retention_days': self.retention_days,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+
+class JobCheckpointsModel(db.Model):
+    __tablename__ = 'job_checkpoints'
+
+    # Progreso de los trabajos de mantenimiento para poder reanudarlos
+    job = db.Column(db.String(50), primary_key=True)
+    cursor = db.Column(db.BigInteger, nullable=False, default=0)
+    state = db.Column(db.JSON, nullable=False, default=dict)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<JobCheckpoint {self.job} cursor={self.cursor}>'
+
+    def to_json(self):
+        return {
+            'job': self.job,
+            'cursor': self.cursor,
+            'state': self.state,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
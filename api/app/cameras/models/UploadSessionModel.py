@@ -0,0 +1,59 @@
+from app import db
+from datetime import datetime
+
+
+class UploadSessionsModel(db.Model):
+    __tablename__ = 'upload_sessions'
+
+    # Subida directa al almacenamiento: el detector sube el clip a blob_name con una URL
+    # firmada y luego confirma; la confirmación crea la alerta
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete="CASCADE"), nullable=False)
+    zone_id = db.Column(db.Integer, db.ForeignKey('zones.id', ondelete="CASCADE"), nullable=False)
+    blob_name = db.Column(db.String(255), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending | completed
+    alert_id = db.Column(db.Integer, db.ForeignKey('alerts.id', ondelete="SET NULL"), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<UploadSession {self.id} {self.status}>'
+
+    def to_json(self):
+        return {
+            'upload_id': self.id,
+            'zone_id': self.zone_id,
+            'blob_name': self.blob_name,
+            'status': self.status,
+            'alert_id': self.alert_id,
+            'expires_at': self.expires_at.isoformat() + 'Z'
+        }
+
+
+class ResumableUploadsModel(db.Model):
+    __tablename__ = 'resumable_uploads'
+
+    # Subida por partes (PATCH con Upload-Offset); los bytes recibidos quedan en disco
+    # y se retoma desde upload_offset tras un corte
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete="CASCADE"), nullable=False)
+    zone_id = db.Column(db.Integer, db.ForeignKey('zones.id', ondelete="CASCADE"), nullable=False)
+    upload_length = db.Column(db.BigInteger, nullable=False)
+    upload_offset = db.Column(db.BigInteger, nullable=False, default=0)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending | finalizing | completed
+    alert_id = db.Column(db.Integer, db.ForeignKey('alerts.id', ondelete="SET NULL"), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<ResumableUpload {self.id} {self.upload_offset}/{self.upload_length}>'
+
+    def to_json(self):
+        return {
+            'upload_id': self.id,
+            'zone_id': self.zone_id,
+            'upload_length': self.upload_length,
+            'upload_offset': self.upload_offset,
+            'status': self.status,
+            'alert_id': self.alert_id
+        }
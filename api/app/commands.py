@@ -0,0 +1,165 @@
+import json
+import time
+
+import click
+from flask.cli import AppGroup
+
+
+######## Trabajos de mantenimiento (flask --app app <grupo> <comando>) ########
+
+retention_cli = AppGroup('retention', help='Retención de alertas y sus videos.')
+
+
+@retention_cli.command('purge')
+@click.option('--batch-size', type=int, default=None, help='Alertas eliminadas por transacción.')
+@click.option('--max-batches', type=int, default=None, help='Detenerse después de N lotes (se reanuda en la próxima ejecución).')
+@click.option('--loop', is_flag=True, help='Repetir indefinidamente cada --interval segundos.')
+@click.option('--interval', type=int, default=3600, help='Segundos entre pasadas con --loop.')
+def retention_purge(batch_size, max_batches, loop, interval):
+    """Eliminar alertas vencidas según las políticas de retención."""
+    from app.services.retention_worker import RETENTION_BATCH_SIZE, purge_expired_alerts
+
+    while True:
+        state = purge_expired_alerts(batch_size=batch_size or RETENTION_BATCH_SIZE, max_batches=max_batches)
+        click.echo(json.dumps(state, indent=2))
+        if not loop:
+            break
+        time.sleep(interval)
+
+
+@retention_cli.command('status')
+def retention_status():
+    """Mostrar el progreso de la pasada de retención."""
+    from app.services.retention_worker import get_retention_status
+
+    click.echo(json.dumps(get_retention_status(), indent=2))
+
+
+storage_cli = AppGroup('storage', help='Inspección del contenedor de videos.')
+
+
+@storage_cli.command('ls')
+@click.argument('user_id', type=int)
+@click.option('--day', type=click.DateTime(formats=['%Y-%m-%d']), default=None, help='Solo los videos de ese día.')
+@click.option('--limit', type=int, default=None, help='Cantidad máxima de blobs a mostrar.')
+def storage_ls(user_id, day, limit):
+    """Listar los videos de un usuario (paginado, sin cargar todo el contenedor)."""
+    from itertools import islice
+    from app.services.blob_storage import iter_videos_in_blob
+
+    for blob in islice(iter_videos_in_blob(user_id, day.date() if day else None), limit):
+        click.echo(f"{blob.name}\t{blob.size}")
+
+
+@storage_cli.command('summary')
+@click.argument('user_id', type=int)
+@click.option('--start', type=click.DateTime(formats=['%Y-%m-%d']), default=None)
+@click.option('--end', type=click.DateTime(formats=['%Y-%m-%d']), default=None)
+def storage_summary(user_id, start, end):
+    """Cantidad de videos y bytes por día de un usuario."""
+    from app.services.blob_storage import summarize_videos_by_day
+
+    summary = summarize_videos_by_day(user_id, start.date() if start else None, end.date() if end else None)
+    click.echo(json.dumps(summary, indent=2))
+
+
+@storage_cli.command('offload')
+@click.option('--batch-size', type=int, default=100, help='Archivos subidos por pasada.')
+@click.option('--workers', type=int, default=4, help='Subidas en paralelo.')
+@click.option('--force', is_flag=True, help='Subir aunque se esté fuera de TIER_OFFLOAD_HOURS.')
+@click.option('--loop', is_flag=True, help='Repetir indefinidamente cada --interval segundos.')
+@click.option('--interval', type=int, default=60, help='Segundos entre pasadas con --loop.')
+def storage_offload(batch_size, workers, force, loop, interval):
+    """Backend tiered: subir a Blob Storage lo que está solo en disco y desalojar lo ya subido."""
+    from app.services.blob_storage import get_storage
+
+    storage = get_storage()
+    if not hasattr(storage, 'offload'):
+        raise click.ClickException('STORAGE_BACKEND no es tiered.')
+
+    while True:
+        # Vaciar la cola por lotes mientras haya pendientes
+        while storage.offload(batch_size=batch_size, max_workers=workers, force=force) > 0:
+            pass
+        storage.evict()
+        if not loop:
+            click.echo(json.dumps(storage.stats(), indent=2))
+            break
+        time.sleep(interval)
+
+
+@storage_cli.command('tiers')
+def storage_tiers():
+    """Backend tiered: archivos y bytes por nivel."""
+    from app.services.blob_storage import get_storage
+
+    storage = get_storage()
+    if not hasattr(storage, 'stats'):
+        raise click.ClickException('STORAGE_BACKEND no es tiered.')
+    click.echo(json.dumps(storage.stats(), indent=2))
+
+
+reconcile_cli = AppGroup('reconcile', help='Consistencia entre Blob Storage y la tabla alerts.')
+
+
+@reconcile_cli.command('run')
+@click.option('--user-id', type=int, default=None, help='Limitar al prefijo <user_id>/ y a las alertas de ese usuario.')
+@click.option('--delete-orphan-blobs', is_flag=True, help='Eliminar los blobs que ninguna alerta referencia.')
+@click.option('--fix-rows', is_flag=True, help='Eliminar alertas sin video y limpiar derivados inexistentes.')
+def reconcile_run(user_id, delete_orphan_blobs, fix_rows):
+    """Cruzar blobs y alertas; por defecto solo reporta."""
+    from app.services.blob_reconciliation import reconcile_blobs
+
+    report = reconcile_blobs(user_id=user_id, delete_orphan_blobs=delete_orphan_blobs, fix_rows=fix_rows)
+    click.echo(json.dumps(report, indent=2))
+
+
+@reconcile_cli.command('status')
+def reconcile_status():
+    """Mostrar el reporte de la última reconciliación."""
+    from app.services.blob_reconciliation import get_reconciliation_status
+
+    click.echo(json.dumps(get_reconciliation_status(), indent=2))
+
+
+cameras_cli = AppGroup('cameras', help='Análisis de los streams de las cámaras en el servidor.')
+
+
+@cameras_cli.command('run')
+@click.option('--camera-id', 'camera_ids', type=int, multiple=True, help='Solo estas cámaras (por defecto, todas las activas).')
+@click.option('--workers', type=int, default=None, help='Procesos entre los que se reparten las cámaras.')
+@click.option('--once', is_flag=True, help='Terminar al agotar los streams (archivos locales) en lugar de reconectar.')
+@click.option('--pipeline', type=click.Choice(['threads', 'shm']), default=None,
+              help='threads: decodificar y analizar en el mismo proceso; shm: analizadores aparte vía memoria compartida.')
+@click.option('--analyzers', type=int, default=None, help='Procesos analizadores con --pipeline shm.')
+def cameras_run(camera_ids, workers, once, pipeline, analyzers):
+    """Leer los streams de las cámaras, detectar personas en las zonas y crear alertas."""
+    from app.services.camera_ingest import (
+        CAMERA_ANALYZERS, CAMERA_PIPELINE, CAMERA_WORKERS, active_camera_ids, run_camera_workers
+    )
+
+    run_camera_workers(
+        list(camera_ids) or active_camera_ids(), workers=workers or CAMERA_WORKERS, once=once,
+        pipeline=pipeline or CAMERA_PIPELINE, analyzers=analyzers or CAMERA_ANALYZERS
+    )
+
+
+zones_cli = AppGroup('zones', help='Mantenimiento de las zonas de las cámaras.')
+
+
+@zones_cli.command('normalize')
+@click.option('--batch-size', type=int, default=500, help='Zonas actualizadas por transacción.')
+@click.option('--dry-run', is_flag=True, help='Solo informar qué zonas cambiarían.')
+def zones_normalize(batch_size, dry_run):
+    """Normalizar las coordenadas de las zonas existentes y completar bbox, área y vértices."""
+    from app.services.zone_geometry import normalize_stored_zones
+
+    click.echo(json.dumps(normalize_stored_zones(batch_size=batch_size, dry_run=dry_run), indent=2))
+
+
+def register_commands(app):
+    app.cli.add_command(retention_cli)
+    app.cli.add_command(storage_cli)
+    app.cli.add_command(reconcile_cli)
+    app.cli.add_command(cameras_cli)
+    app.cli.add_command(zones_cli)
@@ -0,0 +1,93 @@
+import csv
+import io
+import os
+import zlib
+
+from dotenv import load_dotenv
+from sqlalchemy import select
+
+from app import db
+from app.cameras.models.CamerasModel import AlertsModel, CamerasModel, ZonesModel
+from app.services.blob_storage import get_blob_sas_urls
+from app.services.fast_json import dumps, utc_isoformat
+
+
+load_dotenv()
+
+# Filas que se leen del cursor del servidor (y cuyas URLs se firman) por vuelta
+ALERT_EXPORT_BATCH_SIZE = int(os.getenv("ALERT_EXPORT_BATCH_SIZE", "5000"))
+# Nivel de gzip de las exportaciones comprimidas (1 = más rápido, 9 = más chico)
+ALERT_EXPORT_GZIP_LEVEL = int(os.getenv("ALERT_EXPORT_GZIP_LEVEL", "6"))
+
+EXPORT_FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+EXPORT_FIELDS = (
+    'id', 'alert_time', 'camera_id', 'camera_name', 'zone_id', 'zone_type', 'person_count', 'duration', 'video_url'
+)
+
+
+def export_statement(camera_ids, zone_ids=None, start=None, end=None):
+    """
+    Consulta de la exportación: alertas de camera_ids (y de zone_ids si se indica) con
+    alert_time en [start, end), en orden cronológico. Solo las columnas exportadas.
+    """
+    statement = select(
+        AlertsModel.id, AlertsModel.alert_time, CamerasModel.id, CamerasModel.camera_name, ZonesModel.id,
+        ZonesModel.type, AlertsModel.person_count, AlertsModel.duration, AlertsModel.video_url
+    ).join(ZonesModel, AlertsModel.zone_id == ZonesModel.id).join(
+        CamerasModel, ZonesModel.camera_id == CamerasModel.id
+    ).where(ZonesModel.camera_id.in_(camera_ids))
+    if zone_ids:
+        statement = statement.where(AlertsModel.zone_id.in_(zone_ids))
+    if start is not None:
+        statement = statement.where(AlertsModel.alert_time >= start)
+    if end is not None:
+        statement = statement.where(AlertsModel.alert_time < end)
+    return statement.order_by(AlertsModel.alert_time, AlertsModel.id)
+
+
+def _signed(rows):
+    signed_urls = get_blob_sas_urls([row[-1] for row in rows if row[-1]], cache=False)
+    return [row[:-1] + (signed_urls.get(row[-1], row[-1]),) for row in rows]
+
+
+def _utc_rows(rows):
+    # alert_time siempre en UTC con Z, sin importar la zona horaria de la sesión de la base
+    return ((alert_id, utc_isoformat(alert_time), *rest) for alert_id, alert_time, *rest in rows)
+
+
+def _ndjson(batches):
+    for rows in batches:
+        yield b"".join(dumps(dict(zip(EXPORT_FIELDS, row))) + b"\n" for row in _utc_rows(rows))
+
+
+def _csv(batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    for rows in batches:
+        writer.writerows(_utc_rows(rows))
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def _gzip(chunks, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31: formato gzip
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_alerts(statement, export_format, compress=False, batch_size=ALERT_EXPORT_BATCH_SIZE):
+    """
+    Generador de bytes con las alertas de statement en NDJSON o CSV, opcionalmente en
+    gzip. Las filas se leen de a batch_size con un cursor del servidor (PostgreSQL), así
+    la memoria no depende de cuántas se exporten. Se debe consumir dentro del contexto de
+    la solicitud.
+    """
+    result = db.session.execute(statement.execution_options(yield_per=batch_size))
+    batches = (_signed(rows) for rows in result.partitions())
+    chunks = _ndjson(batches) if export_format == 'ndjson' else _csv(batches)
+    return _gzip(chunks, ALERT_EXPORT_GZIP_LEVEL) if compress else chunks
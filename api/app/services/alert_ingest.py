@@ -0,0 +1,123 @@
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import uuid
+
+from flask import current_app
+
+from app import db
+from app.cameras.models.CamerasModel import AlertsModel
+from app.services.blob_storage import get_blob_sas_url, get_local_blob_path, upload_video_to_blob
+from app.services.media_worker import submit_alert_media
+from app.services.telegram_bot import notify_intruder
+from app.services.video_dedup import find_duplicate_video, shared_video_columns
+
+
+TEMP_VIDEO_DIR = tempfile.gettempdir()  # Directorio temporal para almacenar los videos recibidos
+
+
+# Enviar mensaje de texto a Telegram (sin bloquear)
+def send_telegram_video(path, chat_id):
+    try:
+        notify_intruder(path, chat_id)
+    except Exception as e:
+        # Loguea el error, pero no bloquees la respuesta al usuario
+        logging.error(f"Error al enviar el video por Telegram: {e}")
+    finally:
+        # esto solo se ejecuta cuando notify_intruder cierra el archivo
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def link_or_copy(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        # Otro sistema de archivos: copiar
+        shutil.copyfile(src, dst)
+
+
+def create_alert_from_file(user_id, zone, video_path, content_hash, person_count=1):
+    """
+    Crea la alerta de un clip ya recibido en video_path: notifica, lo sube al
+    almacenamiento y encola los derivados. No elimina video_path.
+
+    Es el camino común de POST /alerts y las subidas por partes; requiere un contexto
+    de la app.
+    """
+    return create_alerts_from_file(user_id, [(zone, person_count)], video_path, content_hash)[0]
+
+
+def create_alerts_from_file(user_id, zones, video_path, content_hash):
+    """
+    Crea una alerta por cada (zona, personas) de zones con el mismo clip (un clip de
+    cámara que disparó varias zonas): lo sube una sola vez, notifica una vez a cada chat
+    de Telegram de las zonas y encola los derivados, que se guardan en todas las
+    alertas del clip. No elimina video_path. Devuelve las alertas en el orden de zones.
+    """
+    # Mismo clip ya subido por el usuario (reintento del detector): reutilizar el blob
+    # y sus derivados, sin volver a subirlo ni a notificar
+    duplicate = find_duplicate_video(user_id, content_hash)
+    if duplicate is not None:
+        alerts = [
+            AlertsModel(
+                zone_id=zone.id, content_hash=content_hash, person_count=person_count,
+                **shared_video_columns(duplicate)
+            )
+            for zone, person_count in zones
+        ]
+        db.session.add_all(alerts)
+        db.session.commit()
+        return alerts
+
+    # Cada consumidor recibe su propio hard link y lo elimina al terminar
+    temp_path = os.path.join(TEMP_VIDEO_DIR, f"intruder_{uuid.uuid4().hex}.mp4")
+    for index, chat_id in enumerate(dict.fromkeys(zone.alert_telegram for zone, _ in zones)):
+        telegram_path = f"{temp_path}.{index}.telegram"
+        link_or_copy(video_path, telegram_path)
+        process = multiprocessing.Process(target=send_telegram_video, args=(telegram_path, chat_id))
+        process.start()
+
+    # Sube a blob y crea las alertas en base de datos
+    # Solo se guarda el nombre del blob; la SAS URL se firma al listar las alertas
+    blob_name = upload_video_to_blob(video_path, user_id)
+
+    alerts = [
+        AlertsModel(
+            zone_id=zone.id, video_url=blob_name or "", person_count=person_count,
+            content_hash=content_hash if blob_name else None
+        )
+        for zone, person_count in zones
+    ]
+    db.session.add_all(alerts)
+    db.session.commit()
+
+    # Poster, preview y metadata del clip en segundo plano (se guardan en todas las
+    # alertas con este video_url)
+    if blob_name:
+        media_path = f"{temp_path}.media"
+        link_or_copy(video_path, media_path)
+        submit_alert_media(current_app._get_current_object(), alerts[0].id, blob_name, media_path)
+    for alert, (zone, _) in zip(alerts, zones):
+        logging.info(f"Alerta {alert.id} creada para la zona {zone.id} ({blob_name}).")
+    return alerts
+
+
+def notify_stored_video(blob_name, chat_id):
+    """
+    Notificación por Telegram de un clip que ya está en el almacenamiento: con el backend
+    local se envía el archivo (hard link propio, como en POST /alerts); con Blob Storage,
+    la SAS URL para que Telegram lo descargue sin pasar por la API.
+    """
+    local_path = get_local_blob_path(blob_name)
+    if local_path:
+        path = os.path.join(TEMP_VIDEO_DIR, f"intruder_{uuid.uuid4().hex}.mp4.telegram")
+        link_or_copy(local_path, path)
+    else:
+        path = get_blob_sas_url(blob_name)
+        if path is None:
+            return
+    process = multiprocessing.Process(target=send_telegram_video, args=(path, chat_id))
+    process.start()
@@ -0,0 +1,42 @@
+from app import db
+from app.cameras.models.CamerasModel import AlertsModel
+from app.services.blob_storage import get_blob_sas_urls
+from app.services.fast_json import JSON_STREAM_CHUNK_SIZE, stream_json_array, utc_isoformat
+
+
+# Columnas de AlertsModel.to_json: las listas se leen como tuplas, sin instanciar modelos
+ALERT_JSON_COLUMNS = (
+    AlertsModel.id, AlertsModel.zone_id, AlertsModel.alert_time, AlertsModel.video_url, AlertsModel.poster_blob,
+    AlertsModel.preview_blob, AlertsModel.duration, AlertsModel.fps, AlertsModel.width, AlertsModel.height,
+    AlertsModel.person_count
+)
+
+
+def alert_rows_to_json(rows):
+    """
+    Mismo formato que AlertsModel.to_json a partir de filas de ALERT_JSON_COLUMNS,
+    firmando todas las SAS URL del lote de una sola vez.
+    """
+    signed_urls = get_blob_sas_urls([name for row in rows for name in row[3:6] if name])
+    return [{
+        'id': alert_id,
+        'zone_id': zone_id,
+        'alert_time': utc_isoformat(alert_time),
+        'video_url': signed_urls.get(video_url, video_url),
+        'poster_url': signed_urls.get(poster_blob) if poster_blob else None,
+        'preview_url': signed_urls.get(preview_blob) if preview_blob else None,
+        'duration': duration,
+        'fps': fps,
+        'width': width,
+        'height': height,
+        'person_count': person_count
+    } for alert_id, zone_id, alert_time, video_url, poster_blob, preview_blob, duration, fps, width, height, person_count in rows]
+
+
+def stream_alert_rows(statement):
+    """
+    Arreglo JSON de las alertas de la consulta, leído y enviado por lotes (cursor del
+    servidor en PostgreSQL).
+    """
+    result = db.session.execute(statement.execution_options(yield_per=JSON_STREAM_CHUNK_SIZE))
+    return stream_json_array(alert_rows_to_json(rows) for rows in result.partitions())
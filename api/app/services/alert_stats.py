@@ -0,0 +1,239 @@
+import datetime
+import os
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+import numpy as np
+from dotenv import load_dotenv
+from sqlalchemy import DateTime, Interval, case, cast, func, literal, literal_column, select
+
+from app import db
+from app.cameras.models.CamerasModel import AlertsModel, ZonesModel
+
+
+load_dotenv()
+
+# Tope de intervalos por serie (por ejemplo, minutos de una semana son 10080)
+STATS_MAX_BUCKETS = int(os.getenv("STATS_MAX_BUCKETS", "10080"))
+
+# Granularidad -> (unidad de date_trunc, paso de generate_series, duración aproximada)
+STATS_GRANULARITIES = {
+    'minute': ('minute', '1 minute', datetime.timedelta(minutes=1)),
+    'hour': ('hour', '1 hour', datetime.timedelta(hours=1)),
+    'day': ('day', '1 day', datetime.timedelta(days=1)),
+    'week': ('week', '1 week', datetime.timedelta(weeks=1)),
+    'month': ('month', '1 month', datetime.timedelta(days=28)),
+}
+
+# Métrica -> agregado sobre las alertas de cada intervalo
+STATS_METRICS = {
+    'alerts': lambda: func.count(AlertsModel.id),
+    'persons': lambda: func.sum(AlertsModel.person_count),
+    'max_persons': lambda: func.max(AlertsModel.person_count),
+}
+
+
+def get_timezone(name):
+    """
+    ZoneInfo de una zona horaria IANA (America/Argentina/Buenos_Aires, UTC...).
+    ValueError si no existe.
+    """
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"Zona horaria desconocida: {name}")
+
+
+def utc_bounds(start_date, end_date, tz):
+    """
+    [inicio, fin) en UTC de los días locales start_date a end_date inclusive, con zona
+    (alert_time es TIMESTAMP WITH TIME ZONE: no depende del TimeZone de la sesión).
+    """
+    start = datetime.datetime.combine(start_date, datetime.time(), tz)
+    end = datetime.datetime.combine(end_date + datetime.timedelta(days=1), datetime.time(), tz)
+    return start.astimezone(datetime.timezone.utc), end.astimezone(datetime.timezone.utc)
+
+
+def local_alert_time(tz):
+    # alert_time -> hora local (sin zona) en tz, calculada en la base de datos
+    return func.timezone(tz.key, AlertsModel.alert_time)
+
+
+def alert_filters(camera_ids, zone_ids=None):
+    conditions = [ZonesModel.camera_id.in_(camera_ids)]
+    if zone_ids:
+        conditions.append(AlertsModel.zone_id.in_(zone_ids))
+    return conditions
+
+
+def alert_time_series(camera_ids, start_date, end_date, granularity='day', tz=None, metrics=('alerts',),
+                      zone_ids=None):
+    """
+    Serie temporal de las alertas de camera_ids (y zone_ids) entre los días locales
+    start_date y end_date, en intervalos de granularity de la zona horaria tz (UTC por
+    defecto). Una sola consulta: generate_series arma todos los intervalos (también los
+    vacíos, con 0) y se cruza con los agregados de metrics. Devuelve [(inicio del
+    intervalo con zona, métrica, ...)]. Los intervalos de los bordes solo cuentan alertas
+    dentro del rango. Los de minutos y horas son instantes (timestamptz), así un día con
+    cambio de hora tiene 23 o 25 intervalos horarios; los de días, semanas y meses siguen
+    el calendario local. ValueError si la granularidad o una métrica no existen o hay
+    demasiados intervalos.
+    """
+    tz = tz or ZoneInfo('UTC')
+    if granularity not in STATS_GRANULARITIES:
+        raise ValueError(f"Granularidad inválida: {granularity}")
+    unknown = [metric for metric in metrics if metric not in STATS_METRICS]
+    if unknown or not metrics:
+        raise ValueError(f"Métricas inválidas: {', '.join(unknown) or '(ninguna)'}")
+    unit, step, approximate = STATS_GRANULARITIES[granularity]
+    start_utc, end_utc = utc_bounds(start_date, end_date, tz)
+    if (end_utc - start_utc) / approximate > STATS_MAX_BUCKETS:
+        raise ValueError(f"El rango supera {STATS_MAX_BUCKETS} intervalos; usar una granularidad mayor")
+
+    if approximate < datetime.timedelta(days=1):
+        # Serie sobre instantes: sumar una hora a un timestamptz avanza una hora real y
+        # date_trunc con zona corta en la hora local sin fusionar la hora repetida
+        sub_day = True
+        bucket = func.date_trunc(unit, AlertsModel.alert_time, tz.key).label('bucket')
+        bounds = (
+            cast(literal(start_utc), DateTime(timezone=True)),
+            cast(literal(end_utc - datetime.timedelta(microseconds=1)), DateTime(timezone=True))
+        )
+    else:
+        # Serie sobre el calendario local (sin zona): un día o un mes local es un intervalo
+        sub_day = False
+        first = datetime.datetime.combine(start_date, datetime.time())
+        after = datetime.datetime.combine(end_date + datetime.timedelta(days=1), datetime.time())
+        bucket = func.date_trunc(unit, local_alert_time(tz)).label('bucket')
+        bounds = (
+            func.date_trunc(unit, cast(literal(first), DateTime)),
+            cast(literal(after - datetime.timedelta(microseconds=1)), DateTime)
+        )
+
+    data = select(bucket, *[STATS_METRICS[metric]().label(metric) for metric in metrics]).join(
+        ZonesModel, AlertsModel.zone_id == ZonesModel.id
+    ).where(
+        *alert_filters(camera_ids, zone_ids), AlertsModel.alert_time >= start_utc, AlertsModel.alert_time < end_utc
+    ).group_by(literal_column('bucket')).subquery()
+
+    series = select(func.generate_series(*bounds, cast(literal(step), Interval)).label('bucket')).subquery()
+
+    rows = db.session.execute(
+        select(series.c.bucket, *[func.coalesce(data.c[metric], 0) for metric in metrics]).select_from(
+            series.outerjoin(data, data.c.bucket == series.c.bucket)
+        ).order_by(series.c.bucket)
+    ).all()
+    if sub_day:
+        return [(row[0].astimezone(tz), *row[1:]) for row in rows]
+    return [(row[0].replace(tzinfo=tz), *row[1:]) for row in rows]
+
+
+# Métricas del mapa de calor día de la semana × hora, en el orden del arreglo
+HEATMAP_METRICS = ('alerts', 'persons')
+# Columna de agrupación del mapa de calor
+HEATMAP_GROUPS = {
+    'camera': lambda: ZonesModel.camera_id,
+    'zone': lambda: AlertsModel.zone_id,
+}
+
+
+def previous_period(start_date, end_date):
+    """
+    Período de igual cantidad de días que termina el día anterior a start_date.
+    """
+    days = end_date - start_date + datetime.timedelta(days=1)
+    return start_date - days, start_date - datetime.timedelta(days=1)
+
+
+def _percent_change(current, previous):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        change = np.round((current - previous) * 100.0 / previous, 1)
+    return np.where(previous > 0, change, np.nan)
+
+
+def _heatmap_block(data, previous, change):
+    # data y previous: (métrica, 7, 24); change: (métrica,) con NaN si no hay base
+    block = {}
+    for index, metric in enumerate(HEATMAP_METRICS):
+        block[metric] = data[index].tolist()
+        block[f'total_{metric}'] = int(data[index].sum())
+    if previous is not None:
+        block['previous'] = {}
+        for index, metric in enumerate(HEATMAP_METRICS):
+            block['previous'][metric] = previous[index].tolist()
+            block['previous'][f'total_{metric}'] = int(previous[index].sum())
+        block['change'] = {
+            metric: None if np.isnan(change[index]) else float(change[index])
+            for index, metric in enumerate(HEATMAP_METRICS)
+        }
+    return block
+
+
+def alert_heatmap(group_by, group_ids, camera_ids, start_date, end_date, tz=None, zone_ids=None, compare=True):
+    """
+    Mapas de calor día de la semana × hora local (7 filas de lunes a domingo, 24
+    columnas) con la cantidad de alertas y la suma de personas por cámara o zona
+    (group_by) de group_ids, entre los días locales start_date y end_date. Con compare,
+    también los del período anterior de igual largo y la variación porcentual de los
+    totales (None sin alertas en el período anterior). Una sola consulta agrega ambos
+    períodos; NumPy arma las matrices, incluidas las celdas y grupos sin alertas, y el
+    resumen de todos los grupos.
+    """
+    tz = tz or ZoneInfo('UTC')
+    if group_by not in HEATMAP_GROUPS:
+        raise ValueError(f"Agrupación inválida: {group_by}")
+    first_date = previous_period(start_date, end_date)[0] if compare else start_date
+    start_utc, end_utc = utc_bounds(start_date, end_date, tz)
+    first_utc = utc_bounds(first_date, end_date, tz)[0]
+
+    local_time = local_alert_time(tz)
+    rows = db.session.execute(select(
+        case((AlertsModel.alert_time >= start_utc, 0), else_=1).label('period'),
+        HEATMAP_GROUPS[group_by]().label('group_id'),
+        func.extract('isodow', local_time).label('weekday'),
+        func.extract('hour', local_time).label('hour'),
+        func.count(AlertsModel.id),
+        func.sum(AlertsModel.person_count),
+    ).join(ZonesModel, AlertsModel.zone_id == ZonesModel.id).where(
+        *alert_filters(camera_ids, zone_ids), AlertsModel.alert_time >= first_utc, AlertsModel.alert_time < end_utc
+    ).group_by(
+        literal_column('period'), literal_column('group_id'), literal_column('weekday'), literal_column('hour')
+    )).all()
+
+    # (período, grupo, métrica, día, hora); los grupos sin alertas quedan en cero
+    group_ids = np.asarray(sorted(group_ids), dtype=np.int64)
+    data = np.zeros((2 if compare else 1, len(group_ids), len(HEATMAP_METRICS), 7, 24), dtype=np.int64)
+    if rows and len(group_ids):
+        values = np.asarray(rows, dtype=np.float64).astype(np.int64)
+        period, group, weekday, hour = values[:, 0], np.searchsorted(group_ids, values[:, 1]), values[:, 2] - 1, values[:, 3]
+        known = (group < len(group_ids)) & (group_ids[np.minimum(group, len(group_ids) - 1)] == values[:, 1])
+        for index in range(len(HEATMAP_METRICS)):
+            data[period[known], group[known], index, weekday[known], hour[known]] = values[known, 4 + index]
+
+    summary = data.sum(axis=1)
+    if compare:
+        group_change = _percent_change(data[0].sum(axis=(-2, -1)), data[1].sum(axis=(-2, -1)))
+        summary_change = _percent_change(summary[0].sum(axis=(-2, -1)), summary[1].sum(axis=(-2, -1)))
+    key = f'{group_by}_id'
+    return {
+        'groups': [
+            {key: int(group_id), **_heatmap_block(
+                data[0, index], data[1, index] if compare else None, group_change[index] if compare else None
+            )}
+            for index, group_id in enumerate(group_ids)
+        ],
+        'summary': _heatmap_block(summary[0], summary[1] if compare else None, summary_change if compare else None),
+    }
+
+
+def zone_alert_counts(zone_ids, start_date, end_date, tz=None):
+    """
+    {zone_id: (alertas, personas)} entre los días locales start_date y end_date de tz,
+    solo de las zonas con alertas. Una consulta agrupada por zona.
+    """
+    start_utc, end_utc = utc_bounds(start_date, end_date, tz or ZoneInfo('UTC'))
+    rows = db.session.execute(select(
+        AlertsModel.zone_id, func.count(AlertsModel.id), func.sum(AlertsModel.person_count)
+    ).where(
+        AlertsModel.zone_id.in_(zone_ids), AlertsModel.alert_time >= start_utc, AlertsModel.alert_time < end_utc
+    ).group_by(AlertsModel.zone_id)).all()
+    return {zone_id: (alerts, int(persons)) for zone_id, alerts, persons in rows}
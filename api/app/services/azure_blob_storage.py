@@ -0,0 +1,160 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from azure.storage.blob import BlobServiceClient, BlobSasPermissions, ContentSettings, generate_blob_sas
+
+from app.services.storage_backend import StorageBackend, StoredObject
+
+
+# Máximo de subsolicitudes por llamada a la Blob Batch API
+BLOB_BATCH_SIZE = 256
+
+_service_clients = {}
+
+
+class AzureBlobStorage(StorageBackend):
+    """
+    Backend sobre un contenedor de Azure Blob Storage.
+    """
+
+    name = "azure"
+
+    def __init__(self, connection_string, container_name, download_concurrency=4):
+        self.connection_string = connection_string
+        self.container_name = container_name
+        self.download_concurrency = download_concurrency
+
+    # Cliente del servicio Blob compartido por proceso (los procesos hijos crean el suyo)
+    def service_client(self):
+        pid = os.getpid()
+        client = _service_clients.get(pid)
+        if client is None:
+            client = BlobServiceClient.from_connection_string(self.connection_string)
+            _service_clients[pid] = client
+        return client
+
+    def container_client(self):
+        return self.service_client().get_container_client(self.container_name)
+
+    def upload_file(self, file_path, blob_name, content_type):
+        logging.info(f"Iniciando subida del archivo {file_path} al blob {blob_name}.")
+        try:
+            container_client = self.container_client()
+
+            # Verificar si el contenedor existe
+            if not container_client.exists():
+                logging.error(f"El contenedor {self.container_name} no existe.")
+                return None
+
+            # Subir el archivo
+            with open(file_path, "rb") as data:
+                blob_client = container_client.get_blob_client(blob_name)
+                blob_client.upload_blob(data, overwrite=True, content_settings=ContentSettings(content_type=content_type))
+                logging.info(f"Archivo {blob_name} subido exitosamente al contenedor {self.container_name}.")
+
+            return blob_name
+        except Exception as e:
+            logging.error(f"Error al subir el archivo al Blob Storage: {e}")
+            return None
+
+    # Eliminar muchos blobs con la Blob Batch API (hasta 256 por llamada), lotes en paralelo
+    def delete_many(self, blob_names, max_workers=4):
+        container_client = self.container_client()
+        batches = [blob_names[i:i + BLOB_BATCH_SIZE] for i in range(0, len(blob_names), BLOB_BATCH_SIZE)]
+
+        def delete_batch(batch):
+            try:
+                responses = container_client.delete_blobs(*batch, raise_on_any_failure=False)
+                return sum(1 for response in responses if response.status_code in (202, 404))
+            except Exception as e:
+                logging.error(f"Error al eliminar un lote de {len(batch)} blobs: {e}")
+                return 0
+
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(batches)))) as executor:
+            return sum(executor.map(delete_batch, batches))
+
+    def download_to(self, blob_name, download_path):
+        logging.info(f"Iniciando descarga del video {blob_name} a {download_path}.")
+        try:
+            blob_client = self.container_client().get_blob_client(blob_name)
+            with open(download_path, "wb") as file:
+                # Escribir por chunks directamente al archivo, sin cargar el video completo en memoria
+                download_stream = blob_client.download_blob(max_concurrency=self.download_concurrency)
+                download_stream.readinto(file)
+                logging.info(f"Video {blob_name} descargado exitosamente en {download_path}.")
+
+            return True
+        except Exception as e:
+            logging.error(f"Error al descargar el video del Blob Storage: {e}")
+            return False
+
+    def size(self, blob_name):
+        try:
+            blob_client = self.service_client().get_blob_client(self.container_name, blob_name)
+            return blob_client.get_blob_properties().size
+        except Exception as e:
+            logging.error(f"Error al obtener las propiedades del blob {blob_name}: {e}")
+            return None
+
+    def iter_range(self, blob_name, offset, length, chunk_size):
+        blob_client = self.service_client().get_blob_client(self.container_name, blob_name)
+        end = offset + length
+        while offset < end:
+            size = min(chunk_size, end - offset)
+            yield blob_client.download_blob(offset=offset, length=size).readall()
+            offset += size
+
+    def iter_pages(self, prefix, page_size, continuation_token=None):
+        pages = self.container_client().list_blobs(
+            name_starts_with=prefix or None, results_per_page=page_size
+        ).by_page(continuation_token=continuation_token)
+        for page in pages:
+            objects = [StoredObject(blob.name, blob.size, blob.last_modified) for blob in page]
+            yield objects, pages.continuation_token or None
+
+    def sign_urls(self, blob_names, expiry):
+        service_client = self.service_client()
+        account_name = service_client.account_name
+        account_key = service_client.credential.account_key
+        base_url = f"{service_client.url.rstrip('/')}/{self.container_name}"
+        permission = BlobSasPermissions(read=True)
+
+        signed = {}
+        for blob_name in blob_names:
+            sas_token = generate_blob_sas(
+                account_name=account_name,
+                container_name=self.container_name,
+                blob_name=blob_name,
+                account_key=account_key,
+                permission=permission,
+                expiry=expiry
+            )
+            signed[blob_name] = f"{base_url}/{blob_name}?{sas_token}"
+        return signed
+
+    def sign_upload_url(self, blob_name, expiry, content_type):
+        # SAS de solo creación/escritura sobre ese blob: el cliente hace un Put Blob directo
+        service_client = self.service_client()
+        sas_token = generate_blob_sas(
+            account_name=service_client.account_name,
+            container_name=self.container_name,
+            blob_name=blob_name,
+            account_key=service_client.credential.account_key,
+            permission=BlobSasPermissions(create=True, write=True),
+            expiry=expiry
+        )
+        return {
+            'url': f"{service_client.url.rstrip('/')}/{self.container_name}/{blob_name}?{sas_token}",
+            'method': 'PUT',
+            'headers': {'x-ms-blob-type': 'BlockBlob', 'Content-Type': content_type}
+        }
+
+    def upload_stream(self, stream, blob_name, content_type):
+        try:
+            blob_client = self.container_client().get_blob_client(blob_name)
+            blob_client.upload_blob(stream, overwrite=True, content_settings=ContentSettings(content_type=content_type))
+            return blob_client.get_blob_properties().size
+        except Exception as e:
+            logging.error(f"Error al subir el blob {blob_name}: {e}")
+            return None
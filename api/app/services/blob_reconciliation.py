@@ -0,0 +1,232 @@
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+
+from dotenv import load_dotenv
+from sqlalchemy import DateTime, bindparam, text
+
+from app import db
+from app.cameras.models.RetentionModel import JobCheckpointsModel
+from app.services.azure_blob_storage import BLOB_BATCH_SIZE
+from app.services.blob_storage import delete_blobs, iter_videos_in_blob
+from app.services.video_dedup import releasable_blob_names
+
+
+load_dotenv()
+
+# Filas leídas por vuelta del cursor del servidor
+RECONCILE_FETCH_SIZE = int(os.getenv("RECONCILE_FETCH_SIZE", "5000"))
+# Blobs y alertas más recientes que esto no se consideran huérfanos: la subida del clip
+# ocurre antes del INSERT de la alerta y los derivados se agregan después
+RECONCILE_GRACE = timedelta(minutes=int(os.getenv("RECONCILE_GRACE_MINUTES", "60")))
+# Nombres de ejemplo guardados en el reporte por categoría
+RECONCILE_SAMPLE_SIZE = int(os.getenv("RECONCILE_SAMPLE_SIZE", "20"))
+
+JOB_NAME = "reconcile"
+
+# Todas las referencias a blobs de la tabla alerts, ordenadas por bytes como las lista Azure.
+# Las alertas antiguas que guardan una URL completa no apuntan al contenedor y se ignoran.
+REFERENCES_SQL = """
+    SELECT name, alert_id, kind, alert_time FROM (
+        SELECT a.video_url AS name, a.id AS alert_id, 'video' AS kind, a.alert_time
+        FROM alerts a {scope}
+        UNION ALL
+        SELECT a.poster_blob, a.id, 'poster', a.alert_time
+        FROM alerts a {scope} {and_} a.poster_blob IS NOT NULL
+        UNION ALL
+        SELECT a.preview_blob, a.id, 'preview', a.alert_time
+        FROM alerts a {scope} {and_} a.preview_blob IS NOT NULL
+    ) AS refs
+    WHERE name NOT LIKE 'http%'
+    ORDER BY name COLLATE "C"
+"""
+
+USER_SCOPE_SQL = "JOIN zones z ON z.id = a.zone_id JOIN cameras c ON c.id = z.camera_id WHERE c.user_id = :user_id"
+
+# Alertas cuyo video no existe: se eliminan y se devuelven sus derivados para borrarlos
+DELETE_ALERTS_SQL = text("""
+    DELETE FROM alerts WHERE id IN :ids RETURNING video_url, poster_blob, preview_blob
+""").bindparams(bindparam('ids', expanding=True))
+
+CLEAR_COLUMN_SQL = {
+    kind: text(f"""
+        UPDATE alerts SET {column} = NULL WHERE id IN :ids AND {column} IN :names
+    """).bindparams(bindparam('ids', expanding=True), bindparam('names', expanding=True))
+    for kind, column in (('poster', 'poster_blob'), ('preview', 'preview_blob'))
+}
+
+
+def _references_query(user_id):
+    if user_id is None:
+        query = REFERENCES_SQL.format(scope="", and_="WHERE")
+    else:
+        query = REFERENCES_SQL.format(scope=USER_SCOPE_SQL, and_="AND")
+    return text(query).columns(alert_time=DateTime(timezone=True))
+
+
+def _iter_references(connection, user_id):
+    query = _references_query(user_id)
+    result = connection.execution_options(stream_results=True, yield_per=RECONCILE_FETCH_SIZE).execute(
+        query, {'user_id': user_id} if user_id is not None else {}
+    )
+    yield from result
+
+
+class _Repairs:
+    """
+    Acumula las correcciones y las aplica por lotes para mantener la memoria acotada.
+    """
+
+    def __init__(self, delete_orphan_blobs, fix_rows):
+        self.delete_orphan_blobs = delete_orphan_blobs
+        self.fix_rows = fix_rows
+        self.blobs = []
+        self.missing_videos = []
+        self.missing_derivatives = {'poster': [], 'preview': []}
+        self.deleted_blobs = 0
+        self.deleted_alerts = 0
+        self.cleared_columns = 0
+
+    def orphan_blob(self, name):
+        if self.delete_orphan_blobs:
+            self.blobs.append(name)
+            if len(self.blobs) >= BLOB_BATCH_SIZE * 4:
+                self.flush_blobs()
+
+    def dangling_reference(self, row):
+        if not self.fix_rows:
+            return
+        if row.kind == 'video':
+            self.missing_videos.append(row.alert_id)
+        else:
+            self.missing_derivatives[row.kind].append((row.alert_id, row.name))
+        if len(self.missing_videos) + sum(len(rows) for rows in self.missing_derivatives.values()) >= RECONCILE_FETCH_SIZE:
+            self.flush_rows()
+
+    def flush_blobs(self):
+        if self.blobs:
+            self.deleted_blobs += delete_blobs(self.blobs)
+            self.blobs = []
+
+    def flush_rows(self):
+        try:
+            deleted_rows, cleared = [], 0
+            if self.missing_videos:
+                deleted_rows = db.session.execute(DELETE_ALERTS_SQL, {'ids': self.missing_videos}).fetchall()
+            for kind, rows in self.missing_derivatives.items():
+                if rows:
+                    result = db.session.execute(CLEAR_COLUMN_SQL[kind], {
+                        'ids': [alert_id for alert_id, _ in rows],
+                        'names': [name for _, name in rows],
+                    })
+                    cleared += result.rowcount
+            db.session.commit()
+            self.deleted_alerts += len(deleted_rows)
+            self.cleared_columns += cleared
+            # Los derivados de esas alertas quedan sin referencia (salvo que otra alerta use el mismo clip)
+            if self.delete_orphan_blobs and deleted_rows:
+                self.blobs.extend(releasable_blob_names(
+                    (row.video_url, [row.poster_blob, row.preview_blob]) for row in deleted_rows
+                ))
+        except Exception as e:
+            # Las filas quedan como estaban; la próxima ejecución las vuelve a reportar
+            db.session.rollback()
+            logging.error(f"Reconciliación: error al corregir alertas: {e}")
+        self.missing_videos = []
+        self.missing_derivatives = {'poster': [], 'preview': []}
+
+    def flush(self):
+        self.flush_rows()
+        self.flush_blobs()
+
+
+def reconcile_blobs(user_id=None, delete_orphan_blobs=False, fix_rows=False):
+    """
+    Compara los blobs del contenedor con las referencias de la tabla alerts.
+
+    Ambos lados se recorren ordenados por nombre (el listado paginado de Azure y un
+    cursor del servidor en PostgreSQL) y se cruzan con un merge join, así la memoria
+    no depende de la cantidad de objetos. Reporta los blobs sin alerta y las alertas
+    que apuntan a blobs inexistentes; opcionalmente elimina los primeros y corrige las
+    segundas (elimina la alerta si falta el video, limpia la columna si falta un derivado).
+    """
+    cutoff = datetime.now(timezone.utc) - RECONCILE_GRACE
+    repairs = _Repairs(delete_orphan_blobs, fix_rows)
+    report = {
+        'user_id': user_id,
+        'started_at': datetime.utcnow().isoformat(),
+        'blobs': 0,
+        'references': 0,
+        'matched': 0,
+        'orphan_blobs': 0,
+        'orphan_bytes': 0,
+        'dangling': {'video': 0, 'poster': 0, 'preview': 0},
+        'recent_skipped': 0,
+        'samples': {'orphan_blobs': [], 'dangling': []},
+    }
+
+    def orphan(blob):
+        if blob.last_modified and blob.last_modified > cutoff:
+            report['recent_skipped'] += 1
+            return
+        report['orphan_blobs'] += 1
+        report['orphan_bytes'] += blob.size or 0
+        if len(report['samples']['orphan_blobs']) < RECONCILE_SAMPLE_SIZE:
+            report['samples']['orphan_blobs'].append(blob.name)
+        repairs.orphan_blob(blob.name)
+
+    def dangling(row):
+        alert_time = row.alert_time
+        if alert_time is not None and alert_time.tzinfo is None:
+            alert_time = alert_time.replace(tzinfo=timezone.utc)
+        if alert_time is not None and alert_time > cutoff:
+            report['recent_skipped'] += 1
+            return
+        report['dangling'][row.kind] += 1
+        if len(report['samples']['dangling']) < RECONCILE_SAMPLE_SIZE:
+            report['samples']['dangling'].append({'alert_id': row.alert_id, 'kind': row.kind, 'name': row.name})
+        repairs.dangling_reference(row)
+
+    with db.engine.connect() as connection:
+        blobs = iter_videos_in_blob(user_id)
+        references = _iter_references(connection, user_id)
+        blob = next(blobs, None)
+        reference = next(references, None)
+
+        while blob is not None or reference is not None:
+            if reference is None or (blob is not None and blob.name < reference.name):
+                report['blobs'] += 1
+                orphan(blob)
+                blob = next(blobs, None)
+            elif blob is None or reference.name < blob.name:
+                report['references'] += 1
+                dangling(reference)
+                reference = next(references, None)
+            else:
+                # Mismo nombre: consumir todas las referencias a ese blob
+                name = blob.name
+                while reference is not None and reference.name == name:
+                    report['references'] += 1
+                    report['matched'] += 1
+                    reference = next(references, None)
+                report['blobs'] += 1
+                blob = next(blobs, None)
+
+    repairs.flush()
+    report['deleted_blobs'] = repairs.deleted_blobs
+    report['deleted_alerts'] = repairs.deleted_alerts
+    report['cleared_columns'] = repairs.cleared_columns
+    report['finished_at'] = datetime.utcnow().isoformat()
+
+    db.session.merge(JobCheckpointsModel(job=JOB_NAME, cursor=0, state=report))
+    db.session.commit()
+    logging.info(
+        f"Reconciliación: {report['blobs']} blobs, {report['references']} referencias, "
+        f"{report['orphan_blobs']} blobs huérfanos, {sum(report['dangling'].values())} referencias rotas."
+    )
+    return report
+
+
+def get_reconciliation_status():
+    checkpoint = db.session.get(JobCheckpointsModel, JOB_NAME)
+    return checkpoint.to_json() if checkpoint else None
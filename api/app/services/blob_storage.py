@@ -1,17 +1,55 @@
-from azure.storage.blob import BlobServiceClient, ContainerSasPermissions, generate_container_sas, generate_blob_sas, BlobSasPermissions, ContentSettings
 import os
 from dotenv import load_dotenv
+import hashlib
+import hmac
 import logging
 import datetime
+import threading
+import uuid
+
+from app.services.azure_blob_storage import AzureBlobStorage
+from app.services.local_storage import LocalFileStorage
+from app.services.tiered_storage import LocationIndex, TieredStorage
 
 
 
 load_dotenv()
 
+# Backend de almacenamiento: azure (Blob Storage) | local (disco, para sitios on-prem / edge)
+# | tiered (disco local para los clips nuevos, Blob Storage para los antiguos)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "azure").lower()
+
 # Configuración de la conexión
 AZURE_STORAGE_CONNECTION_STRING = os.getenv("AZURE_STORAGE_CONNECTION_STRING")
 CONTAINER_NAME = os.getenv("CONTAINER_NAME")
 
+# Backend local: directorio raíz y URL base con la que se sirven los archivos (ver media_controller)
+LOCAL_STORAGE_DIR = os.getenv("LOCAL_STORAGE_DIR", "/var/lib/guardvision/storage")
+LOCAL_STORAGE_URL = os.getenv("LOCAL_STORAGE_URL", "/media")
+# Clave de las URLs firmadas del backend local. Sin ella se deriva de SECRET_KEY con una
+# etiqueta fija, así no es la misma clave que firma los JWT
+LOCAL_STORAGE_SIGNING_KEY = os.getenv("LOCAL_STORAGE_SIGNING_KEY")
+
+# Backend tiered: el mover sube a Blob Storage dentro de TIER_OFFLOAD_HOURS (hora local, "1-6",
+# "22-5"; fuera de la ventana solo si se supera TIER_HOT_MAX_BYTES) y desaloja del disco lo ya
+# subido con más de TIER_HOT_MAX_AGE_HOURS
+TIER_INDEX_PATH = os.getenv("TIER_INDEX_PATH", os.path.join(LOCAL_STORAGE_DIR, "locations.sqlite3"))
+TIER_OFFLOAD_HOURS = os.getenv("TIER_OFFLOAD_HOURS", "0-24")
+TIER_HOT_MAX_AGE_HOURS = float(os.getenv("TIER_HOT_MAX_AGE_HOURS", "24"))
+TIER_HOT_MAX_BYTES = int(os.getenv("TIER_HOT_MAX_BYTES", str(50 * 1024 ** 3)))
+
+# Las SAS URL se firman al leer las alertas (en la base solo se guarda el nombre del blob)
+# y se reutilizan desde memoria hasta SAS_URL_REFRESH_MARGIN antes de expirar.
+SAS_URL_TTL = datetime.timedelta(minutes=int(os.getenv("SAS_URL_TTL_MINUTES", "60")))
+SAS_URL_REFRESH_MARGIN = datetime.timedelta(minutes=int(os.getenv("SAS_URL_REFRESH_MARGIN_MINUTES", "10")))
+SAS_CACHE_MAX_ENTRIES = int(os.getenv("SAS_CACHE_MAX_ENTRIES", "100000"))
+
+# Conexiones paralelas al descargar blobs completos
+DOWNLOAD_CONCURRENCY = int(os.getenv("BLOB_DOWNLOAD_CONCURRENCY", "4"))
+
+# Blobs por página al listar el contenedor (máximo del servicio: 5000)
+BLOB_LIST_PAGE_SIZE = int(os.getenv("BLOB_LIST_PAGE_SIZE", "1000"))
+
 
 # Configurar logging
 logging.basicConfig(
@@ -24,112 +62,254 @@ logging.basicConfig(
 )
 
 
+_storage = None
+_storage_lock = threading.Lock()
+_sas_cache = {}  # blob_name -> (sas_url, expiry)
+_sas_cache_lock = threading.Lock()
+
+
+def local_storage_signing_key():
+    """
+    Clave HMAC de las URLs de /media: LOCAL_STORAGE_SIGNING_KEY o, si no está, una
+    derivada de SECRET_KEY. None si no hay ninguna (LocalFileStorage la rechaza).
+    """
+    if LOCAL_STORAGE_SIGNING_KEY:
+        return LOCAL_STORAGE_SIGNING_KEY.encode("utf-8")
+    secret_key = os.getenv("SECRET_KEY")
+    if not secret_key:
+        return None
+    return hmac.new(secret_key.encode("utf-8"), b"guardvision/local-storage-url", hashlib.sha256).digest()
+
+
+def get_storage():
+    """
+    Backend configurado con STORAGE_BACKEND (uno por proceso).
+    """
+    global _storage
+    with _storage_lock:
+        if _storage is None:
+            if STORAGE_BACKEND == "local":
+                _storage = LocalFileStorage(LOCAL_STORAGE_DIR, local_storage_signing_key(), LOCAL_STORAGE_URL)
+            elif STORAGE_BACKEND == "azure":
+                _storage = AzureBlobStorage(AZURE_STORAGE_CONNECTION_STRING, CONTAINER_NAME, DOWNLOAD_CONCURRENCY)
+            elif STORAGE_BACKEND == "tiered":
+                _storage = TieredStorage(
+                    hot=LocalFileStorage(LOCAL_STORAGE_DIR, local_storage_signing_key(), LOCAL_STORAGE_URL),
+                    cold=AzureBlobStorage(AZURE_STORAGE_CONNECTION_STRING, CONTAINER_NAME, DOWNLOAD_CONCURRENCY),
+                    index=LocationIndex(TIER_INDEX_PATH),
+                    offload_hours=TIER_OFFLOAD_HOURS,
+                    hot_max_age_seconds=TIER_HOT_MAX_AGE_HOURS * 3600,
+                    hot_max_bytes=TIER_HOT_MAX_BYTES,
+                )
+            else:
+                raise ValueError(f"STORAGE_BACKEND desconocido: {STORAGE_BACKEND}")
+        return _storage
+
+
 # Subir video al Blob Storage
 def upload_video_to_blob(video_path, user_id):
     """
-    Sube un video al Blob Storage en la ruta: <user_id>/<YYYY-MM-DD>/<YYYY-MM-DD_HH-MM-SS>.mp4
+    Sube un video al Blob Storage en la ruta: <user_id>/<YYYY-MM-DD>/<YYYY-MM-DD_HH-MM-SS>_<id>.mp4
+    El sufijo evita que dos clips del mismo segundo se sobrescriban.
     """
+    return upload_file_to_blob(video_path, new_video_blob_name(user_id), "video/mp4")
+
+
+def new_video_blob_name(user_id):
     # Obtener fecha y hora actual
     now = datetime.datetime.now()
     date_str = now.strftime("%Y-%m-%d")
     datetime_str = now.strftime("%Y-%m-%d_%H-%M-%S")
-    blob_name = f"{user_id}/{date_str}/{datetime_str}.mp4"
+    return f"{user_id}/{date_str}/{datetime_str}_{uuid.uuid4().hex[:8]}.mp4"
 
-    logging.info(f"Iniciando subida del video {video_path} al blob {blob_name}.")
-    try:
-        # Crear el cliente del servicio Blob
-        blob_service_client = BlobServiceClient.from_connection_string(AZURE_STORAGE_CONNECTION_STRING)
-        container_client = blob_service_client.get_container_client(CONTAINER_NAME)
-
-        # Verificar si el contenedor existe
-        if not container_client.exists():
-            logging.error(f"El contenedor {CONTAINER_NAME} no existe.")
-            return False, None
-
-        # Subir el archivo
-        with open(video_path, "rb") as data:
-            blob_client = container_client.get_blob_client(blob_name)
-            blob_client.upload_blob(data, overwrite=True, content_settings=ContentSettings(content_type="video/mp4"))
-            logging.info(f"Video {blob_name} subido exitosamente al contenedor {CONTAINER_NAME}.")
-
-        return blob_name
-    except Exception as e:
-        logging.error(f"Error al subir el video al Blob Storage: {e}")
-        return False, None
+
+# Subir un archivo al Blob Storage con el nombre indicado
+def upload_file_to_blob(file_path, blob_name, content_type):
+    return get_storage().upload_file(file_path, blob_name, content_type)
+
+
+# Destino de una subida directa del cliente al almacenamiento (SAS de escritura o token local)
+def get_blob_upload_url(blob_name, expiry, content_type="video/mp4"):
+    return get_storage().sign_upload_url(blob_name, expiry, content_type)
+
+
+# Guardar lo que se lee de un stream (PUT /media con el backend local)
+def upload_stream_to_blob(stream, blob_name, content_type):
+    return get_storage().upload_stream(stream, blob_name, content_type)
 
 
 # Eliminar video del Blob Storage
 def delete_video_from_blob(blob_name):
     logging.info(f"Iniciando eliminación del video {blob_name}.")
-    try:
-        blob_service_client = BlobServiceClient.from_connection_string(AZURE_STORAGE_CONNECTION_STRING)
-        container_client = blob_service_client.get_container_client(CONTAINER_NAME)
+    return delete_blobs([blob_name]) == 1
 
-        blob_client = container_client.get_blob_client(blob_name)
-        blob_client.delete_blob()
-        logging.info(f"Video {blob_name} eliminado exitosamente del contenedor {CONTAINER_NAME}.")
 
-        return True
-    except Exception as e:
-        logging.error(f"Error al eliminar el video del Blob Storage: {e}")
-        return False
+# Eliminar muchos blobs (en Azure, con la Blob Batch API: hasta 256 por llamada, lotes en paralelo)
+def delete_blobs(blob_names, max_workers=4):
+    """
+    Devuelve la cantidad de blobs eliminados (los que ya no existían cuentan como eliminados).
+    """
+    blob_names = list(dict.fromkeys(name for name in blob_names if name))
+    if not blob_names:
+        return 0
+
+    deleted = get_storage().delete_many(blob_names, max_workers=max_workers)
+    logging.info(f"Blobs eliminados: {deleted}/{len(blob_names)}.")
+    return deleted
 
 
 # Obtener video del Blob Storage
 def download_video_from_blob(blob_name, download_path):
-    logging.info(f"Iniciando descarga del video {blob_name} a {download_path}.")
-    try:
-        blob_service_client = BlobServiceClient.from_connection_string(AZURE_STORAGE_CONNECTION_STRING)
-        container_client = blob_service_client.get_container_client(CONTAINER_NAME)
+    return get_storage().download_to(blob_name, download_path)
 
-        blob_client = container_client.get_blob_client(blob_name)
-        with open(download_path, "wb") as file:
-            download_stream = blob_client.download_blob()
-            file.write(download_stream.readall())
-            logging.info(f"Video {blob_name} descargado exitosamente en {download_path}.")
 
-        return True
-    except Exception as e:
-        logging.error(f"Error al descargar el video del Blob Storage: {e}")
-        return False
+# Tamaño en bytes de un blob (None si no existe o hay error)
+def get_blob_size(blob_name):
+    return get_storage().size(blob_name)
 
 
-# Listar todos los videos en el Blob Storage
-def list_videos_in_blob():
-    logging.info(f"Listando videos en el contenedor {CONTAINER_NAME}.")
-    try:
-        blob_service_client = BlobServiceClient.from_connection_string(AZURE_STORAGE_CONNECTION_STRING)
-        container_client = blob_service_client.get_container_client(CONTAINER_NAME)
+# Leer un rango de bytes de un blob por chunks
+def iter_blob_range(blob_name, offset, length, chunk_size=4 * 1024 * 1024):
+    return get_storage().iter_range(blob_name, offset, length, chunk_size)
 
-        blob_list = container_client.list_blobs()
-        videos = [blob.name for blob in blob_list]
-        logging.info(f"Videos encontrados: {videos}")
 
-        return videos
-    except Exception as e:
-        logging.error(f"Error al listar los videos del Blob Storage: {e}")
-        return []
-    
+# Ruta en disco del blob con el backend local (None con Azure o si no existe)
+def get_local_blob_path(blob_name):
+    return get_storage().local_path(blob_name)
+
+
+# Sufijos de los derivados de cada clip (poster y vista previa, ver media_worker)
+POSTER_SUFFIX = ".poster.jpg"
+PREVIEW_SUFFIX = ".preview.webp"
+MEDIA_DERIVATIVE_SUFFIXES = (POSTER_SUFFIX, PREVIEW_SUFFIX)
+
+
+def video_blob_prefix(user_id=None, day=None):
+    """
+    Prefijo de los videos según el esquema <user_id>/<YYYY-MM-DD>/ de upload_video_to_blob.
+    """
+    if user_id is None:
+        return ""
+    if day is None:
+        return f"{user_id}/"
+    return f"{user_id}/{day.strftime('%Y-%m-%d') if isinstance(day, datetime.date) else day}/"
+
+
+def iter_blob_pages(prefix="", page_size=BLOB_LIST_PAGE_SIZE, continuation_token=None):
+    """
+    Recorre el contenedor de a una página por vez, filtrando por prefijo en el servidor.
+
+    Genera tuplas (blobs, next_token): la lista de StoredObject (name, size, last_modified)
+    de la página y el continuation token para pedir la siguiente (None en la última). El
+    token puede devolverse a un cliente para paginar sin mantener estado en la API.
+    """
+    return get_storage().iter_pages(prefix, page_size, continuation_token)
+
+
+def iter_videos_in_blob(user_id=None, day=None, page_size=BLOB_LIST_PAGE_SIZE):
+    """
+    Genera los StoredObject de los videos de un usuario (y opcionalmente de un día)
+    sin cargar el listado completo en memoria.
+    """
+    prefix = video_blob_prefix(user_id, day)
+    logging.info(f"Listando videos ({STORAGE_BACKEND}) con prefijo '{prefix}'.")
+    count = 0
+    for blobs, _ in iter_blob_pages(prefix, page_size):
+        count += len(blobs)
+        yield from blobs
+    logging.info(f"Listado de '{prefix}' terminado: {count} blobs.")
+
+
+def summarize_videos_by_day(user_id, start_day=None, end_day=None, page_size=BLOB_LIST_PAGE_SIZE):
+    """
+    Cantidad de videos y bytes por día de un usuario: {'YYYY-MM-DD': {'count', 'bytes'}}.
+    No cuenta los posters ni las vistas previas que se guardan junto a cada clip.
+
+    Con start_day y end_day se consulta un prefijo por día del rango, así solo se
+    recorren los blobs de esos días. Con uno solo, el rango queda abierto del otro lado
+    (se recorre el prefijo del usuario y se filtra por día). Solo se acumulan los
+    totales, nunca los nombres.
+    """
+    if start_day is not None and end_day is not None:
+        days = [start_day + datetime.timedelta(days=offset) for offset in range((end_day - start_day).days + 1)]
+        prefixes = [video_blob_prefix(user_id, day) for day in days]
+    else:
+        prefixes = [video_blob_prefix(user_id)]
+    first = start_day.strftime('%Y-%m-%d') if start_day is not None else None
+    last = end_day.strftime('%Y-%m-%d') if end_day is not None else None
+
+    summary = {}
+    for prefix in prefixes:
+        for blobs, _ in iter_blob_pages(prefix, page_size):
+            for blob in blobs:
+                if blob.name.endswith(MEDIA_DERIVATIVE_SUFFIXES):
+                    continue
+                # <user_id>/<YYYY-MM-DD>/<archivo>
+                parts = blob.name.split("/")
+                day = parts[1] if len(parts) > 2 else ""
+                if (first is not None and day < first) or (last is not None and day > last):
+                    continue
+                totals = summary.setdefault(day, {'count': 0, 'bytes': 0})
+                totals['count'] += 1
+                totals['bytes'] += blob.size or 0
+    return dict(sorted(summary.items()))
+
 def get_blob_sas_url(blob_path):
-    logging.info(f"Generando SAS URL para el blob {blob_path}.")
+    return get_blob_sas_urls([blob_path]).get(blob_path)
+
+
+def get_blob_sas_urls(blob_names, cache=True):
+    """
+    Devuelve {blob_name: sas_url} con permisos de lectura para un lote de blobs.
+
+    Las firmas vigentes se toman de la caché; las demás se generan con una única
+    expiración para todo el lote. Los valores que ya son URL (alertas antiguas que
+    guardaban la SAS URL completa) se devuelven tal cual. Con el backend local son URLs
+    firmadas con HMAC que sirve la propia API (ver media_controller).
+
+    Con cache=False las firmas nuevas no se guardan (exportaciones masivas que, si no,
+    desplazarían de la caché las firmas que se reutilizan).
+    """
+    now = datetime.datetime.now(datetime.timezone.utc)
+    urls = {}
+    missing = []
+
+    with _sas_cache_lock:
+        for blob_name in blob_names:
+            if not blob_name or blob_name in urls:
+                continue
+            if blob_name.startswith(("http://", "https://")):
+                urls[blob_name] = blob_name
+                continue
+            cached = _sas_cache.get(blob_name)
+            if cached and cached[1] - SAS_URL_REFRESH_MARGIN > now:
+                urls[blob_name] = cached[0]
+            else:
+                missing.append(blob_name)
+
+    if not missing:
+        return urls
+
     try:
-        blob_service_client = BlobServiceClient.from_connection_string(AZURE_STORAGE_CONNECTION_STRING)
-
-        # Generar un SAS token con permisos de lectura
-        sas_token = generate_blob_sas(
-            account_name=blob_service_client.account_name,
-            container_name=CONTAINER_NAME,
-            blob_name=blob_path,
-            account_key=blob_service_client.credential.account_key,
-            permission=BlobSasPermissions(read=True),
-            expiry=datetime.datetime.now() + datetime.timedelta(days=30) 
-        )
-
-        sas_url = f"https://{blob_service_client.account_name}.blob.core.windows.net/{CONTAINER_NAME}/{blob_path}?{sas_token}"
-        logging.info(f"SAS URL generada: {sas_url}")
-
-        return sas_url
+        expiry = now + SAS_URL_TTL
+        signed = get_storage().sign_urls(set(missing), expiry)
     except Exception as e:
-        logging.error(f"Error al generar la SAS URL: {e}")
-        return None
-    
\ No newline at end of file
+        logging.error(f"Error al generar las SAS URL: {e}")
+        return urls
+
+    if not cache:
+        urls.update(signed)
+        return urls
+
+    with _sas_cache_lock:
+        if len(_sas_cache) + len(signed) > SAS_CACHE_MAX_ENTRIES:
+            # Descartar primero las firmas que ya no se pueden reutilizar; si no alcanza, vaciar
+            for blob_name in [name for name, (_, exp) in _sas_cache.items() if exp - SAS_URL_REFRESH_MARGIN <= now]:
+                del _sas_cache[blob_name]
+            if len(_sas_cache) + len(signed) > SAS_CACHE_MAX_ENTRIES:
+                _sas_cache.clear()
+        for blob_name, sas_url in signed.items():
+            _sas_cache[blob_name] = (sas_url, expiry)
+
+    urls.update(signed)
+    return urls
@@ -0,0 +1,810 @@
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+import uuid
+from datetime import datetime
+
+import cv2
+import numpy as np
+from cryptography.fernet import Fernet, InvalidToken
+from dotenv import load_dotenv
+
+from app.services.alert_ingest import TEMP_VIDEO_DIR, create_alerts_from_file
+from app.services.clip_assembler import ClipAssembler, av
+from app.services.frame_ring import FrameRing
+from app.services.media_worker import shutdown_media_executor
+from app.services.upload_stream import file_sha256
+from app.services.zone_masks import ZoneMaskSet
+
+
+load_dotenv()
+
+FERNET_KEY = os.getenv('FERNET_KEY')
+
+# Procesos de análisis: las cámaras activas se reparten entre ellos (un hilo por cámara)
+CAMERA_WORKERS = int(os.getenv("CAMERA_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+# threads: cada proceso decodifica y analiza sus cámaras. shm: procesos decodificadores
+# y analizadores separados que se pasan los cuadros por un anillo en memoria compartida
+# (FrameRing); el análisis escala aparte de la decodificación
+CAMERA_PIPELINE = os.getenv("CAMERA_PIPELINE", "threads").lower()
+# Procesos analizadores con CAMERA_PIPELINE=shm
+CAMERA_ANALYZERS = int(os.getenv("CAMERA_ANALYZERS", str(CAMERA_WORKERS)))
+# Cuadros analizados por segundo de video. Todos los cuadros se decodifican (con el backend
+# FFmpeg de OpenCV grab() también decodifica); el resto solo se ahorra la conversión de
+# retrieve()/to_ndarray() y el análisis
+CAMERA_ANALYSIS_FPS = float(os.getenv("CAMERA_ANALYSIS_FPS", "5"))
+# Detección de movimiento: ancho de la imagen reducida y fracción mínima de los píxeles de
+# una zona que deben cambiar para considerar que hay movimiento en ella
+CAMERA_MOTION_WIDTH = int(os.getenv("CAMERA_MOTION_WIDTH", "320"))
+CAMERA_MOTION_THRESHOLD = float(os.getenv("CAMERA_MOTION_THRESHOLD", "0.01"))
+# Detector de personas que corre solo sobre los cuadros con movimiento: hog (OpenCV, CPU),
+# yolo (ultralytics) o none (el movimiento alcanza para alertar en todas las zonas)
+CAMERA_PERSON_DETECTOR = os.getenv("CAMERA_PERSON_DETECTOR", "hog").lower()
+CAMERA_YOLO_MODEL = os.getenv("CAMERA_YOLO_MODEL", "yolov8n.pt")
+CAMERA_PERSON_CONFIDENCE = float(os.getenv("CAMERA_PERSON_CONFIDENCE", "0.5"))
+CAMERA_DETECTION_WIDTH = int(os.getenv("CAMERA_DETECTION_WIDTH", "640"))
+# Clip que se graba a partir de la detección y pausa mínima entre alertas de una zona
+CAMERA_CLIP_SECONDS = float(os.getenv("CAMERA_CLIP_SECONDS", "10"))
+CAMERA_CLIP_FOURCC = os.getenv("CAMERA_CLIP_FOURCC", "mp4v")
+# remux: el stream se lee con PyAV y el clip se arma con los paquetes originales, con
+# pre-roll (CAMERA_PREROLL_SECONDS) y sin recodificar. encode: OpenCV recodifica los
+# cuadros posteriores a la detección (también si PyAV no está instalado)
+CAMERA_CLIP_MODE = os.getenv("CAMERA_CLIP_MODE", "remux").lower()
+# Con zonas superpuestas, cada persona cuenta solo en la zona más chica que la contiene
+# (evita una alerta por cada zona que cubre el mismo lugar)
+CAMERA_PRIMARY_ZONE_ONLY = os.getenv("CAMERA_PRIMARY_ZONE_ONLY", "true").lower() == "true"
+CAMERA_ALERT_COOLDOWN_SECONDS = float(os.getenv("CAMERA_ALERT_COOLDOWN_SECONDS", "60"))
+CAMERA_RECONNECT_SECONDS = float(os.getenv("CAMERA_RECONNECT_SECONDS", "5"))
+# Cada cuánto se releen las zonas de la cámara (cambios hechos desde la API)
+CAMERA_CONFIG_REFRESH_SECONDS = float(os.getenv("CAMERA_CONFIG_REFRESH_SECONDS", "60"))
+# Las coordenadas de las zonas son píxeles del cuadro de la cámara; si se dibujaron sobre
+# una imagen de otro tamaño se indica aquí ("1280x720") y se escalan
+ZONE_COORDS_REFERENCE = os.getenv("ZONE_COORDS_REFERENCE", "")
+
+
+def decrypt_stream_url(camera):
+    """
+    URL del stream de la cámara (rtsp_url se guarda cifrado con Fernet). Admite cualquier
+    fuente que abra OpenCV: rtsp://, http:// (MJPEG) o la ruta de un archivo local.
+    """
+    if not camera.rtsp_url:
+        return None
+    try:
+        return Fernet(FERNET_KEY).decrypt(camera.rtsp_url.encode()).decode()
+    except InvalidToken:
+        logging.error(f"Cámara {camera.id}: no se pudo descifrar rtsp_url.")
+        return None
+
+
+class MotionGate:
+    """
+    Filtro barato previo a la detección: compara cada cuadro (reducido, en grises y
+    suavizado) con un fondo que se actualiza de a poco, y mide qué fracción de píxeles
+    cambió.
+    """
+
+    def __init__(self, threshold=CAMERA_MOTION_THRESHOLD, width=CAMERA_MOTION_WIDTH, learning_rate=0.05):
+        self.threshold = threshold
+        self.width = width
+        self.learning_rate = learning_rate
+        self.background = None
+
+    def mask(self, frame):
+        """
+        Píxeles que cambiaron (255) sobre la imagen reducida, o None en el primer cuadro.
+        """
+        height, width = frame.shape[:2]
+        small = cv2.resize(frame, (self.width, max(1, int(height * self.width / width))), interpolation=cv2.INTER_AREA)
+        gray = cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (21, 21), 0)
+        if self.background is None or self.background.shape != gray.shape:
+            self.background = gray.astype(np.float32)
+            return None
+
+        diff = cv2.absdiff(gray, cv2.convertScaleAbs(self.background))
+        cv2.accumulateWeighted(gray, self.background, self.learning_rate)
+        _, moving = cv2.threshold(diff, 25, 255, cv2.THRESH_BINARY)
+        return moving
+
+    def score(self, frame):
+        moving = self.mask(frame)
+        return 0.0 if moving is None else cv2.countNonZero(moving) / moving.size
+
+    def moving(self, frame):
+        return self.score(frame) >= self.threshold
+
+
+class HogPersonDetector:
+    """
+    Detector de personas HOG + SVM incluido en OpenCV: sin dependencias extra, apto para CPU.
+    """
+
+    def __init__(self, width=CAMERA_DETECTION_WIDTH, min_weight=CAMERA_PERSON_CONFIDENCE):
+        if not hasattr(cv2, "HOGDescriptor"):
+            # OpenCV 5 movió HOG fuera del paquete principal
+            raise RuntimeError("Esta versión de OpenCV no incluye HOGDescriptor: usar CAMERA_PERSON_DETECTOR=yolo o none.")
+        self.width = width
+        self.min_weight = min_weight
+        self.hog = cv2.HOGDescriptor()
+        self.hog.setSVMDetector(cv2.HOGDescriptor_getDefaultPeopleDetector())
+
+    def detect(self, frame):
+        height, width = frame.shape[:2]
+        scale = min(1.0, self.width / width)
+        small = cv2.resize(frame, (int(width * scale), int(height * scale))) if scale < 1.0 else frame
+        rects, weights = self.hog.detectMultiScale(small, winStride=(8, 8), padding=(8, 8), scale=1.05)
+        return [
+            (x / scale, y / scale, (x + w) / scale, (y + h) / scale)
+            for (x, y, w, h), weight in zip(rects, np.ravel(weights)) if weight >= self.min_weight
+        ]
+
+
+class YoloPersonDetector:
+    """
+    Detector YOLO de ultralytics (clase 0, persona). Más preciso que HOG; conviene con GPU.
+    """
+
+    def __init__(self, model_path=CAMERA_YOLO_MODEL, confidence=CAMERA_PERSON_CONFIDENCE):
+        from ultralytics import YOLO
+
+        self.model = YOLO(model_path)
+        self.confidence = confidence
+
+    def detect(self, frame):
+        result = self.model.predict(frame, classes=[0], conf=self.confidence, verbose=False)[0]
+        return [tuple(box) for box in result.boxes.xyxy.cpu().numpy().tolist()]
+
+
+def make_person_detector(name=CAMERA_PERSON_DETECTOR):
+    if name == "none":
+        return None
+    if name == "yolo":
+        return YoloPersonDetector()
+    if name == "hog":
+        return HogPersonDetector()
+    raise ValueError(f"CAMERA_PERSON_DETECTOR desconocido: {name}")
+
+
+def _coords_scale(frame_width, frame_height):
+    if not ZONE_COORDS_REFERENCE:
+        return 1.0, 1.0
+    reference_width, reference_height = (int(value) for value in ZONE_COORDS_REFERENCE.lower().split("x", 1))
+    return frame_width / reference_width, frame_height / reference_height
+
+
+class ZoneWatch:
+    """
+    Estado de una zona en el worker. La zona alerta cuando hay personas durante
+    alert_threshold segundos seguidos, dentro del horario y fuera del período de pausa
+    desde la última alerta.
+    """
+
+    def __init__(self, zone):
+        self.zone_id = zone.id
+        self.schedule_start = zone.schedule_start
+        self.schedule_end = zone.schedule_end
+        self.dwell_seconds = max(0, zone.alert_threshold or 0)
+        self.present_since = None
+        self.last_alert = None
+
+    def in_schedule(self, now):
+        current = now.time()
+        if self.schedule_start <= self.schedule_end:
+            return self.schedule_start <= current <= self.schedule_end
+        # Horario que cruza la medianoche (22:00 - 06:00)
+        return current >= self.schedule_start or current <= self.schedule_end
+
+    def observe(self, people, clock):
+        """
+        Registra cuántas personas hay en la zona en el instante clock (segundos). Devuelve
+        True si corresponde alertar.
+        """
+        if people == 0:
+            self.present_since = None
+            return False
+        if self.present_since is None:
+            self.present_since = clock
+        if clock - self.present_since < self.dwell_seconds:
+            return False
+        if self.last_alert is not None and clock - self.last_alert < CAMERA_ALERT_COOLDOWN_SECONDS:
+            return False
+        self.last_alert = clock
+        return True
+
+
+class ClipRecorder:
+    """
+    Graba los cuadros posteriores a una detección en un MP4 temporal.
+    """
+
+    def __init__(self, fps, width, height, seconds=CAMERA_CLIP_SECONDS):
+        self.path = os.path.join(TEMP_VIDEO_DIR, f"camera_{uuid.uuid4().hex}.mp4")
+        self.writer = cv2.VideoWriter(self.path, cv2.VideoWriter_fourcc(*CAMERA_CLIP_FOURCC), fps, (width, height))
+        self.remaining = max(1, int(round(fps * seconds)))
+        self.zones = {}  # zone_id -> personas en la zona al detectar
+
+    def write(self, frame):
+        self.writer.write(frame)
+        self.remaining -= 1
+        return self.remaining <= 0
+
+    def close(self):
+        self.writer.release()
+        return self.path
+
+
+def load_camera(camera_id):
+    """
+    (url, user_id, zonas) de una cámara activa; (None, None, []) si no existe o no está
+    activa. Requiere un contexto de la app.
+    """
+    from app import db
+    from app.cameras.models.CamerasModel import CamerasModel
+
+    camera = db.session.get(CamerasModel, camera_id)
+    if camera is None or camera.status != 'active':
+        return None, None, []
+    url = decrypt_stream_url(camera)
+    zones = list(camera.zones)
+    user_id = camera.user_id
+    db.session.remove()
+    return url, user_id, zones
+
+
+class CameraAnalyzer:
+    """
+    Análisis de los cuadros de una cámara: mide el movimiento dentro de cada zona,
+    detecta personas solo si alguna zona activa tiene movimiento y cuenta las personas
+    por zona. Las zonas se evalúan con sus máscaras rasterizadas (ZoneMaskSet): una
+    operación por cuadro para todas las zonas. Una persona está en la zona si el punto
+    medio del borde inferior de su caja (los pies) cae dentro. El detector se comparte
+    entre las cámaras del proceso.
+    """
+
+    def __init__(self, zones, width, height, detector, detector_lock, stats):
+        self.width = width
+        self.height = height
+        self.motion = MotionGate()
+        self.detector = detector
+        self.detector_lock = detector_lock
+        self.stats = stats
+        self.watches = []
+        self.refresh(zones)
+
+    def refresh(self, zones):
+        self.zones = zones
+        self.watches = _refresh_watches(self.watches, zones)
+        self.frame_masks = ZoneMaskSet(zones, self.width, self.height, *_coords_scale(self.width, self.height))
+        self.motion_masks = None
+
+    def _motion_masks(self, moving):
+        # Máscaras a la resolución reducida del filtro de movimiento
+        height, width = moving.shape
+        if self.motion_masks is None or (self.motion_masks.width, self.motion_masks.height) != (width, height):
+            scale_x, scale_y = _coords_scale(self.width, self.height)
+            self.motion_masks = ZoneMaskSet(
+                self.zones, width, height, scale_x * width / self.width, scale_y * height / self.height
+            )
+        return self.motion_masks
+
+    def watch_state(self):
+        """
+        Estado de las zonas (presencia y última alerta) para deshacer un análisis con
+        restore_watches.
+        """
+        return [(watch.present_since, watch.last_alert) for watch in self.watches]
+
+    def restore_watches(self, state):
+        for watch, (present_since, last_alert) in zip(self.watches, state):
+            watch.present_since = present_since
+            watch.last_alert = last_alert
+
+    def analyze(self, frame, clock):
+        """
+        Devuelve {zone_id: personas} de las zonas que deben alertar en este cuadro.
+        """
+        self.stats['analyzed'] += 1
+        now = datetime.now()
+        active = [watch for watch in self.watches if watch.in_schedule(now)]
+        # Sin movimiento no se detecta, salvo que ya haya alguien en una zona: una persona
+        # quieta se funde con el fondo y cortaría el conteo de alert_threshold
+        tracking = any(watch.present_since is not None for watch in active)
+        moving = self.motion.mask(frame)
+        if moving is None:
+            in_motion = set()
+        else:
+            masks = self._motion_masks(moving)
+            in_motion = {
+                zone_id for zone_id, fraction in zip(masks.zone_ids, masks.occupancy(moving))
+                if fraction >= self.motion.threshold
+            }
+        active_ids = {watch.zone_id for watch in active}
+        if not (active_ids & in_motion or tracking):
+            for watch in self.watches:
+                watch.observe(0, clock)
+            return {}
+        self.stats['motion'] += 1
+
+        if self.detector is None:
+            counts = {zone_id: 1 for zone_id in active_ids & in_motion}
+        else:
+            with self.detector_lock:
+                boxes = self.detector.detect(frame)
+            self.stats['detections'] += 1
+            feet = [((x1 + x2) / 2, y2) for x1, _, x2, y2 in boxes]
+            counts = self.frame_masks.counts(feet, active_ids, primary_only=CAMERA_PRIMARY_ZONE_ONLY)
+
+        triggered = {}
+        for watch in self.watches:
+            people = counts.get(watch.zone_id, 0)
+            if watch.observe(people, clock):
+                triggered[watch.zone_id] = people
+        return triggered
+
+
+class CameraRunner(threading.Thread):
+    """
+    Lee el stream de una cámara y crea alertas: decodifica todos los cuadros pero solo
+    convierte los que se analizan, y cuando una zona alerta arma el clip (con PyAV, con
+    los paquetes del pre-roll y sin recodificar; con OpenCV, recodificando los cuadros
+    siguientes).
+
+    Sin ring, analiza los cuadros en el mismo hilo (CameraAnalyzer). Con ring, los
+    publica en su slot del anillo para un proceso analizador y recibe por triggers las
+    zonas que deben alertar.
+    """
+
+    def __init__(self, app, camera_id, detector, detector_lock, stop_event, once=False,
+                 ring=None, ring_slot=None, triggers=None):
+        super().__init__(name=f"camera-{camera_id}", daemon=True)
+        self.app = app
+        self.camera_id = camera_id
+        self.detector = detector
+        self.detector_lock = detector_lock
+        self.stop_event = stop_event
+        self.once = once
+        self.ring = ring
+        self.ring_slot = ring_slot
+        self.triggers = triggers
+        if ring is None:
+            self.stats = {'decoded': 0, 'analyzed': 0, 'motion': 0, 'detections': 0, 'alerts': 0}
+        else:
+            self.stats = {'decoded': 0, 'published': 0, 'alerts': 0}
+        self.ingest_threads = []
+
+    def run(self):
+        if self.ring is not None:
+            self.ring.reopen_camera(self.ring_slot)
+        with self.app.app_context():
+            try:
+                self._run()
+            except Exception as e:
+                logging.exception(f"Cámara {self.camera_id}: error en el worker: {e}")
+        if self.ring is not None:
+            self.ring.close_camera(self.ring_slot)
+        for thread in self.ingest_threads:
+            thread.join()
+        logging.info(f"Cámara {self.camera_id}: detenida. {self.stats}")
+
+    def _run(self):
+        url, user_id, zones = load_camera(self.camera_id)
+        if url is None:
+            logging.info(f"Cámara {self.camera_id}: sin stream configurado.")
+            return
+        is_file = os.path.exists(url)
+        remux = CAMERA_CLIP_MODE == "remux" and av is not None
+        if CAMERA_CLIP_MODE == "remux" and av is None:
+            logging.warning(f"Cámara {self.camera_id}: PyAV no está instalado, los clips se recodifican.")
+
+        while not self.stop_event.is_set():
+            capture = _open_container(url) if remux else cv2.VideoCapture(url)
+            if capture is None or (not remux and not capture.isOpened()):
+                logging.error(f"Cámara {self.camera_id}: no se pudo abrir el stream, reintentando.")
+                if self.once:
+                    return
+                self.stop_event.wait(CAMERA_RECONNECT_SECONDS)
+                continue
+            try:
+                if remux:
+                    finished = self._read_packets(capture, user_id, zones, is_file)
+                else:
+                    finished = self._read(capture, user_id, zones, is_file)
+            finally:
+                if remux:
+                    capture.close()
+                else:
+                    capture.release()
+            if finished or self.once:
+                return
+            self.stop_event.wait(CAMERA_RECONNECT_SECONDS)
+            url, user_id, zones = load_camera(self.camera_id)
+            if url is None:
+                return
+
+    def _read(self, capture, user_id, zones, is_file):
+        """
+        Lee hasta que el stream se corta. Devuelve True si terminó un archivo local.
+        """
+        fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+        skip = max(1, int(round(fps / CAMERA_ANALYSIS_FPS)))
+        width = int(capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        analyzer = None
+        if self.ring is None:
+            analyzer = CameraAnalyzer(zones, width, height, self.detector, self.detector_lock, self.stats)
+        recorder = None
+        frame_index = 0
+        started = time.monotonic()
+        refreshed = started
+
+        while not self.stop_event.is_set():
+            if not capture.grab():
+                break
+            frame_index += 1
+            self.stats['decoded'] += 1
+            analyze = frame_index % skip == 0
+            if recorder is None and not analyze:
+                continue
+
+            ok, frame = capture.retrieve()
+            if not ok:
+                continue
+            # Con archivos el reloj es el tiempo del video (se procesan más rápido que en vivo)
+            clock = frame_index / fps if is_file else time.monotonic() - started
+
+            if recorder is not None and recorder.write(frame):
+                self._ingest(user_id, recorder)
+                recorder = None
+
+            triggered = self._frame_triggers(analyzer, frame, clock, analyze)
+            if triggered:
+                if recorder is None:
+                    recorder = ClipRecorder(fps, width, height)
+                    recorder.write(frame)
+                recorder.zones.update(triggered)
+
+            if not is_file and time.monotonic() - refreshed > CAMERA_CONFIG_REFRESH_SECONDS:
+                refreshed = time.monotonic()
+                _, user_id, zones = load_camera(self.camera_id)
+                if analyzer is not None:
+                    analyzer.refresh(zones)
+
+        if recorder is not None:
+            self._ingest(user_id, recorder)
+        return is_file and not self.stop_event.is_set()
+
+    def _read_packets(self, container, user_id, zones, is_file):
+        """
+        Como _read, con PyAV: cada paquete pasa por el pre-roll antes de decodificarse y
+        el clip se arma con los paquetes originales. Solo los cuadros a analizar se
+        convierten a arreglos NumPy.
+        """
+        stream = container.streams.video[0]
+        stream.thread_type = "AUTO"
+        fps = float(stream.average_rate or stream.guessed_rate or 25.0)
+        skip = max(1, int(round(fps / CAMERA_ANALYSIS_FPS)))
+        assembler = ClipAssembler(stream, fps, CAMERA_CLIP_SECONDS)
+        analyzer = None
+        frame_index = 0
+        started = time.monotonic()
+        refreshed = started
+
+        try:
+            for packet in container.demux(stream):
+                if self.stop_event.is_set():
+                    break
+                clip = assembler.add(packet)
+                if clip is not None:
+                    self._ingest(user_id, clip)
+
+                for frame in packet.decode():
+                    frame_index += 1
+                    self.stats['decoded'] += 1
+                    analyze = frame_index % skip == 0
+                    image = None
+                    if analyze:
+                        image = frame.to_ndarray(format="bgr24")
+                        if analyzer is None and self.ring is None:
+                            analyzer = CameraAnalyzer(
+                                zones, frame.width, frame.height, self.detector, self.detector_lock, self.stats
+                            )
+                    clock = frame_index / fps if is_file else time.monotonic() - started
+                    triggered = self._frame_triggers(analyzer, image, clock, analyze)
+                    if triggered:
+                        assembler.trigger(triggered, frame.time)
+
+                if not is_file and time.monotonic() - refreshed > CAMERA_CONFIG_REFRESH_SECONDS:
+                    refreshed = time.monotonic()
+                    _, user_id, zones = load_camera(self.camera_id)
+                    if analyzer is not None:
+                        analyzer.refresh(zones)
+        except av.FFmpegError as e:
+            logging.error(f"Cámara {self.camera_id}: stream cortado: {e.strerror}")
+
+        clip = assembler.flush()
+        if clip is not None:
+            self._ingest(user_id, clip)
+        return is_file and not self.stop_event.is_set()
+
+    def _frame_triggers(self, analyzer, frame, clock, analyze):
+        """
+        Zonas que alertan en este cuadro: las analiza aquí o, con el anillo, publica el
+        cuadro y junta lo que respondieron los analizadores.
+        """
+        if self.ring is None:
+            return analyzer.analyze(frame, clock) if analyze else {}
+        if analyze:
+            self.ring.write(self.ring_slot, frame, clock)
+            self.stats['published'] += 1
+        return self._received_triggers()
+
+    def _received_triggers(self):
+        # Zonas que los analizadores marcaron desde el último cuadro leído
+        triggered = {}
+        while True:
+            try:
+                triggered.update(self.triggers.get_nowait())
+            except queue.Empty:
+                return triggered
+
+    def _ingest(self, user_id, recorder):
+        path = recorder.close()
+        zones = dict(recorder.zones)
+        self.stats['alerts'] += len(zones)
+        # La subida y las notificaciones no frenan la lectura del stream
+        thread = threading.Thread(target=self._create_alerts, args=(user_id, path, zones), daemon=True)
+        thread.start()
+        self.ingest_threads = [thread for thread in self.ingest_threads if thread.is_alive()] + [thread]
+
+    def _create_alerts(self, user_id, path, zones):
+        from app import db
+        from app.cameras.models.CamerasModel import ZonesModel
+
+        with self.app.app_context():
+            try:
+                # Un solo clip para todas las zonas que dispararon: se sube una vez y se
+                # notifica al chat de cada zona
+                triggered = []
+                for zone_id, people in zones.items():
+                    zone = db.session.get(ZonesModel, zone_id)
+                    if zone is not None:
+                        triggered.append((zone, max(1, people)))
+                if triggered:
+                    create_alerts_from_file(user_id, triggered, path, file_sha256(path))
+            except Exception as e:
+                db.session.rollback()
+                logging.error(f"Cámara {self.camera_id}: error al crear la alerta: {e}")
+            finally:
+                db.session.remove()
+                os.remove(path)
+
+
+def _open_container(url):
+    options = {"rtsp_transport": "tcp"} if url.startswith("rtsp") else {}
+    try:
+        return av.open(url, options=options, timeout=(CAMERA_RECONNECT_SECONDS * 2, CAMERA_RECONNECT_SECONDS * 2))
+    except av.FFmpegError as e:
+        # Sin la URL en el log: puede llevar credenciales
+        logging.error(f"PyAV no pudo abrir el stream: {e.strerror}")
+        return None
+
+
+def _refresh_watches(watches, zones):
+    # Conservar el estado (presencia y última alerta) de las zonas que siguen existiendo
+    previous = {watch.zone_id: watch for watch in watches}
+    refreshed = []
+    for zone in zones:
+        watch = ZoneWatch(zone)
+        if zone.id in previous:
+            watch.present_since = previous[zone.id].present_since
+            watch.last_alert = previous[zone.id].last_alert
+        refreshed.append(watch)
+    return refreshed
+
+
+def run_camera_group(camera_ids, once=False, ring_spec=None, ring_slots=None, events=None):
+    """
+    Proceso de un grupo de cámaras: un hilo por cámara (la decodificación libera el GIL)
+    y un detector compartido. Termina con SIGTERM/SIGINT o, con once, al agotar los
+    archivos locales.
+
+    Con ring_spec el proceso solo decodifica: publica los cuadros a analizar en el slot
+    ring_slots[camera_id] del anillo y recibe por events las alertas de los analizadores.
+    """
+    from app import create_app
+
+    app = create_app()
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+    signal.signal(signal.SIGINT, lambda *_: stop_event.set())
+
+    ring = FrameRing.attach(ring_spec) if ring_spec else None
+    detector = make_person_detector() if ring is None else None
+    detector_lock = threading.Lock()
+    triggers = {camera_id: queue.Queue() for camera_id in camera_ids} if ring else {}
+    runners = [
+        CameraRunner(
+            app, camera_id, detector, detector_lock, stop_event, once,
+            ring=ring, ring_slot=ring_slots[camera_id] if ring else None, triggers=triggers.get(camera_id)
+        )
+        for camera_id in camera_ids
+    ]
+    for runner in runners:
+        runner.start()
+    if ring is not None:
+        threading.Thread(target=_dispatch_events, args=(events, triggers, stop_event), daemon=True).start()
+    while any(runner.is_alive() for runner in runners):
+        for runner in runners:
+            runner.join(timeout=1)
+    stop_event.set()
+    shutdown_media_executor()
+    if ring is not None:
+        ring.close()
+    return {runner.camera_id: runner.stats for runner in runners}
+
+
+def _dispatch_events(events, triggers, stop_event):
+    # Reparte las alertas de los analizadores ((camera_id, {zone_id: personas})) a los
+    # hilos de cada cámara
+    while not stop_event.is_set():
+        try:
+            camera_id, triggered = events.get(timeout=0.5)
+        except queue.Empty:
+            continue
+        if camera_id in triggers:
+            triggers[camera_id].put(triggered)
+
+
+def run_analyzer_group(ring_spec, cameras, events, once=False):
+    """
+    Proceso analizador con CAMERA_PIPELINE=shm. cameras es una lista de (slot, camera_id,
+    decodificador): analiza el cuadro más reciente de cada slot directamente sobre la
+    memoria compartida y envía las zonas que alertan al decodificador de la cámara, que
+    graba el clip. Termina con SIGTERM/SIGINT o, con once, cuando los decodificadores
+    cerraron todas sus cámaras.
+    """
+    from app import create_app
+
+    app = create_app()
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+    signal.signal(signal.SIGINT, lambda *_: stop_event.set())
+
+    ring = FrameRing.attach(ring_spec)
+    detector = make_person_detector()
+    detector_lock = threading.Lock()
+    stats = {camera_id: {'analyzed': 0, 'motion': 0, 'detections': 0, 'dropped': 0, 'overwritten': 0}
+             for _, camera_id, _ in cameras}
+    analyzers = {}
+    zones = {}
+    last_seq = {slot: 0 for slot, _, _ in cameras}
+    refreshed = None
+
+    with app.app_context():
+        while not stop_event.is_set():
+            if refreshed is None or time.monotonic() - refreshed > CAMERA_CONFIG_REFRESH_SECONDS:
+                refreshed = time.monotonic()
+                for _, camera_id, _ in cameras:
+                    zones[camera_id] = load_camera(camera_id)[2]
+                    if camera_id in analyzers:
+                        analyzers[camera_id].refresh(zones[camera_id])
+
+            idle = True
+            for slot, camera_id, decoder in cameras:
+                item = ring.read(slot, last_seq[slot])
+                if item is None:
+                    continue
+                idle = False
+                seq, frame, clock = item
+                if last_seq[slot]:
+                    stats[camera_id]['dropped'] += seq - last_seq[slot] - 1
+                last_seq[slot] = seq
+
+                analyzer = analyzers.get(camera_id)
+                height, width = frame.shape[:2]
+                if analyzer is None or (analyzer.width, analyzer.height) != (width, height):
+                    analyzer = analyzers[camera_id] = CameraAnalyzer(
+                        zones[camera_id], width, height, detector, detector_lock, stats[camera_id]
+                    )
+                state = analyzer.watch_state()
+                triggered = analyzer.analyze(frame, clock)
+                if not ring.valid(slot, seq):
+                    # El decodificador dio la vuelta al anillo durante el análisis: el
+                    # resultado no vale y se deshace el estado de las zonas, así el cuadro
+                    # siguiente vuelve a evaluarlas (una alerta no se pierde por la pausa)
+                    analyzer.restore_watches(state)
+                    stats[camera_id]['overwritten'] += 1
+                    continue
+                if triggered:
+                    events[decoder].put((camera_id, triggered))
+
+            if idle:
+                if once and all(ring.is_closed(slot) and ring.latest(slot) <= last_seq[slot]
+                                for slot, _, _ in cameras):
+                    break
+                stop_event.wait(0.005)
+
+    for camera_id, camera_stats in stats.items():
+        logging.info(f"Cámara {camera_id}: análisis detenido. {camera_stats}")
+    ring.close()
+    return stats
+
+
+def active_camera_ids():
+    from app.cameras.models.CamerasModel import CamerasModel
+
+    return [camera_id for (camera_id,) in CamerasModel.query.with_entities(CamerasModel.id).filter(
+        CamerasModel.status == 'active', CamerasModel.rtsp_url.isnot(None)
+    ).order_by(CamerasModel.id)]
+
+
+def run_camera_workers(camera_ids, workers=CAMERA_WORKERS, once=False, pipeline=CAMERA_PIPELINE,
+                       analyzers=CAMERA_ANALYZERS):
+    """
+    Reparte las cámaras en grupos (uno por proceso) y reinicia los procesos que terminen
+    con error. Con pipeline="shm" crea además el anillo de cuadros y los procesos
+    analizadores. Requiere un contexto de la app solo para obtener las cámaras.
+    """
+    if not camera_ids:
+        logging.info("Workers de cámaras: no hay cámaras activas con stream.")
+        return
+    if pipeline not in ("threads", "shm"):
+        raise ValueError(f"CAMERA_PIPELINE desconocido: {pipeline}")
+    groups = [camera_ids[i::workers] for i in range(min(workers, len(camera_ids)))]
+    context = multiprocessing.get_context("spawn")
+
+    ring = None
+    targets = []
+    if pipeline == "threads":
+        targets = [(f"cameras-{group[0]}", run_camera_group, (group, once)) for group in groups]
+    else:
+        ring = FrameRing(len(camera_ids))
+        ring_slots = {camera_id: slot for slot, camera_id in enumerate(camera_ids)}
+        events = [context.Queue() for _ in groups]
+        decoder_of = {camera_id: index for index, group in enumerate(groups) for camera_id in group}
+        slots = [(ring_slots[camera_id], camera_id, decoder_of[camera_id]) for camera_id in camera_ids]
+        targets = [
+            (f"decoders-{group[0]}", run_camera_group, (group, once, ring.spec, ring_slots, events[index]))
+            for index, group in enumerate(groups)
+        ] + [
+            (f"analyzers-{index}", run_analyzer_group, (ring.spec, slots[index::analyzers], events, once))
+            for index in range(min(analyzers, len(slots)))
+        ]
+
+    def start(target):
+        name, function, args = target
+        process = context.Process(target=function, args=args, name=name)
+        process.start()
+        logging.info(f"Workers de cámaras: proceso {process.pid} ({name}).")
+        return process
+
+    processes = [(target, start(target)) for target in targets]
+    stopping = threading.Event()
+
+    def stop(*_):
+        stopping.set()
+        for _, process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    try:
+        while processes:
+            time.sleep(1)
+            running = []
+            for target, process in processes:
+                if process.is_alive():
+                    running.append((target, process))
+                elif process.exitcode != 0 and not once and not stopping.is_set():
+                    logging.error(f"Workers de cámaras: el proceso {target[0]} terminó ({process.exitcode}), reiniciando.")
+                    time.sleep(CAMERA_RECONNECT_SECONDS)
+                    running.append((target, start(target)))
+            processes[:] = running
+    finally:
+        if ring is not None:
+            ring.close()
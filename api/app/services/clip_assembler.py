@@ -0,0 +1,180 @@
+import logging
+import os
+import uuid
+from collections import deque, namedtuple
+
+from dotenv import load_dotenv
+
+from app.services.alert_ingest import TEMP_VIDEO_DIR
+
+try:
+    import av
+except ImportError:  # PyAV es opcional: sin él los clips se recodifican con OpenCV
+    av = None
+
+
+load_dotenv()
+
+# Segundos previos a la detección que incluye el clip. Se guardan los paquetes ya
+# codificados (del último keyframe anterior en adelante), no cuadros decodificados
+CAMERA_PREROLL_SECONDS = float(os.getenv("CAMERA_PREROLL_SECONDS", "5"))
+# Tope de memoria del pre-roll por cámara; nunca se descarta el GOP en curso
+CAMERA_PREROLL_MAX_BYTES = int(os.getenv("CAMERA_PREROLL_MAX_BYTES", str(32 * 1024 * 1024)))
+
+# Paquete codificado propio (los datos se copian del demuxer). pts/dts en la base de tiempo
+# del stream de entrada; time en segundos
+EncodedPacket = namedtuple("EncodedPacket", "data pts dts duration keyframe time")
+
+
+class PacketRing:
+    """
+    Últimos seconds segundos de paquetes de una cámara, agrupados por GOP: el primer
+    paquete retenido es siempre un keyframe, así el pre-roll se puede decodificar sin
+    recodificar. Se descartan GOPs enteros, los más viejos primero.
+    """
+
+    def __init__(self, seconds=CAMERA_PREROLL_SECONDS, max_bytes=CAMERA_PREROLL_MAX_BYTES):
+        self.seconds = seconds
+        self.max_bytes = max_bytes
+        self.gops = deque()
+        self.bytes = 0
+
+    def add(self, packet):
+        if packet.keyframe:
+            self.gops.append([])
+        elif not self.gops:
+            # Sin un keyframe previo el paquete no se puede decodificar
+            return
+        self.gops[-1].append(packet)
+        self.bytes += len(packet.data)
+
+        # Conservar el último GOP que empieza antes del corte: cubre el pre-roll completo
+        cutoff = packet.time - self.seconds
+        while len(self.gops) > 1 and (self.gops[1][0].time <= cutoff or self.bytes > self.max_bytes):
+            self.bytes -= sum(len(old.data) for old in self.gops.popleft())
+
+    def packets(self):
+        return [packet for gop in self.gops for packet in gop]
+
+    def clear(self):
+        self.gops.clear()
+        self.bytes = 0
+
+
+class RemuxedClip:
+    """
+    Clip MP4 armado con los paquetes originales (solo remux): el pre-roll se escribe al
+    crearlo y luego los paquetes siguientes hasta end_time. Misma interfaz que
+    ClipRecorder (write, close y zones) para la ingesta.
+    """
+
+    def __init__(self, template, time_base, packets, end_time):
+        self.path = os.path.join(TEMP_VIDEO_DIR, f"camera_{uuid.uuid4().hex}.mp4")
+        self.output = av.open(self.path, "w", format="mp4")
+        self.stream = self.output.add_stream_from_template(template)
+        self.time_base = time_base
+        self.end_time = end_time
+        self.origin = packets[0].dts
+        self.last_dts = None
+        self.zones = {}  # zone_id -> personas en la zona al detectar
+        for packet in packets:
+            self._mux(packet)
+
+    def write(self, packet):
+        self._mux(packet)
+        return packet.time >= self.end_time
+
+    def _mux(self, packet):
+        # El clip empieza en 0 y el muxer exige dts estrictamente creciente
+        dts = packet.dts - self.origin
+        if self.last_dts is not None and dts <= self.last_dts:
+            dts = self.last_dts + 1
+        self.last_dts = dts
+        out = av.Packet(packet.data)
+        out.dts = dts
+        out.pts = max(dts, packet.pts - self.origin)
+        out.duration = packet.duration
+        out.time_base = self.time_base
+        out.is_keyframe = packet.keyframe
+        out.stream = self.stream
+        self.output.mux(out)
+
+    def close(self):
+        self.output.close()
+        return self.path
+
+
+class ClipAssembler:
+    """
+    Pre-roll y armado de clips de una cámara leída con PyAV. add() recibe cada paquete
+    del demuxer (antes de decodificarlo) y devuelve el clip terminado, si lo hay;
+    trigger() abre un clip con el pre-roll y pasa a escribir el post-roll. Un disparo con
+    un clip abierto solo suma sus zonas.
+    """
+
+    def __init__(self, stream, fps, postroll, preroll=CAMERA_PREROLL_SECONDS, max_bytes=CAMERA_PREROLL_MAX_BYTES):
+        self.stream = stream
+        self.time_base = stream.time_base
+        self.postroll = postroll
+        self.ring = PacketRing(preroll, max_bytes)
+        # Duración de un cuadro en la base de tiempo, para streams sin pts (MJPEG por HTTP)
+        self.frame_duration = max(1, int(round(1 / (fps * self.time_base))))
+        self.last_dts = None
+        self.last_time = 0.0
+        self.clip = None
+        self.pending = {}
+
+    def add(self, packet):
+        encoded = self._encoded(packet)
+        if encoded is None:
+            return None
+        self.ring.add(encoded)
+        if self.clip is None and self.pending and encoded.keyframe:
+            # Disparo anterior al primer keyframe: el clip empieza aquí
+            self._open([encoded], self.pending)
+            self.pending = {}
+            return None
+        if self.clip is not None and self.clip.write(encoded):
+            clip, self.clip = self.clip, None
+            return clip
+        return None
+
+    def trigger(self, zones, time=None):
+        if self.clip is None:
+            packets = self.ring.packets()
+            if not packets:
+                self.pending.update(zones)
+                return
+            self._open(packets, zones, time)
+            return
+        self.clip.zones.update(zones)
+
+    def flush(self):
+        """
+        Clip abierto al cortarse el stream (más corto que el post-roll), o None.
+        """
+        self.ring.clear()
+        clip, self.clip = self.clip, None
+        return clip
+
+    def _open(self, packets, zones, time=None):
+        start = self.last_time if time is None else time
+        try:
+            self.clip = RemuxedClip(self.stream, self.time_base, packets, start + self.postroll)
+        except av.FFmpegError as e:
+            logging.error(f"No se pudo abrir el clip para remux: {e}")
+            return
+        self.clip.zones.update(zones)
+
+    def _encoded(self, packet):
+        if not packet.size:
+            return None  # paquete vacío del final del stream
+        dts = packet.dts if packet.dts is not None else packet.pts
+        if dts is None:
+            dts = 0 if self.last_dts is None else self.last_dts + self.frame_duration
+        pts = packet.pts if packet.pts is not None else dts
+        self.last_dts = dts
+        self.last_time = float(pts * self.time_base)
+        return EncodedPacket(
+            bytes(packet), pts, dts, packet.duration or self.frame_duration, packet.is_keyframe, self.last_time
+        )
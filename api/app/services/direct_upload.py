@@ -0,0 +1,93 @@
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from dotenv import load_dotenv
+
+from app import db
+from app.cameras.models.UploadSessionModel import UploadSessionsModel
+from app.services.blob_storage import delete_blobs, get_blob_upload_url, new_video_blob_name
+
+
+load_dotenv()
+
+# Validez de la URL de subida directa
+UPLOAD_URL_TTL = timedelta(minutes=int(os.getenv("UPLOAD_URL_TTL_MINUTES", "15")))
+# Una sesión sin confirmar se elimina (junto con lo que se haya subido) pasado este margen
+# desde que vence la URL. TTL + margen debe quedar por debajo de RECONCILE_GRACE_MINUTES
+# para que la reconciliación no tome como huérfano un clip a medio confirmar.
+UPLOAD_SESSION_GRACE = timedelta(minutes=int(os.getenv("UPLOAD_SESSION_GRACE_MINUTES", "30")))
+# Tamaño máximo de un clip subido directamente
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(512 * 1024 * 1024)))
+UPLOAD_PURGE_BATCH_SIZE = int(os.getenv("UPLOAD_PURGE_BATCH_SIZE", "500"))
+
+
+def create_upload_session(user_id, zone_id, content_type="video/mp4"):
+    """
+    Reserva el nombre del clip y firma su URL de subida. Devuelve (sesión, destino) con
+    destino = {'url', 'method', 'headers'} para que el cliente suba directo al almacenamiento.
+    """
+    now = datetime.utcnow()
+    session = UploadSessionsModel(
+        id=uuid.uuid4().hex,
+        user_id=user_id,
+        zone_id=zone_id,
+        blob_name=new_video_blob_name(user_id),
+        status='pending',
+        created_at=now,
+        expires_at=now + UPLOAD_URL_TTL
+    )
+    target = get_blob_upload_url(
+        session.blob_name, session.expires_at.replace(tzinfo=timezone.utc), content_type
+    )
+    db.session.add(session)
+    db.session.commit()
+    return session, target
+
+
+def lock_upload_session(user_id, upload_id):
+    """
+    Sesión del usuario con un lock de escritura hasta el commit: dos confirmaciones
+    simultáneas de la misma subida se serializan y solo una crea la alerta.
+    """
+    return UploadSessionsModel.query.filter_by(id=upload_id, user_id=user_id).with_for_update().first()
+
+
+def is_upload_session_expired(session, now=None):
+    return session.expires_at + UPLOAD_SESSION_GRACE < (now or datetime.utcnow())
+
+
+def purge_expired_upload_sessions(batch_size=UPLOAD_PURGE_BATCH_SIZE):
+    """
+    Elimina las sesiones que nunca se confirmaron y los clips que hayan llegado a subir.
+    Saltea las sesiones que una confirmación tiene bloqueadas. Las confirmadas solo se
+    conservan para responder reintentos y se eliminan sin tocar el clip. Devuelve cuántas
+    sesiones sin confirmar eliminó.
+    """
+    cutoff = datetime.utcnow() - UPLOAD_SESSION_GRACE
+    UploadSessionsModel.query.filter(
+        UploadSessionsModel.status == 'completed',
+        UploadSessionsModel.expires_at < cutoff
+    ).delete(synchronize_session=False)
+    db.session.commit()
+
+    purged = 0
+    while True:
+        sessions = UploadSessionsModel.query.filter(
+            UploadSessionsModel.status == 'pending',
+            UploadSessionsModel.expires_at < cutoff
+        ).order_by(UploadSessionsModel.expires_at).limit(batch_size).with_for_update(skip_locked=True).all()
+        if not sessions:
+            return purged
+
+        blob_names = [session.blob_name for session in sessions]
+        for session in sessions:
+            db.session.delete(session)
+        db.session.commit()
+
+        delete_blobs(blob_names)
+        purged += len(sessions)
+        logging.info(f"Subidas directas: {len(sessions)} sesiones vencidas eliminadas.")
+        if len(sessions) < batch_size:
+            return purged
@@ -0,0 +1,90 @@
+import datetime
+import json
+import os
+from itertools import islice
+
+from dotenv import load_dotenv
+from flask import Response, stream_with_context
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional: sin él se codifica con json de la biblioteca estándar
+    orjson = None
+
+
+load_dotenv()
+
+# Elementos que se codifican (y cuyas URLs se firman) juntos al transmitir listas grandes
+JSON_STREAM_CHUNK_SIZE = int(os.getenv("JSON_STREAM_CHUNK_SIZE", "1000"))
+
+# Fechas sin zona horaria como UTC con sufijo Z, igual que AlertsModel.to_json
+_ORJSON_OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z if orjson is not None else 0
+
+
+def utc_isoformat(value):
+    """
+    ISO 8601 en UTC con sufijo Z: las fechas sin zona se toman como UTC y las con zona
+    (TIMESTAMP WITH TIME ZONE en PostgreSQL) se pasan a UTC. dumps conserva el offset de
+    las fechas con zona, así que los instantes que deben salir siempre en UTC (alert_time)
+    se formatean con esta función antes de codificar.
+    """
+    if value.tzinfo is not None:
+        value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return value.isoformat() + "Z"
+
+
+def _default(value):
+    if isinstance(value, datetime.datetime):
+        # Igual que orjson con _ORJSON_OPTIONS: sin zona o en UTC con Z, el resto con su offset
+        if value.utcoffset() in (None, datetime.timedelta(0)):
+            return utc_isoformat(value)
+        return value.isoformat()
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(value):
+    """
+    JSON compacto en bytes. Acepta datetime (las fechas sin zona salen como UTC con Z y
+    las con zona, con su offset).
+    """
+    if orjson is not None:
+        return orjson.dumps(value, option=_ORJSON_OPTIONS)
+    return json.dumps(value, default=_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def json_response(value, status=200):
+    return Response(dumps(value), status=status, mimetype="application/json")
+
+
+def chunks(rows, size=JSON_STREAM_CHUNK_SIZE):
+    """
+    Agrupa un iterable en listas de hasta size elementos.
+    """
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def stream_json_array(parts, status=200):
+    """
+    Respuesta con un arreglo JSON que se codifica y envía de a partes (listas de
+    elementos), sin armarlo completo en memoria. parts se consume dentro del contexto de
+    la solicitud, así puede seguir leyendo de la base de datos.
+    """
+    def generate():
+        yield b"["
+        first = True
+        for part in parts:
+            if not part:
+                continue
+            encoded = dumps(part)[1:-1]
+            yield encoded if first else b"," + encoded
+            first = False
+        yield b"]"
+
+    return Response(stream_with_context(generate()), status=status, mimetype="application/json")
@@ -0,0 +1,183 @@
+import os
+from multiprocessing import shared_memory
+
+import numpy as np
+from dotenv import load_dotenv
+
+
+load_dotenv()
+
+# Cuadros por cámara que retiene el anillo. Con el analizador atrasado se sobrescribe el
+# más viejo: el decodificador nunca se bloquea esperando al análisis
+FRAME_RING_SLOTS = int(os.getenv("FRAME_RING_SLOTS", "4"))
+# Tamaño máximo de cuadro que acepta un slot ("1920x1080"); la memoria compartida es
+# cámaras x slots x ancho x alto x 3 bytes
+FRAME_RING_MAX_SIZE = os.getenv("FRAME_RING_MAX_SIZE", "1920x1080")
+
+# Los segmentos de SharedMemory viven en este tmpfs (64 MB por defecto en Docker)
+SHM_DIR = "/dev/shm"
+
+_ALIGN = 64
+
+
+def _align(offset):
+    return (offset + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def parse_frame_size(value=FRAME_RING_MAX_SIZE):
+    width, height = (int(part) for part in value.lower().split("x", 1))
+    return width, height
+
+
+def shm_free_bytes():
+    """
+    Espacio libre en SHM_DIR, o None si no existe (fuera de Linux).
+    """
+    try:
+        stat = os.statvfs(SHM_DIR)
+    except (FileNotFoundError, AttributeError):
+        return None
+    return stat.f_bavail * stat.f_frsize
+
+
+class FrameRing:
+    """
+    Anillo de cuadros en memoria compartida entre procesos decodificadores y analizadores.
+    Cada cámara tiene sus propios slots; un único productor por cámara escribe con write()
+    y los consumidores leen vistas NumPy sobre la memoria compartida, sin copiar ni
+    serializar los cuadros.
+
+    Cada slot lleva un sello con la secuencia del cuadro que contiene: el productor lo
+    pone en 0 antes de sobrescribir y con la nueva secuencia al terminar. El consumidor
+    que usa la vista más allá de lo inmediato confirma con valid() que el cuadro no fue
+    sobrescrito mientras lo procesaba (con más de dos slots el productor tendría que dar
+    una vuelta entera al anillo para alcanzarlo).
+
+    Se crea en el proceso supervisor con FrameRing(cameras) y los demás procesos se
+    conectan con FrameRing.attach(ring.spec).
+    """
+
+    def __init__(self, cameras, slots=FRAME_RING_SLOTS, max_size=None, name=None, create=True):
+        if slots < 2:
+            raise ValueError("FrameRing necesita al menos 2 slots por cámara.")
+        self.cameras = cameras
+        self.slots = slots
+        self.max_width, self.max_height = max_size or parse_frame_size()
+        self.frame_bytes = self.max_width * self.max_height * 3
+
+        # Encabezado por cámara: [última secuencia escrita, cerrada]. Por slot: [sello,
+        # alto, ancho] y el reloj del cuadro
+        cameras_offset = 0
+        slots_offset = _align(cameras_offset + cameras * 2 * 8)
+        clocks_offset = _align(slots_offset + cameras * slots * 3 * 8)
+        frames_offset = _align(clocks_offset + cameras * slots * 8)
+        size = frames_offset + cameras * slots * self.frame_bytes
+
+        if create:
+            # tmpfs reserva las páginas recién al escribirlas: sin este control, un /dev/shm
+            # chico termina en SIGBUS en el primer write() que no entra
+            free = shm_free_bytes()
+            if free is not None and free < size:
+                raise ValueError(
+                    f"El anillo de cuadros necesita {size / 2**20:.0f} MB ({cameras} cámaras x {slots} slots x "
+                    f"{self.max_width}x{self.max_height}) y {SHM_DIR} tiene {free / 2**20:.0f} MB libres: "
+                    "aumentar shm_size del camera-worker o bajar FRAME_RING_SLOTS / FRAME_RING_MAX_SIZE."
+                )
+
+        self.owner = create
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=size if create else 0)
+        buffer = self.shm.buf
+        self._cameras = np.ndarray((cameras, 2), dtype=np.int64, buffer=buffer, offset=cameras_offset)
+        self._slots = np.ndarray((cameras, slots, 3), dtype=np.int64, buffer=buffer, offset=slots_offset)
+        self._clocks = np.ndarray((cameras, slots), dtype=np.float64, buffer=buffer, offset=clocks_offset)
+        self._frames = np.ndarray((cameras, slots, self.frame_bytes), dtype=np.uint8, buffer=buffer, offset=frames_offset)
+        if create:
+            self._cameras[:] = 0
+            self._slots[:] = 0
+
+    @property
+    def spec(self):
+        """
+        Argumentos (serializables) para conectarse al anillo desde otro proceso.
+        """
+        return self.shm.name, self.cameras, self.slots, (self.max_width, self.max_height)
+
+    @classmethod
+    def attach(cls, spec):
+        name, cameras, slots, max_size = spec
+        return cls(cameras, slots, max_size, name=name, create=False)
+
+    def write(self, camera, frame, clock=0.0):
+        """
+        Copia frame (alto x ancho x 3, uint8) al slot siguiente de la cámara, pisando el
+        cuadro más viejo. Devuelve la secuencia asignada (desde 1).
+        """
+        height, width = frame.shape[:2]
+        if width > self.max_width or height > self.max_height:
+            raise ValueError(
+                f"Cuadro de {width}x{height} mayor que FRAME_RING_MAX_SIZE ({self.max_width}x{self.max_height})."
+            )
+        seq = int(self._cameras[camera, 0]) + 1
+        slot = seq % self.slots
+        meta = self._slots[camera, slot]
+        meta[0] = 0
+        np.copyto(self._view(camera, slot, height, width), frame)
+        meta[1] = height
+        meta[2] = width
+        self._clocks[camera, slot] = clock
+        meta[0] = seq
+        self._cameras[camera, 0] = seq
+        return seq
+
+    def latest(self, camera):
+        return int(self._cameras[camera, 0])
+
+    def read(self, camera, after=0, newest=True):
+        """
+        Siguiente cuadro de la cámara posterior a la secuencia after, o None si no hay
+        nada nuevo. Con newest=True devuelve el más reciente (lo que haga falta para
+        alcanzar al productor se descarta); con newest=False, el más viejo que aún
+        retiene el anillo.
+
+        Devuelve (seq, vista, clock): la vista apunta a la memoria compartida y es válida
+        mientras valid(camera, seq) sea True.
+        """
+        while True:
+            latest = int(self._cameras[camera, 0])
+            if latest <= after:
+                return None
+            # El slot más viejo puede estar por sobrescribirse: se deja un margen de uno
+            seq = latest if newest else max(after + 1, latest - self.slots + 2)
+            slot = seq % self.slots
+            meta = self._slots[camera, slot]
+            height, width = int(meta[1]), int(meta[2])
+            clock = float(self._clocks[camera, slot])
+            if int(meta[0]) == seq:
+                return seq, self._view(camera, slot, height, width), clock
+            # El productor lo pisó mientras se leía el encabezado: volver a intentar
+
+    def valid(self, camera, seq):
+        return int(self._slots[camera, seq % self.slots, 0]) == seq
+
+    def close_camera(self, camera):
+        """
+        Marca que el productor no escribirá más cuadros de la cámara (fin de archivo o
+        cámara detenida).
+        """
+        self._cameras[camera, 1] = 1
+
+    def is_closed(self, camera):
+        return bool(self._cameras[camera, 1])
+
+    def reopen_camera(self, camera):
+        self._cameras[camera, 1] = 0
+
+    def _view(self, camera, slot, height, width):
+        return self._frames[camera, slot, :height * width * 3].reshape(height, width, 3)
+
+    def close(self):
+        # Las vistas NumPy retienen el buffer: soltarlas antes de cerrar el mapeo
+        self._cameras = self._slots = self._clocks = self._frames = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
@@ -0,0 +1,268 @@
+import hashlib
+import hmac
+import logging
+import os
+import shutil
+import uuid
+from datetime import datetime, timezone
+from urllib.parse import quote
+
+from app.services.storage_backend import StorageBackend, StoredObject
+
+
+COPY_CHUNK_BYTES = 1024 * 1024
+DIGEST_XATTR = "user.guardvision.sha256"
+
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        while chunk := file.read(COPY_CHUNK_BYTES):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class LocalFileStorage(StorageBackend):
+    """
+    Backend en disco local para sitios on-prem / edge, benchmarks y pruebas sin red.
+
+    El contenido se guarda una sola vez por hash en <root>/objects/<aa>/<bb>/<sha256>
+    y cada nombre (<root>/names/<user_id>/<día>/<archivo>) es un hard link a ese objeto:
+    los clips repetidos no ocupan espacio extra y la cantidad de links del inode indica
+    cuántos nombres lo usan. Las escrituras van a <root>/tmp y se publican con un rename
+    atómico, así un lector nunca ve un archivo a medio escribir. Los clips se sirven con
+    send_file sobre la ruta local (sendfile vía wsgi.file_wrapper) usando URLs firmadas
+    con HMAC en lugar de SAS.
+    """
+
+    name = "local"
+
+    def __init__(self, root, signing_key, public_url="/media"):
+        if not signing_key:
+            # Con una clave vacía cualquiera podría falsificar URLs de lectura y escritura
+            raise ValueError("El almacenamiento local necesita una clave para firmar URLs "
+                             "(LOCAL_STORAGE_SIGNING_KEY o SECRET_KEY).")
+        self.root = os.path.abspath(root)
+        self.objects_dir = os.path.join(self.root, "objects")
+        self.names_dir = os.path.join(self.root, "names")
+        self.tmp_dir = os.path.join(self.root, "tmp")
+        self.signing_key = signing_key.encode("utf-8") if isinstance(signing_key, str) else signing_key
+        self.public_url = public_url.rstrip("/")
+        for directory in (self.objects_dir, self.names_dir, self.tmp_dir):
+            os.makedirs(directory, exist_ok=True)
+
+    def _name_path(self, blob_name):
+        path = os.path.normpath(os.path.join(self.names_dir, blob_name))
+        if not path.startswith(self.names_dir + os.sep):
+            raise ValueError(f"Nombre de blob inválido: {blob_name}")
+        return path
+
+    def _object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest[2:4], digest)
+
+    def _tmp_path(self):
+        return os.path.join(self.tmp_dir, uuid.uuid4().hex)
+
+    def _digest_of(self, path):
+        try:
+            return os.getxattr(path, DIGEST_XATTR).decode("ascii")
+        except (OSError, AttributeError):
+            # Sistemas de archivos sin xattr de usuario
+            return _file_digest(path)
+
+    def upload_file(self, file_path, blob_name, content_type):
+        logging.info(f"Iniciando copia del archivo {file_path} al almacenamiento local como {blob_name}.")
+        try:
+            with open(file_path, "rb") as src:
+                self._write(src, blob_name)
+            return blob_name
+        except Exception as e:
+            logging.error(f"Error al guardar el archivo en el almacenamiento local: {e}")
+            return None
+
+    def upload_stream(self, stream, blob_name, content_type):
+        try:
+            return self._write(stream, blob_name)
+        except Exception as e:
+            logging.error(f"Error al guardar {blob_name} en el almacenamiento local: {e}")
+            return None
+
+    def _write(self, src, blob_name):
+        """
+        Copia src a tmp/ calculando el hash en la misma pasada y publica el nombre con un
+        rename atómico. Devuelve el tamaño escrito.
+        """
+        tmp_path = self._tmp_path()
+        tmp_link = self._tmp_path()
+        try:
+            name_path = self._name_path(blob_name)
+
+            digest = hashlib.sha256()
+            size = 0
+            with open(tmp_path, "wb") as dst:
+                while chunk := src.read(COPY_CHUNK_BYTES):
+                    digest.update(chunk)
+                    dst.write(chunk)
+                    size += len(chunk)
+                dst.flush()
+                os.fsync(dst.fileno())
+            object_path = self._store_object(tmp_path, digest.hexdigest())
+
+            try:
+                os.link(object_path, tmp_link)
+            except FileNotFoundError:
+                # Un borrado concurrente eliminó el objeto: usar la copia recién escrita
+                object_path = self._store_object(tmp_path, digest.hexdigest())
+                os.link(tmp_path, tmp_link)
+
+            os.makedirs(os.path.dirname(name_path), exist_ok=True)
+            os.replace(tmp_link, name_path)
+            logging.info(f"Archivo {blob_name} guardado en {object_path}.")
+            return size
+        finally:
+            for path in (tmp_path, tmp_link):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def _store_object(self, tmp_path, digest):
+        object_path = self._object_path(digest)
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        try:
+            # link no sobrescribe: si el contenido ya existe se reutiliza el objeto guardado
+            os.link(tmp_path, object_path)
+            try:
+                os.setxattr(object_path, DIGEST_XATTR, digest.encode("ascii"))
+            except (OSError, AttributeError):
+                pass
+        except FileExistsError:
+            pass
+        return object_path
+
+    def delete_many(self, blob_names, max_workers=4):
+        deleted = 0
+        for blob_name in blob_names:
+            try:
+                name_path = self._name_path(blob_name)
+                stat = os.stat(name_path)
+            except FileNotFoundError:
+                deleted += 1
+                continue
+            except (OSError, ValueError) as e:
+                logging.error(f"Error al eliminar {blob_name} del almacenamiento local: {e}")
+                continue
+
+            try:
+                # Último nombre que usa el objeto: eliminar también el contenido
+                object_path = self._object_path(self._digest_of(name_path)) if stat.st_nlink <= 2 else None
+                os.remove(name_path)
+                deleted += 1
+                if object_path:
+                    object_stat = os.stat(object_path)
+                    if object_stat.st_ino == stat.st_ino and object_stat.st_nlink == 1:
+                        os.remove(object_path)
+            except FileNotFoundError:
+                deleted += 1
+            except OSError as e:
+                logging.error(f"Error al eliminar {blob_name} del almacenamiento local: {e}")
+        return deleted
+
+    def download_to(self, blob_name, download_path):
+        try:
+            # copyfile usa sendfile/copy_file_range en Linux
+            shutil.copyfile(self._name_path(blob_name), download_path)
+            return True
+        except (OSError, ValueError) as e:
+            logging.error(f"Error al copiar {blob_name} desde el almacenamiento local: {e}")
+            return False
+
+    def size(self, blob_name):
+        try:
+            return os.path.getsize(self._name_path(blob_name))
+        except (OSError, ValueError):
+            return None
+
+    def iter_range(self, blob_name, offset, length, chunk_size):
+        with open(self._name_path(blob_name), "rb") as file:
+            file.seek(offset)
+            remaining = length
+            while remaining > 0:
+                chunk = file.read(min(chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+    def _iter_sorted(self, directory, relative, prefix, after):
+        """
+        Recorre names/ en el mismo orden que un listado de Azure (orden de bytes del
+        nombre completo): un directorio se ordena como "<nombre>/".
+        """
+        try:
+            entries = list(os.scandir(directory))
+        except FileNotFoundError:
+            return
+        keyed = sorted(((entry.name + "/" if entry.is_dir() else entry.name), entry) for entry in entries)
+        for key, entry in keyed:
+            name = relative + key
+            if entry.is_dir():
+                if not name.startswith(prefix) and not prefix.startswith(name):
+                    continue
+                # Subárbol completo anterior al token: no hace falta recorrerlo
+                if after and name < after and not after.startswith(name):
+                    continue
+                yield from self._iter_sorted(entry.path, name, prefix, after)
+            elif name.startswith(prefix) and (not after or name > after):
+                stat = entry.stat()
+                yield StoredObject(name, stat.st_size, datetime.fromtimestamp(stat.st_mtime, timezone.utc))
+
+    def iter_pages(self, prefix, page_size, continuation_token=None):
+        prefix = prefix or ""
+        base = prefix[:prefix.rfind("/") + 1]
+        objects = self._iter_sorted(self._name_path(base) if base else self.names_dir, base, prefix, continuation_token)
+
+        page = []
+        for stored in objects:
+            if len(page) == page_size:
+                yield page, page[-1].name
+                page = []
+            page.append(stored)
+        yield page, None
+
+    def _signature(self, blob_name, expires, permission="r"):
+        # La firma de lectura conserva el formato original para no invalidar URLs emitidas
+        message = f"{blob_name}\n{expires}" if permission == "r" else f"{blob_name}\n{expires}\n{permission}"
+        return hmac.new(self.signing_key, message.encode("utf-8"), hashlib.sha256).hexdigest()
+
+    def sign_urls(self, blob_names, expiry):
+        expires = int(expiry.timestamp())
+        return {
+            blob_name: f"{self.public_url}/{quote(blob_name)}?se={expires}&sig={self._signature(blob_name, expires)}"
+            for blob_name in blob_names
+        }
+
+    def sign_upload_url(self, blob_name, expiry, content_type):
+        # Token de escritura (sp=w) para PUT /media/<nombre>; no sirve para leer ni al revés
+        self._name_path(blob_name)
+        expires = int(expiry.timestamp())
+        signature = self._signature(blob_name, expires, "w")
+        return {
+            'url': f"{self.public_url}/{quote(blob_name)}?se={expires}&sp=w&sig={signature}",
+            'method': 'PUT',
+            'headers': {'Content-Type': content_type}
+        }
+
+    def verify_signature(self, blob_name, expires, signature, permission="r"):
+        try:
+            expires = int(expires)
+        except (TypeError, ValueError):
+            return False
+        if expires < datetime.now(timezone.utc).timestamp():
+            return False
+        return hmac.compare_digest(self._signature(blob_name, expires, permission), signature or "")
+
+    def local_path(self, blob_name):
+        try:
+            path = self._name_path(blob_name)
+        except ValueError:
+            return None
+        return path if os.path.isfile(path) else None
@@ -0,0 +1,197 @@
+import logging
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+from dotenv import load_dotenv
+from PIL import Image
+
+from app.services.blob_storage import (
+    POSTER_SUFFIX, PREVIEW_SUFFIX, download_video_from_blob, get_local_blob_path, upload_file_to_blob
+)
+from app.services.upload_stream import file_sha256
+
+
+load_dotenv()
+
+# Pool de procesos para generar miniaturas y previews de los clips de alertas (trabajo CPU-bound)
+MEDIA_WORKERS = int(os.getenv("MEDIA_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+POSTER_WIDTH = int(os.getenv("MEDIA_POSTER_WIDTH", "640"))
+PREVIEW_WIDTH = int(os.getenv("MEDIA_PREVIEW_WIDTH", "240"))
+PREVIEW_FRAMES = int(os.getenv("MEDIA_PREVIEW_FRAMES", "12"))
+PREVIEW_FRAME_MS = int(os.getenv("MEDIA_PREVIEW_FRAME_MS", "250"))
+
+_executor = None
+
+
+def _resize(frame, width):
+    height, current_width = frame.shape[:2]
+    if current_width <= width:
+        return frame
+    return cv2.resize(frame, (width, int(height * width / current_width)), interpolation=cv2.INTER_AREA)
+
+
+def media_blob_names(blob_name):
+    """
+    Nombres de los derivados que se guardan junto al clip:
+    <user_id>/<YYYY-MM-DD>/<archivo>.poster.jpg y <archivo>.preview.webp
+    """
+    base = blob_name.rsplit(".", 1)[0]
+    return f"{base}{POSTER_SUFFIX}", f"{base}{PREVIEW_SUFFIX}"
+
+
+def extract_media(video_path, output_dir):
+    """
+    Extrae de un clip la metadata (duración, fps, resolución), un poster JPEG y un
+    preview WebP animado de baja resolución con PREVIEW_FRAMES cuadros repartidos en el clip.
+    """
+    capture = cv2.VideoCapture(video_path)
+    if not capture.isOpened():
+        raise ValueError(f"No se pudo abrir el video {video_path}")
+
+    try:
+        fps = capture.get(cv2.CAP_PROP_FPS) or 0.0
+        frame_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        width = int(capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+        # Índices de los cuadros a muestrear; el del medio se usa como poster
+        if frame_count > 0:
+            step = max(1, frame_count // PREVIEW_FRAMES)
+            wanted = set(range(0, frame_count, step))
+            poster_index = frame_count // 2
+        else:
+            wanted, poster_index = set(range(PREVIEW_FRAMES)), 0
+        wanted.add(poster_index)
+
+        preview_frames = []
+        poster = None
+        index = 0
+        last_wanted = max(wanted)
+        while index <= last_wanted:
+            # grab() decodifica cada cuadro (backend FFmpeg de OpenCV); retrieve() agrega la
+            # conversión de color y la copia, solo para los cuadros muestreados
+            if not capture.grab():
+                break
+            if index in wanted:
+                ok, frame = capture.retrieve()
+                if ok:
+                    if index == poster_index or poster is None:
+                        poster = frame
+                    preview_frames.append(_resize(frame, PREVIEW_WIDTH))
+            index += 1
+    finally:
+        capture.release()
+
+    if poster is None:
+        raise ValueError(f"El video {video_path} no tiene cuadros legibles")
+
+    if frame_count <= 0:
+        frame_count = index
+
+    poster_path = os.path.join(output_dir, "poster.jpg")
+    cv2.imwrite(poster_path, _resize(poster, POSTER_WIDTH), [cv2.IMWRITE_JPEG_QUALITY, 80])
+
+    preview_path = os.path.join(output_dir, "preview.webp")
+    images = [Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)) for frame in preview_frames[:PREVIEW_FRAMES]]
+    images[0].save(preview_path, save_all=True, append_images=images[1:], duration=PREVIEW_FRAME_MS, loop=0, quality=50)
+
+    return {
+        'duration': round(frame_count / fps, 3) if fps else None,
+        'fps': round(fps, 3) if fps else None,
+        'width': width,
+        'height': height,
+    }, poster_path, preview_path
+
+
+def process_alert_media(blob_name, video_path=None):
+    """
+    Se ejecuta en un proceso del pool: genera los derivados del clip, los sube junto al
+    video y devuelve los campos a guardar en la alerta. Elimina video_path al terminar.
+
+    Sin video_path (subida directa al almacenamiento, el clip nunca pasó por la API) se
+    lee desde aquí: la ruta local del backend o una descarga temporal. En ese caso
+    también se devuelve el SHA-256 para la deduplicación.
+    """
+    owned_path = video_path
+    try:
+        with tempfile.TemporaryDirectory(prefix="guardvision-media-") as output_dir:
+            result = {}
+            if video_path is None:
+                video_path = get_local_blob_path(blob_name)
+                if video_path is None:
+                    video_path = os.path.join(output_dir, "video.mp4")
+                    if not download_video_from_blob(blob_name, video_path):
+                        raise ValueError(f"No se pudo leer el video {blob_name}")
+                result['content_hash'] = file_sha256(video_path)
+
+            metadata, poster_path, preview_path = extract_media(video_path, output_dir)
+            poster_blob, preview_blob = media_blob_names(blob_name)
+
+            result.update(metadata)
+            if upload_file_to_blob(poster_path, poster_blob, "image/jpeg"):
+                result['poster_blob'] = poster_blob
+            if upload_file_to_blob(preview_path, preview_blob, "image/webp"):
+                result['preview_blob'] = preview_blob
+            return result
+    finally:
+        if owned_path and os.path.exists(owned_path):
+            os.remove(owned_path)
+
+
+def get_media_executor():
+    global _executor
+    if _executor is None:
+        # spawn: los procesos del pool no heredan conexiones a la base ni hilos del worker web
+        _executor = ProcessPoolExecutor(max_workers=MEDIA_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+
+def shutdown_media_executor():
+    """
+    Espera los derivados en curso (y la actualización de sus alertas) antes de que
+    termine un proceso que no es un worker web, como los workers de cámaras.
+    """
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+
+def submit_alert_media(app, alert_id, blob_name, video_path=None):
+    """
+    Encola la generación de derivados de una alerta. Al terminar, actualiza la fila
+    de la alerta desde un hilo del proceso web. Sin video_path el proceso del pool lee
+    el clip del almacenamiento.
+    """
+    from app import db
+    from app.cameras.models.CamerasModel import AlertsModel
+
+    def on_done(future):
+        try:
+            result = future.result()
+        except Exception as e:
+            logging.error(f"Error al generar los derivados del video de la alerta {alert_id}: {e}")
+            return
+
+        with app.app_context():
+            try:
+                # También las alertas que reutilizan el mismo clip (deduplicadas por hash)
+                AlertsModel.query.filter(AlertsModel.video_url == blob_name).update(result)
+                db.session.commit()
+                logging.info(f"Derivados del video de la alerta {alert_id} generados: {result}")
+            except Exception as e:
+                db.session.rollback()
+                logging.error(f"Error al guardar los derivados de la alerta {alert_id}: {e}")
+
+    try:
+        future = get_media_executor().submit(process_alert_media, blob_name, video_path)
+    except Exception as e:
+        logging.error(f"No se pudo encolar el procesamiento del video de la alerta {alert_id}: {e}")
+        if video_path and os.path.exists(video_path):
+            os.remove(video_path)
+        return None
+    future.add_done_callback(on_done)
+    return future
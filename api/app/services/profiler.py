@@ -0,0 +1,196 @@
+import cProfile
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+
+from flask import g, request
+
+
+# Profiler opt-in por solicitud.
+# Perfila una fracción configurable de las solicitudes (o las que traen el header X-Profile
+# con el token de administrador) y deja un archivo por solicitud en
+# <PROFILER_OUTPUT_DIR>/<endpoint>/:
+#   - modo "sample":   muestras de stack en formato "folded" (listo para flamegraph.pl / speedscope)
+#   - modo "cprofile": salida de cProfile (.prof) para snakeviz / flameprof
+
+ADMIN_HEADER = "X-Profile"
+CONTROL_FILE_CHECK_SECONDS = 5
+PROFILER_MODES = ('sample', 'cprofile')
+
+
+def _parse_control(control):
+    """
+    Valores válidos del archivo de control; los inválidos se descartan (con un error en
+    el log) y quedan los de la configuración, así un valor mal escrito no rompe las
+    solicitudes.
+    """
+    if not isinstance(control, dict):
+        logging.error("El archivo de control del profiler debe ser un objeto JSON; se ignora.")
+        return {}
+    parsed = {}
+    for key, value in control.items():
+        try:
+            if key == 'enabled':
+                if not isinstance(value, bool):
+                    raise ValueError("debe ser true o false")
+                parsed[key] = value
+            elif key == 'mode':
+                if value not in PROFILER_MODES:
+                    raise ValueError(f"debe ser {' o '.join(PROFILER_MODES)}")
+                parsed[key] = value
+            elif key == 'sample_rate':
+                value = float(value)
+                if not 0 <= value <= 1:
+                    raise ValueError("debe estar entre 0 y 1")
+                parsed[key] = value
+            elif key == 'interval_ms':
+                value = float(value)
+                if not value > 0:
+                    raise ValueError("debe ser mayor que 0")
+                parsed[key] = value
+        except (TypeError, ValueError) as e:
+            logging.error(f"Valor inválido para {key} en el archivo de control del profiler ({control[key]!r}): {e}")
+    return parsed
+
+
+class StackSampler:
+    """
+    Toma muestras periódicas del stack de un hilo y las acumula en formato folded.
+    """
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            self.samples[";".join(reversed(stack))] += 1
+
+    def dump(self, path):
+        with open(path, "w") as file:
+            for stack, count in self.samples.most_common():
+                file.write(f"{stack} {count}\n")
+
+
+class RequestProfiler:
+    def __init__(self, app=None):
+        self._control = {}
+        self._control_mtime = None
+        self._control_checked_at = 0
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.before_request(self._before_request)
+        app.teardown_request(self._teardown_request)
+
+    # Configuración efectiva: variables de entorno + archivo de control (si existe)
+    def _settings(self):
+        config = self.app.config
+        settings = {
+            'enabled': config.get('PROFILER_ENABLED', False),
+            'mode': config.get('PROFILER_MODE', 'sample'),
+            'sample_rate': config.get('PROFILER_SAMPLE_RATE', 0.0),
+            'interval_ms': config.get('PROFILER_INTERVAL_MS', 5),
+        }
+        control_file = config.get('PROFILER_CONTROL_FILE')
+        if control_file:
+            settings.update(self._read_control_file(control_file))
+        return settings
+
+    def _read_control_file(self, path):
+        now = time.monotonic()
+        if now - self._control_checked_at < CONTROL_FILE_CHECK_SECONDS:
+            return self._control
+        with self._lock:
+            self._control_checked_at = now
+            try:
+                mtime = os.path.getmtime(path)
+                if mtime != self._control_mtime:
+                    with open(path) as file:
+                        self._control = _parse_control(json.load(file))
+                    self._control_mtime = mtime
+                    logging.info(f"Configuración del profiler recargada desde {path}: {self._control}")
+            except FileNotFoundError:
+                self._control = {}
+                self._control_mtime = None
+            except (OSError, ValueError) as e:
+                logging.error(f"Error al leer el archivo de control del profiler: {e}")
+        return self._control
+
+    def _should_profile(self, settings):
+        admin_token = self.app.config.get('PROFILER_ADMIN_TOKEN')
+        if admin_token and request.headers.get(ADMIN_HEADER) == admin_token:
+            return True
+        if not settings['enabled']:
+            return False
+        return random.random() < settings['sample_rate']
+
+    def _before_request(self):
+        settings = self._settings()
+        if not self._should_profile(settings):
+            return
+
+        if settings['mode'] == 'cprofile':
+            profiler = cProfile.Profile()
+            profiler.enable()
+        else:
+            profiler = StackSampler(threading.get_ident(), settings['interval_ms'] / 1000)
+            profiler.start()
+
+        g._profiler = profiler
+        g._profiler_started_at = time.perf_counter()
+
+    def _teardown_request(self, exc=None):
+        profiler = g.pop('_profiler', None)
+        if profiler is None:
+            return
+
+        elapsed_ms = (time.perf_counter() - g.pop('_profiler_started_at')) * 1000
+        if isinstance(profiler, cProfile.Profile):
+            profiler.disable()
+            extension = "prof"
+        else:
+            profiler.stop()
+            extension = "folded"
+
+        endpoint = request.endpoint or "unknown"
+        try:
+            directory = os.path.join(self.app.config['PROFILER_OUTPUT_DIR'], endpoint)
+            os.makedirs(directory, exist_ok=True)
+            filename = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{uuid.uuid4().hex[:8]}.{extension}"
+            path = os.path.join(directory, filename)
+            if isinstance(profiler, cProfile.Profile):
+                profiler.dump_stats(path)
+            else:
+                profiler.dump(path)
+            logging.info(f"Perfil de {request.method} {request.path} ({elapsed_ms:.1f} ms) guardado en {path}.")
+        except OSError as e:
+            logging.error(f"Error al guardar el perfil de la solicitud: {e}")
@@ -0,0 +1,27 @@
+from flask import g, has_request_context
+from sqlalchemy import event
+
+
+# Conteo de consultas SQL por solicitud.
+# Con QUERY_COUNT_HEADER=true cada respuesta incluye el header X-Query-Count,
+# que usa el harness de benchmarks/ para reportar consultas por endpoint.
+
+QUERY_COUNT_HEADER = "X-Query-Count"
+
+
+def init_query_stats(app, db):
+    if not app.config.get('QUERY_COUNT_HEADER'):
+        return
+
+    with app.app_context():
+        engine = db.engine
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count_query(conn, cursor, statement, parameters, context, executemany):
+        if has_request_context():
+            g._query_count = g.get('_query_count', 0) + 1
+
+    @app.after_request
+    def add_query_count_header(response):
+        response.headers[QUERY_COUNT_HEADER] = str(g.get('_query_count', 0))
+        return response
@@ -0,0 +1,185 @@
+import fcntl
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta
+
+from dotenv import load_dotenv
+from werkzeug.exceptions import ClientDisconnected
+
+from app import db
+from app.cameras.models.UploadSessionModel import ResumableUploadsModel
+from app.services.upload_stream import file_sha256
+
+
+load_dotenv()
+
+# Bytes recibidos de las subidas en curso. Debe ser un volumen compartido por las
+# instancias de la API (cada PATCH puede llegar a una distinta) y por el worker de
+# retención, que borra los parciales vencidos (volumen guardvision-uploads en
+# docker-compose.yml).
+RESUMABLE_UPLOAD_DIR = os.getenv("RESUMABLE_UPLOAD_DIR", "/var/lib/guardvision/uploads/resumable")
+# Una subida sin actividad durante este tiempo se descarta (fila y bytes recibidos)
+RESUMABLE_UPLOAD_TTL = timedelta(hours=int(os.getenv("RESUMABLE_UPLOAD_TTL_HOURS", "24")))
+# Un finalize que sigue "en proceso" después de esto se considera abandonado (proceso caído)
+RESUMABLE_FINALIZE_TIMEOUT = timedelta(seconds=int(os.getenv("RESUMABLE_FINALIZE_TIMEOUT_SECONDS", "300")))
+RESUMABLE_PURGE_BATCH_SIZE = int(os.getenv("RESUMABLE_PURGE_BATCH_SIZE", "500"))
+
+WRITE_CHUNK_BYTES = 256 * 1024
+
+
+def partial_path(upload_id):
+    return os.path.join(RESUMABLE_UPLOAD_DIR, f"{upload_id}.part")
+
+
+def create_resumable_upload(user_id, zone_id, upload_length):
+    os.makedirs(RESUMABLE_UPLOAD_DIR, exist_ok=True)
+    now = datetime.utcnow()
+    upload = ResumableUploadsModel(
+        id=uuid.uuid4().hex,
+        user_id=user_id,
+        zone_id=zone_id,
+        upload_length=upload_length,
+        upload_offset=0,
+        status='pending',
+        created_at=now,
+        updated_at=now
+    )
+    open(partial_path(upload.id), "wb").close()
+    db.session.add(upload)
+    db.session.commit()
+    return upload
+
+
+def get_resumable_upload(user_id, upload_id, lock=False):
+    query = ResumableUploadsModel.query.filter_by(id=upload_id, user_id=user_id)
+    return query.with_for_update().first() if lock else query.first()
+
+
+def append_chunk(upload, offset, stream):
+    """
+    Agrega al archivo parcial lo que se lea de stream, a partir de offset. Devuelve
+    (estado, offset actual):
+    ('ok', offset) al terminar el cuerpo o si el cliente se desconectó (lo recibido se
+    conserva, así el reintento solo envía lo que falta), ('conflict', offset) si offset no
+    coincide con lo ya recibido, ('locked', None) si otro PATCH de la misma subida está
+    en curso y ('missing', None) si el archivo parcial ya no existe.
+
+    El tamaño del archivo es la fuente de verdad del offset (un proceso que cae a mitad
+    de un PATCH no deja la fila desfasada); la columna upload_offset se actualiza después
+    para HEAD y la limpieza.
+    """
+    try:
+        file = open(partial_path(upload.id), "r+b")
+    except FileNotFoundError:
+        return 'missing', None
+
+    with file:
+        try:
+            fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return 'locked', None
+
+        current = file.seek(0, os.SEEK_END)
+        if current != offset:
+            return 'conflict', current
+
+        remaining = upload.upload_length - current
+        try:
+            while remaining > 0 and (chunk := stream.read(min(WRITE_CHUNK_BYTES, remaining))):
+                file.write(chunk)
+                remaining -= len(chunk)
+        except ClientDisconnected:
+            logging.info(f"Subida {upload.id}: conexión cortada en {file.tell()}/{upload.upload_length}.")
+        file.flush()
+        os.fsync(file.fileno())
+        current = file.tell()
+
+    upload.upload_offset = current
+    upload.updated_at = datetime.utcnow()
+    db.session.commit()
+    return 'ok', current
+
+
+def received_offset(upload):
+    """
+    Bytes recibidos según el archivo parcial (None si ya no existe).
+    """
+    try:
+        return os.path.getsize(partial_path(upload.id))
+    except FileNotFoundError:
+        return None
+
+
+def partial_sha256(upload):
+    return file_sha256(partial_path(upload.id))
+
+
+def remove_partial(upload_id):
+    try:
+        os.remove(partial_path(upload_id))
+    except FileNotFoundError:
+        pass
+
+
+def purge_stale_resumable_uploads(batch_size=RESUMABLE_PURGE_BATCH_SIZE):
+    """
+    Elimina las subidas sin actividad durante RESUMABLE_UPLOAD_TTL (también las
+    completadas, que solo se conservan para responder reintentos del finalize) y sus
+    archivos parciales, y después los parciales vencidos que ya no tienen fila.
+    Devuelve cuántas subidas eliminó.
+    """
+    cutoff = datetime.utcnow() - RESUMABLE_UPLOAD_TTL
+    purged = 0
+    while True:
+        uploads = ResumableUploadsModel.query.filter(
+            ResumableUploadsModel.updated_at < cutoff
+        ).order_by(ResumableUploadsModel.updated_at).limit(batch_size).with_for_update(skip_locked=True).all()
+        if not uploads:
+            remove_orphan_partials(batch_size)
+            return purged
+
+        upload_ids = [upload.id for upload in uploads]
+        for upload in uploads:
+            db.session.delete(upload)
+        db.session.commit()
+
+        for upload_id in upload_ids:
+            remove_partial(upload_id)
+        purged += len(upload_ids)
+        logging.info(f"Subidas por partes: {len(upload_ids)} subidas inactivas eliminadas.")
+        if len(upload_ids) < batch_size:
+            remove_orphan_partials(batch_size)
+            return purged
+
+
+def remove_orphan_partials(batch_size=RESUMABLE_PURGE_BATCH_SIZE):
+    """
+    Borra los .part sin actividad durante RESUMABLE_UPLOAD_TTL cuya subida ya no existe
+    (por ejemplo, filas eliminadas por un worker que no veía el directorio). Devuelve
+    cuántos borró.
+    """
+    cutoff = (datetime.now() - RESUMABLE_UPLOAD_TTL).timestamp()
+    try:
+        with os.scandir(RESUMABLE_UPLOAD_DIR) as entries:
+            stale = [
+                entry.name[:-len(".part")] for entry in entries
+                if entry.name.endswith(".part") and entry.stat().st_mtime < cutoff
+            ]
+    except FileNotFoundError:
+        return 0
+
+    removed = 0
+    for start in range(0, len(stale), batch_size):
+        upload_ids = stale[start:start + batch_size]
+        existing = {
+            upload_id for (upload_id,) in
+            db.session.query(ResumableUploadsModel.id).filter(ResumableUploadsModel.id.in_(upload_ids))
+        }
+        for upload_id in upload_ids:
+            if upload_id not in existing:
+                remove_partial(upload_id)
+                removed += 1
+    if removed:
+        logging.info(f"Subidas por partes: {removed} archivos parciales sin subida eliminados.")
+    return removed
@@ -0,0 +1,185 @@
+import logging
+import os
+import time
+from datetime import datetime
+
+from dotenv import load_dotenv
+from sqlalchemy import text
+
+from app import db
+from app.cameras.models.RetentionModel import JobCheckpointsModel
+from app.services.blob_storage import delete_blobs
+from app.services.direct_upload import purge_expired_upload_sessions
+from app.services.resumable_upload import purge_stale_resumable_uploads
+from app.services.video_dedup import purge_expired_idempotency_keys, releasable_blob_names
+
+
+load_dotenv()
+
+# Retención por defecto para usuarios/zonas sin política (0 = conservar indefinidamente)
+RETENTION_DEFAULT_DAYS = int(os.getenv("RETENTION_DEFAULT_DAYS", "0"))
+RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", "500"))
+# Tamaño de la ventana de ids revisada por lote (en múltiplos de RETENTION_BATCH_SIZE)
+RETENTION_WINDOW_FACTOR = int(os.getenv("RETENTION_WINDOW_FACTOR", "20"))
+RETENTION_BLOB_WORKERS = int(os.getenv("RETENTION_BLOB_WORKERS", "4"))
+# Pausa entre lotes para no competir con el tráfico de la API
+RETENTION_PAUSE_SECONDS = float(os.getenv("RETENTION_PAUSE_SECONDS", "0.2"))
+
+JOB_NAME = "retention"
+
+# Días de retención efectivos de cada alerta: política de zona > política de usuario > default
+EFFECTIVE_DAYS_SQL = "COALESCE(zp.retention_days, up.retention_days, NULLIF(:default_days, 0))"
+
+# Id más alto que podría estar vencido: acota el recorrido por la PK de cada pasada
+UPPER_BOUND_SQL = text("""
+    SELECT max(a.id)
+    FROM alerts a
+    WHERE a.alert_time < now() - make_interval(days => :min_days)
+""")
+
+MIN_DAYS_SQL = text("""
+    SELECT min(days) FROM (
+        SELECT retention_days AS days FROM retention_policies
+        UNION ALL
+        SELECT NULLIF(:default_days, 0)
+    ) AS policies
+""")
+
+# Un lote: dentro de la ventana de ids (cursor, window_end] bloquea, saltando las filas tomadas
+# por otras transacciones, y elimina hasta :batch_size alertas vencidas
+DELETE_BATCH_SQL = text(f"""
+    WITH candidates AS (
+        SELECT a.id
+        FROM alerts a
+        JOIN zones z ON z.id = a.zone_id
+        JOIN cameras c ON c.id = z.camera_id
+        LEFT JOIN retention_policies zp ON zp.zone_id = a.zone_id
+        LEFT JOIN retention_policies up ON up.user_id = c.user_id AND up.zone_id IS NULL
+        WHERE a.id > :cursor
+          AND a.id <= :window_end
+          AND a.alert_time < now() - make_interval(days => {EFFECTIVE_DAYS_SQL})
+        ORDER BY a.id
+        LIMIT :batch_size
+        FOR UPDATE OF a SKIP LOCKED
+    )
+    DELETE FROM alerts a
+    USING candidates
+    WHERE a.id = candidates.id
+    RETURNING a.id, a.video_url, a.poster_blob, a.preview_blob
+""")
+
+
+def _load_checkpoint():
+    checkpoint = db.session.get(JobCheckpointsModel, JOB_NAME)
+    if checkpoint is None:
+        checkpoint = JobCheckpointsModel(job=JOB_NAME, cursor=0, state={})
+        db.session.add(checkpoint)
+        db.session.commit()
+    return checkpoint
+
+
+def _save_checkpoint(checkpoint, cursor, state):
+    checkpoint.cursor = cursor
+    checkpoint.state = dict(state)
+    db.session.commit()
+
+
+def get_retention_status():
+    checkpoint = db.session.get(JobCheckpointsModel, JOB_NAME)
+    return checkpoint.to_json() if checkpoint else None
+
+
+def purge_expired_alerts(batch_size=RETENTION_BATCH_SIZE, max_batches=None, pause=RETENTION_PAUSE_SECONDS):
+    """
+    Ejecuta (o reanuda) una pasada de retención.
+
+    Recorre alerts por id en ventanas de batch_size * RETENTION_WINDOW_FACTOR ids, elimina en cada
+    transacción corta como máximo batch_size alertas vencidas y, ya confirmado el
+    borrado, elimina sus blobs con la Blob Batch API. El cursor se guarda en
+    job_checkpoints después de cada lote, así una pasada interrumpida continúa
+    desde donde quedó. Devuelve el estado de la pasada.
+    """
+    checkpoint = _load_checkpoint()
+    state = dict(checkpoint.state or {})
+    cursor = checkpoint.cursor or 0
+
+    if not state.get('running'):
+        min_days = db.session.execute(MIN_DAYS_SQL, {'default_days': RETENTION_DEFAULT_DAYS}).scalar()
+        if min_days is None:
+            logging.info("Retención: no hay políticas ni retención por defecto configuradas.")
+            return state
+        upper_bound = db.session.execute(UPPER_BOUND_SQL, {'min_days': min_days}).scalar() or 0
+        cursor = 0
+        state = {
+            'running': True,
+            'started_at': datetime.utcnow().isoformat(),
+            'upper_bound': upper_bound,
+            'deleted_alerts': 0,
+            'deleted_blobs': 0,
+            'batches': 0,
+        }
+        _save_checkpoint(checkpoint, cursor, state)
+        logging.info(f"Retención: nueva pasada hasta la alerta {upper_bound}.")
+        logging.info(f"Retención: {purge_expired_idempotency_keys()} Idempotency-Key vencidos eliminados.")
+        logging.info(f"Retención: {purge_expired_upload_sessions()} subidas directas sin confirmar eliminadas.")
+        logging.info(f"Retención: {purge_stale_resumable_uploads()} subidas por partes inactivas eliminadas.")
+
+    upper_bound = state['upper_bound']
+    window_size = batch_size * RETENTION_WINDOW_FACTOR
+    batches = 0
+
+    while cursor < upper_bound:
+        if max_batches is not None and batches >= max_batches:
+            break
+
+        window_end = min(cursor + window_size, upper_bound)
+        params = {
+            'cursor': cursor,
+            'window_end': window_end,
+            'batch_size': batch_size,
+            'default_days': RETENTION_DEFAULT_DAYS,
+        }
+        try:
+            # Transacción corta: no esperar locks ni mantener la tabla tomada
+            db.session.execute(text("SET LOCAL lock_timeout = '2s'"))
+            db.session.execute(text("SET LOCAL statement_timeout = '30s'"))
+            deleted = db.session.execute(DELETE_BATCH_SQL, params).fetchall()
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logging.error(f"Retención: error al eliminar el lote desde la alerta {cursor}: {e}")
+            break
+
+        # Lote lleno: puede quedar más en la ventana; si no, la ventana está agotada
+        next_cursor = max(row.id for row in deleted) if len(deleted) >= batch_size else window_end
+
+        blob_names = releasable_blob_names(
+            (row.video_url, [row.video_url, row.poster_blob, row.preview_blob]) for row in deleted
+        )
+        deleted_blobs = delete_blobs(blob_names, max_workers=RETENTION_BLOB_WORKERS) if blob_names else 0
+
+        cursor = next_cursor
+        batches += 1
+        state['deleted_alerts'] += len(deleted)
+        state['deleted_blobs'] += deleted_blobs
+        state['batches'] += 1
+        state['progress'] = round(cursor / upper_bound, 4) if upper_bound else 1.0
+        _save_checkpoint(checkpoint, cursor, state)
+        logging.info(
+            f"Retención: lote {state['batches']} - {len(deleted)} alertas y {deleted_blobs} blobs eliminados, "
+            f"cursor {cursor}/{upper_bound} ({state['progress']:.1%})."
+        )
+
+        if pause:
+            time.sleep(pause)
+
+    if cursor >= upper_bound:
+        state['running'] = False
+        state['finished_at'] = datetime.utcnow().isoformat()
+        state['progress'] = 1.0
+        _save_checkpoint(checkpoint, 0, state)
+        logging.info(
+            f"Retención: pasada terminada, {state['deleted_alerts']} alertas y {state['deleted_blobs']} blobs eliminados."
+        )
+
+    return state
@@ -0,0 +1,63 @@
+from collections import namedtuple
+
+
+# Entrada de un listado: mismo formato para todos los backends
+StoredObject = namedtuple("StoredObject", ["name", "size", "last_modified"])
+
+
+class StorageBackend:
+    """
+    Interfaz de almacenamiento de clips y derivados.
+
+    Los nombres siguen el esquema <user_id>/<YYYY-MM-DD>/<archivo> y son los que se
+    guardan en la base. Las funciones de app/services/blob_storage.py delegan en el
+    backend configurado con STORAGE_BACKEND.
+    """
+
+    name = None
+
+    def upload_file(self, file_path, blob_name, content_type):
+        """Guarda el archivo con ese nombre. Devuelve el nombre, o None si falla."""
+        raise NotImplementedError
+
+    def delete_many(self, blob_names, max_workers=4):
+        """Elimina los nombres indicados. Devuelve cuántos ya no existen."""
+        raise NotImplementedError
+
+    def download_to(self, blob_name, download_path):
+        """Copia el contenido a download_path. Devuelve True si lo logró."""
+        raise NotImplementedError
+
+    def size(self, blob_name):
+        """Tamaño en bytes, o None si no existe."""
+        raise NotImplementedError
+
+    def iter_range(self, blob_name, offset, length, chunk_size):
+        """Genera los bytes [offset, offset + length) por chunks."""
+        raise NotImplementedError
+
+    def iter_pages(self, prefix, page_size, continuation_token=None):
+        """
+        Genera (objetos, next_token) ordenados por nombre (orden de bytes), con
+        StoredObject por elemento; next_token es None en la última página.
+        """
+        raise NotImplementedError
+
+    def sign_urls(self, blob_names, expiry):
+        """URLs de lectura válidas hasta expiry: {nombre: url}."""
+        raise NotImplementedError
+
+    def sign_upload_url(self, blob_name, expiry, content_type):
+        """
+        Destino de una subida directa (solo escritura, válido hasta expiry):
+        {'url', 'method', 'headers'} con los headers que el cliente debe enviar.
+        """
+        raise NotImplementedError
+
+    def upload_stream(self, stream, blob_name, content_type):
+        """Guarda lo que se lee de stream con ese nombre. Devuelve el tamaño, o None si falla."""
+        raise NotImplementedError
+
+    def local_path(self, blob_name):
+        """Ruta en disco si el backend es local (para servir con sendfile), si no None."""
+        return None
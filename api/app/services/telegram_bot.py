@@ -25,7 +25,16 @@ TELEGRAM_BOT_TOKEN=os.getenv('TELEGRAM_BOT_TOKEN')
 
 BOT_USERNAME = os.getenv('BOT_USERNAME')
 
-application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
+# Permite apuntar el bot a un servidor compatible con la Bot API (p. ej. el stand-in de benchmarks/)
+TELEGRAM_API_BASE_URL = os.getenv('TELEGRAM_API_BASE_URL', 'https://api.telegram.org')
+
+application = (
+    Application.builder()
+    .token(TELEGRAM_BOT_TOKEN)
+    .base_url(f"{TELEGRAM_API_BASE_URL}/bot")
+    .base_file_url(f"{TELEGRAM_API_BASE_URL}/file/bot")
+    .build()
+)
 
 async def start(update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = update.message.chat_id
@@ -57,12 +66,20 @@ async def send_intruder_video(video_path, chat_id):
             text="¡Alerta! Se detectó un intruso. Enviando video..."
         )
         logging.info(f"Iniciando envío del video {video_path} al chat ID: {chat_id}.")
-        with open(video_path, 'rb') as video_file:
+        if video_path.startswith(("http://", "https://")):
+            # Subidas directas: Telegram descarga el clip desde la URL firmada
             await application.bot.send_video(
                 chat_id=chat_id,
-                video=video_file,
+                video=video_path,
                 caption="¡Se ha detectado un intruso!"
             )
+        else:
+            with open(video_path, 'rb') as video_file:
+                await application.bot.send_video(
+                    chat_id=chat_id,
+                    video=video_file,
+                    caption="¡Se ha detectado un intruso!"
+                )
         logging.info("Video enviado exitosamente.")
     except Exception as e:
         logging.error(f"Error al enviar el video por Telegram: {e}")
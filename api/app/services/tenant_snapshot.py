@@ -0,0 +1,201 @@
+import logging
+import os
+import select
+import threading
+import time
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+from sqlalchemy import text
+
+from app import db
+from app.cameras.models.CamerasModel import CamerasModel, ZonesModel
+
+
+load_dotenv()
+
+# Usuarios cuya configuración (cámaras y zonas) se mantiene en memoria por proceso (LRU)
+TENANT_SNAPSHOT_CACHE_SIZE = int(os.getenv("TENANT_SNAPSHOT_CACHE_SIZE", "1024"))
+# Red de seguridad: edad máxima de una foto aunque no llegue ninguna notificación
+TENANT_SNAPSHOT_TTL_SECONDS = float(os.getenv("TENANT_SNAPSHOT_TTL_SECONDS", "300"))
+# Una cámara o zona que no está en la foto fuerza releerla si la foto tiene al menos esta
+# edad (creada en otro worker y la notificación aún no llegó), sin releer en cada 404
+TENANT_SNAPSHOT_MISS_REFRESH_SECONDS = float(os.getenv("TENANT_SNAPSHOT_MISS_REFRESH_SECONDS", "1"))
+# Canal de PostgreSQL (LISTEN/NOTIFY) por el que los workers avisan cambios; payload: user_id
+TENANT_SNAPSHOT_CHANNEL = os.getenv("TENANT_SNAPSHOT_CHANNEL", "tenant_config")
+
+
+class TenantSnapshot:
+    """
+    Foto inmutable de las cámaras y zonas de un usuario, en el formato de to_json. Las
+    lecturas y los chequeos de pertenencia se resuelven en memoria; los dicts son
+    compartidos entre solicitudes y no se deben modificar.
+    """
+
+    def __init__(self, user_id, version, cameras, zones):
+        self.user_id = user_id
+        self.version = version
+        self.cameras = OrderedDict((camera['id'], camera) for camera in cameras)
+        self.zones = OrderedDict((zone['id'], zone) for zone in zones)
+        self.zones_by_camera = {camera_id: [] for camera_id in self.cameras}
+        for zone in self.zones.values():
+            self.zones_by_camera.setdefault(zone['camera_id'], []).append(zone)
+        self.built_at = time.monotonic()
+
+    @property
+    def camera_ids(self):
+        return list(self.cameras)
+
+    def camera_zones(self, camera_id):
+        return self.zones_by_camera.get(camera_id, [])
+
+
+_snapshots = OrderedDict()  # user_id -> TenantSnapshot, del menos al más usado
+_versions = {}  # user_id -> versión vigente en este proceso (sube con cada invalidación)
+_lock = threading.Lock()
+_listener_pid = None
+
+
+def _load(user_id, version):
+    cameras = CamerasModel.query.filter_by(user_id=user_id).order_by(CamerasModel.id).all()
+    zones = ZonesModel.query.join(CamerasModel).filter(CamerasModel.user_id == user_id).order_by(ZonesModel.id).all()
+    return TenantSnapshot(user_id, version, [camera.to_json() for camera in cameras], [zone.to_json() for zone in zones])
+
+
+def get_tenant_snapshot(user_id, max_age=TENANT_SNAPSHOT_TTL_SECONDS):
+    """
+    Foto vigente de la configuración del usuario. Se arma en el primer uso y se rearma
+    si se invalidó (escritura en este proceso o notificación de otro worker) o tiene más
+    de max_age segundos. Requiere un contexto de la app.
+    """
+    _ensure_listener()
+    with _lock:
+        version = _versions.get(user_id, 0)
+        snapshot = _snapshots.get(user_id)
+        if snapshot is not None:
+            _snapshots.move_to_end(user_id)
+            if snapshot.version == version and time.monotonic() - snapshot.built_at < max_age:
+                return snapshot
+
+    # La versión se toma antes de leer: si se invalida durante la lectura, la foto queda
+    # vieja y la próxima solicitud la rearma
+    snapshot = _load(user_id, version)
+    with _lock:
+        current = _snapshots.get(user_id)
+        if current is None or current.version <= version:
+            _snapshots[user_id] = snapshot
+        while len(_snapshots) > TENANT_SNAPSHOT_CACHE_SIZE:
+            _snapshots.popitem(last=False)
+    return snapshot
+
+
+def find_camera(user_id, camera_id):
+    """
+    Cámara del usuario (dict de to_json) o None si no existe o es de otro usuario.
+    """
+    try:
+        camera_id = int(camera_id)
+    except (TypeError, ValueError):
+        return None
+    snapshot = get_tenant_snapshot(user_id)
+    camera = snapshot.cameras.get(camera_id)
+    if camera is None and time.monotonic() - snapshot.built_at >= TENANT_SNAPSHOT_MISS_REFRESH_SECONDS:
+        camera = get_tenant_snapshot(user_id, max_age=0).cameras.get(camera_id)
+    return camera
+
+
+def find_zone(user_id, zone_id):
+    """
+    Zona de una cámara del usuario (dict de to_json) o None.
+    """
+    try:
+        zone_id = int(zone_id)
+    except (TypeError, ValueError):
+        return None
+    snapshot = get_tenant_snapshot(user_id)
+    zone = snapshot.zones.get(zone_id)
+    if zone is None and time.monotonic() - snapshot.built_at >= TENANT_SNAPSHOT_MISS_REFRESH_SECONDS:
+        zone = get_tenant_snapshot(user_id, max_age=0).zones.get(zone_id)
+    return zone
+
+
+def _bump(user_id):
+    # También sin foto en memoria: puede haber una armándose con datos anteriores
+    with _lock:
+        _versions[user_id] = _versions.get(user_id, 0) + 1
+        if len(_versions) > 2 * TENANT_SNAPSHOT_CACHE_SIZE:
+            for other in [other for other in _versions if other not in _snapshots and other != user_id]:
+                del _versions[other]
+
+
+def _bump_all():
+    with _lock:
+        for user_id in _snapshots:
+            _versions[user_id] = _versions.get(user_id, 0) + 1
+
+
+def invalidate_tenant(user_id):
+    """
+    Descarta la foto del usuario en este proceso y avisa al resto de los workers. Se
+    llama después del commit que cambió sus cámaras o zonas.
+    """
+    _bump(user_id)
+    if db.engine.dialect.name != 'postgresql':
+        return
+    try:
+        db.session.execute(text("SELECT pg_notify(:channel, :payload)"),
+                           {'channel': TENANT_SNAPSHOT_CHANNEL, 'payload': str(user_id)})
+        db.session.commit()
+    except Exception as e:
+        # Los demás workers rearman la foto al vencer TENANT_SNAPSHOT_TTL_SECONDS
+        db.session.rollback()
+        logging.error(f"No se pudo notificar el cambio de configuración del usuario {user_id}: {e}")
+
+
+def _listen(engine):
+    while True:
+        connection = None
+        try:
+            # Conexión propia, fuera del pool: queda escuchando mientras viva el proceso
+            connection = engine.raw_connection()
+            raw = connection.driver_connection
+            connection.detach()
+            raw.autocommit = True
+            raw.cursor().execute(f'LISTEN "{TENANT_SNAPSHOT_CHANNEL}"')
+            # Los avisos emitidos mientras no se escuchaba se perdieron
+            _bump_all()
+            while True:
+                if select.select([raw], [], [], 60) == ([], [], []):
+                    continue
+                raw.poll()
+                while raw.notifies:
+                    notify = raw.notifies.pop(0)
+                    try:
+                        _bump(int(notify.payload))
+                    except ValueError:
+                        _bump_all()
+        except Exception as e:
+            logging.error(f"Escucha de cambios de configuración interrumpida, reintentando: {e}")
+            if connection is not None:
+                try:
+                    connection.close()
+                except Exception:
+                    pass
+            time.sleep(5)
+
+
+def _ensure_listener():
+    # Un hilo por proceso, arrancado en el primer uso (después del fork de los workers)
+    global _listener_pid
+    if _listener_pid == os.getpid():
+        return
+    with _lock:
+        if _listener_pid == os.getpid():
+            return
+        _listener_pid = os.getpid()
+        _snapshots.clear()
+        _versions.clear()
+    if db.engine.dialect.name != 'postgresql':
+        logging.info("Sin PostgreSQL: la configuración en memoria se renueva solo por TTL entre workers.")
+        return
+    threading.Thread(target=_listen, args=(db.engine,), name="tenant-snapshot-listener", daemon=True).start()
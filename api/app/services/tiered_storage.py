@@ -0,0 +1,305 @@
+import heapq
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.services.storage_backend import StorageBackend
+
+
+LOCATIONS_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS locations (
+        name TEXT PRIMARY KEY,
+        tier TEXT NOT NULL,              -- hot: solo local | both: local y blob | cold: solo blob
+        size INTEGER NOT NULL,
+        content_type TEXT,
+        created_at REAL NOT NULL,
+        offloaded_at REAL
+    );
+    CREATE INDEX IF NOT EXISTS idx_locations_tier_created ON locations (tier, created_at);
+"""
+
+
+_HOT = object()
+
+
+class LocationIndex:
+    """
+    Índice de qué nivel guarda cada archivo. Vive junto al nivel caliente (SQLite en
+    modo WAL), así lo pueden escribir la API, los procesos del media worker y el mover
+    de la misma máquina sin depender de la base principal.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._connection().executescript(LOCATIONS_SCHEMA)
+
+    def _connection(self):
+        # Una conexión por hilo y por proceso
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def record_hot(self, name, size, content_type):
+        self._connection().execute(
+            "INSERT INTO locations (name, tier, size, content_type, created_at) VALUES (?, 'hot', ?, ?, ?) "
+            "ON CONFLICT (name) DO UPDATE SET tier = 'hot', size = excluded.size, "
+            "content_type = excluded.content_type, created_at = excluded.created_at, offloaded_at = NULL",
+            (name, size, content_type, time.time())
+        )
+
+    def tier_of(self, name):
+        row = self._connection().execute("SELECT tier FROM locations WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def remove(self, names):
+        self._connection().executemany("DELETE FROM locations WHERE name = ?", [(name,) for name in names])
+
+    def pending_offload(self, limit):
+        return self._connection().execute(
+            "SELECT name, content_type FROM locations WHERE tier = 'hot' ORDER BY created_at LIMIT ?", (limit,)
+        ).fetchall()
+
+    def mark_offloaded(self, name):
+        cursor = self._connection().execute(
+            "UPDATE locations SET tier = 'both', offloaded_at = ? WHERE name = ? AND tier = 'hot'", (time.time(), name)
+        )
+        return cursor.rowcount
+
+    def eviction_candidates(self, created_before, limit):
+        # Solo lo que ya está en blob puede salir del nivel caliente, los más antiguos primero
+        return [row[0] for row in self._connection().execute(
+            "SELECT name FROM locations WHERE tier = 'both' AND created_at < ? ORDER BY created_at LIMIT ?",
+            (created_before, limit)
+        )]
+
+    def mark_evicted(self, names):
+        self._connection().executemany(
+            "UPDATE locations SET tier = 'cold' WHERE name = ? AND tier = 'both'", [(name,) for name in names]
+        )
+
+    def hot_bytes(self):
+        return self._connection().execute(
+            "SELECT COALESCE(sum(size), 0) FROM locations WHERE tier IN ('hot', 'both')"
+        ).fetchone()[0]
+
+    def stats(self):
+        return {
+            tier: {'count': count, 'bytes': size}
+            for tier, count, size in self._connection().execute(
+                "SELECT tier, count(*), COALESCE(sum(size), 0) FROM locations GROUP BY tier"
+            )
+        }
+
+
+def parse_hours_window(window):
+    """
+    "1-6" -> (1, 6); admite ventanas que cruzan la medianoche ("22-6"). "0-24" es todo el día.
+    """
+    start, end = (int(value) for value in window.split("-", 1))
+    return start, end
+
+
+class TieredStorage(StorageBackend):
+    """
+    Dos niveles: los archivos nuevos se escriben en disco local (hot) y se sirven desde
+    ahí; el mover los sube a Blob Storage (cold) por lotes, dentro de la ventana horaria
+    configurada, y los desaloja del disco por antigüedad o por capacidad una vez subidos.
+    Las lecturas buscan primero en el nivel caliente.
+    """
+
+    name = "tiered"
+
+    def __init__(self, hot, cold, index, offload_hours="0-24", hot_max_age_seconds=24 * 3600, hot_max_bytes=None):
+        self.hot = hot
+        self.cold = cold
+        self.index = index
+        self.offload_window = parse_hours_window(offload_hours)
+        self.hot_max_age_seconds = hot_max_age_seconds
+        self.hot_max_bytes = hot_max_bytes
+
+    def upload_file(self, file_path, blob_name, content_type):
+        if self.hot.upload_file(file_path, blob_name, content_type) is None:
+            # Sin espacio local (u otro error de disco): ir directo al nivel frío
+            return self.cold.upload_file(file_path, blob_name, content_type)
+        try:
+            self.index.record_hot(blob_name, os.path.getsize(file_path), content_type)
+        except sqlite3.Error as e:
+            logging.error(f"Error al registrar {blob_name} en el índice de niveles: {e}")
+            self.hot.delete_many([blob_name])
+            return self.cold.upload_file(file_path, blob_name, content_type)
+        return blob_name
+
+    def delete_many(self, blob_names, max_workers=4):
+        self.hot.delete_many(blob_names, max_workers)
+        self.index.remove(blob_names)
+        return self.cold.delete_many(blob_names, max_workers)
+
+    def download_to(self, blob_name, download_path):
+        if self.hot.local_path(blob_name):
+            return self.hot.download_to(blob_name, download_path)
+        return self.cold.download_to(blob_name, download_path)
+
+    def size(self, blob_name):
+        size = self.hot.size(blob_name)
+        return size if size is not None else self.cold.size(blob_name)
+
+    def iter_range(self, blob_name, offset, length, chunk_size):
+        backend = self.hot if self.hot.local_path(blob_name) else self.cold
+        return backend.iter_range(blob_name, offset, length, chunk_size)
+
+    def _iter_cold(self, prefix, page_size, continuation_token):
+        # Cada objeto va con el token de su página, para poder reanudar desde ahí
+        for objects, next_token in self.cold.iter_pages(prefix, page_size, continuation_token):
+            for stored in objects:
+                yield stored, continuation_token
+            continuation_token = next_token
+
+    def iter_pages(self, prefix, page_size, continuation_token=None):
+        """
+        Une los listados de ambos niveles (ordenados por nombre) sin duplicados. El token
+        es JSON con el último nombre entregado y el token de Azure de la página en curso.
+        """
+        state = json.loads(continuation_token) if continuation_token else {}
+        after = state.get("after")
+        cold_token = state.get("cold")
+
+        hot = ((stored, _HOT) for objects, _ in self.hot.iter_pages(prefix, page_size, after) for stored in objects)
+        cold = ((stored, token) for stored, token in self._iter_cold(prefix, page_size, cold_token)
+                if after is None or stored.name > after)
+
+        page, last_name = [], None
+        for stored, token in heapq.merge(hot, cold, key=lambda item: item[0].name):
+            if stored.name == last_name:
+                continue
+            if len(page) == page_size:
+                yield page, json.dumps({"after": last_name, "cold": cold_token})
+                page = []
+            if token is not _HOT:
+                cold_token = token
+            page.append(stored)
+            last_name = stored.name
+        yield page, None
+
+    def sign_urls(self, blob_names, expiry):
+        hot_names = [name for name in blob_names if self.hot.local_path(name)]
+        signed = self.hot.sign_urls(hot_names, expiry)
+        cold_names = [name for name in blob_names if name not in signed]
+        if cold_names:
+            signed.update(self.cold.sign_urls(cold_names, expiry))
+        return signed
+
+    def sign_upload_url(self, blob_name, expiry, content_type):
+        # Las subidas directas también entran por el nivel caliente (ver upload_stream)
+        return self.hot.sign_upload_url(blob_name, expiry, content_type)
+
+    def upload_stream(self, stream, blob_name, content_type):
+        size = self.hot.upload_stream(stream, blob_name, content_type)
+        if size is None:
+            return None
+        try:
+            self.index.record_hot(blob_name, size, content_type)
+        except sqlite3.Error as e:
+            logging.error(f"Error al registrar {blob_name} en el índice de niveles: {e}")
+            self.hot.delete_many([blob_name])
+            return None
+        return size
+
+    def verify_signature(self, blob_name, expires, signature, permission="r"):
+        return self.hot.verify_signature(blob_name, expires, signature, permission)
+
+    def local_path(self, blob_name):
+        return self.hot.local_path(blob_name)
+
+    def fallback_url(self, blob_name, expiry):
+        """
+        URL del nivel frío para una URL local ya firmada cuyo archivo fue desalojado.
+        """
+        return self.cold.sign_urls([blob_name], expiry)[blob_name]
+
+    def in_offload_window(self, now=None):
+        start, end = self.offload_window
+        hour = time.localtime(now).tm_hour
+        if start <= end:
+            return start <= hour < end
+        return hour >= start or hour < end
+
+    def over_capacity(self):
+        return self.hot_max_bytes is not None and self.index.hot_bytes() > self.hot_max_bytes
+
+    def offload(self, batch_size=100, max_workers=4, force=False):
+        """
+        Sube a Blob Storage un lote de archivos que solo están en disco. Fuera de la
+        ventana horaria solo corre si se fuerza o si el nivel caliente está lleno.
+        Devuelve cuántos subió.
+        """
+        if not force and not self.in_offload_window() and not self.over_capacity():
+            return 0
+
+        def offload_one(row):
+            blob_name, content_type = row
+            path = self.hot.local_path(blob_name)
+            if path is None:
+                self.index.remove([blob_name])
+                return 0
+            if self.cold.upload_file(path, blob_name, content_type or "application/octet-stream") is None:
+                return 0
+            if self.index.mark_offloaded(blob_name) == 0:
+                # Se eliminó mientras se subía: no dejar el blob huérfano
+                self.cold.delete_many([blob_name])
+                return 0
+            return 1
+
+        rows = self.index.pending_offload(batch_size)
+        if not rows:
+            return 0
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(rows)))) as executor:
+            uploaded = sum(executor.map(offload_one, rows))
+        logging.info(f"Niveles: {uploaded}/{len(rows)} archivos subidos a Blob Storage.")
+        return uploaded
+
+    def evict(self, batch_size=500):
+        """
+        Elimina del disco los archivos ya subidos: los más antiguos que hot_max_age_seconds
+        y, si se supera hot_max_bytes, los más antiguos hasta volver bajo el límite.
+        """
+        evicted = 0
+        created_before = time.time() - self.hot_max_age_seconds
+        while names := self.index.eviction_candidates(created_before, batch_size):
+            # Los que no se pudieron borrar siguen como candidatos: parar si el lote no avanza
+            if not (count := self._evict(names)):
+                break
+            evicted += count
+
+        while self.over_capacity():
+            names = self.index.eviction_candidates(time.time(), batch_size)
+            if not names or not (count := self._evict(names)):
+                break
+            evicted += count
+
+        if evicted:
+            logging.info(f"Niveles: {evicted} archivos desalojados del disco local.")
+        return evicted
+
+    def _evict(self, names):
+        # Como en offload, resultado por nombre: solo pasa a 'cold' lo que de verdad salió del disco
+        deleted = [name for name in names if self.hot.delete_many([name])]
+        self.index.mark_evicted(deleted)
+        return len(deleted)
+
+    def stats(self):
+        return {
+            'tiers': self.index.stats(),
+            'hot_bytes': self.index.hot_bytes(),
+            'hot_max_bytes': self.hot_max_bytes,
+            'in_offload_window': self.in_offload_window(),
+        }
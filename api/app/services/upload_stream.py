@@ -0,0 +1,91 @@
+import hashlib
+import os
+import shutil
+import tempfile
+
+from flask import Request
+
+
+UPLOAD_TMP_DIR = os.getenv("UPLOAD_TMP_DIR", tempfile.gettempdir())
+
+
+class HashingTemporaryFile:
+    """
+    Archivo temporal con nombre que calcula el SHA-256 de lo que se escribe. Werkzeug
+    escribe aquí cada archivo de un multipart a medida que lo recibe, así el hash está
+    listo sin volver a leer el video. El archivo se elimina al cerrarlo; para conservarlo
+    hay que crear un hard link (ver claim).
+    """
+
+    def __init__(self, directory=UPLOAD_TMP_DIR):
+        self._file = tempfile.NamedTemporaryFile(dir=directory, prefix="upload_", suffix=".part")
+        self._digest = hashlib.sha256()
+        self.size = 0
+
+    @property
+    def name(self):
+        return self._file.name
+
+    def write(self, data):
+        self._digest.update(data)
+        self.size += len(data)
+        return self._file.write(data)
+
+    def hexdigest(self):
+        return self._digest.hexdigest()
+
+    def claim(self, path):
+        """
+        Conserva el contenido recibido en path (hard link, sin copiar).
+        """
+        self._file.flush()
+        try:
+            os.link(self._file.name, path)
+        except OSError:
+            # Otro sistema de archivos: copiar
+            shutil.copyfile(self._file.name, path)
+
+    def __getattr__(self, attribute):
+        # read, seek, tell, flush, close, ... del archivo subyacente
+        return getattr(self._file, attribute)
+
+    def __iter__(self):
+        return iter(self._file)
+
+
+class HashingRequest(Request):
+    """
+    Request de la app: los archivos subidos van a HashingTemporaryFile en lugar de
+    al archivo temporal anónimo (o BytesIO) de Werkzeug.
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return HashingTemporaryFile()
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        while chunk := file.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def save_upload(file_storage, path):
+    """
+    Guarda un archivo subido en path y devuelve (sha256, tamaño). Si Werkzeug ya lo
+    escribió en un HashingTemporaryFile se reutiliza; si no, se copia calculando el hash.
+    """
+    stream = file_storage.stream
+    if isinstance(stream, HashingTemporaryFile):
+        stream.claim(path)
+        return stream.hexdigest(), stream.size
+
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "wb") as output:
+        while chunk := stream.read(1024 * 1024):
+            digest.update(chunk)
+            output.write(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
@@ -0,0 +1,139 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+from app.services.blob_storage import download_video_from_blob
+
+
+load_dotenv()
+
+# Caché LRU en disco de los clips servidos por la API, acotada en tamaño
+VIDEO_CACHE_DIR = os.getenv("VIDEO_CACHE_DIR", os.path.join(tempfile.gettempdir(), "guardvision-video-cache"))
+VIDEO_CACHE_MAX_BYTES = int(os.getenv("VIDEO_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+VIDEO_CACHE_FILL_WORKERS = int(os.getenv("VIDEO_CACHE_FILL_WORKERS", "2"))
+STALE_TMP_SECONDS = 3600
+
+
+class VideoCache:
+    """
+    Guarda clips completos en disco (<dir>/<aa>/<sha1>.mp4) y desaloja los menos usados
+    cuando se supera max_bytes. Los clips que no están se descargan en segundo plano;
+    mientras tanto la API sirve los rangos pedidos directamente desde Blob Storage.
+    """
+
+    def __init__(self, directory, max_bytes, fill_workers=2):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # path -> size, del menos al más usado
+        self._size = 0
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=fill_workers, thread_name_prefix="video-cache")
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    # Reconstruir el índice con lo que ya hay en disco (ordenado por último acceso)
+    def _load(self):
+        found = []
+        for root, _, files in os.walk(self.directory):
+            for filename in files:
+                path = os.path.join(root, filename)
+                try:
+                    stat = os.stat(path)
+                    if filename.endswith(".tmp"):
+                        # Descargas interrumpidas (las recientes pueden ser de otro proceso)
+                        if time.time() - stat.st_mtime > STALE_TMP_SECONDS:
+                            os.remove(path)
+                        continue
+                except OSError:
+                    continue
+                found.append((stat.st_atime, path, stat.st_size))
+        with self._lock:
+            for _, path, size in sorted(found):
+                self._add(path, size)
+
+    def _path_for(self, blob_name):
+        digest = hashlib.sha1(blob_name.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest[:2], f"{digest}.mp4")
+
+    def get(self, blob_name):
+        """
+        Ruta local del clip si está en caché (y lo marca como usado recientemente).
+        """
+        path = self._path_for(blob_name)
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            # No existe (o lo desalojó otro proceso que comparte el directorio)
+            with self._lock:
+                if path in self._entries:
+                    self._size -= self._entries.pop(path)
+            return None
+
+        with self._lock:
+            if path in self._entries:
+                self._entries.move_to_end(path)
+            else:
+                self._add(path, size)
+        return path
+
+    def fill_async(self, blob_name):
+        path = self._path_for(blob_name)
+        with self._lock:
+            if path in self._pending or path in self._entries:
+                return
+            self._pending.add(path)
+        self._executor.submit(self._fill, blob_name, path)
+
+    def _fill(self, blob_name, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            if not download_video_from_blob(blob_name, tmp_path):
+                return
+            # Rename atómico: los lectores nunca ven un archivo a medio escribir
+            os.replace(tmp_path, path)
+            with self._lock:
+                self._add(path, os.path.getsize(path))
+        except OSError as e:
+            logging.error(f"Error al guardar el video {blob_name} en caché: {e}")
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            with self._lock:
+                self._pending.discard(path)
+
+    # Debe llamarse con self._lock tomado
+    def _add(self, path, size):
+        if path in self._entries:
+            self._size -= self._entries.pop(path)
+        self._entries[path] = size
+        self._size += size
+        while self._size > self.max_bytes and len(self._entries) > 1:
+            evicted_path, evicted_size = self._entries.popitem(last=False)
+            self._size -= evicted_size
+            try:
+                os.remove(evicted_path)
+            except OSError:
+                pass
+            logging.info(f"Video {evicted_path} desalojado de la caché local.")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_video_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = VideoCache(VIDEO_CACHE_DIR, VIDEO_CACHE_MAX_BYTES, VIDEO_CACHE_FILL_WORKERS)
+        return _cache
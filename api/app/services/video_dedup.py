@@ -0,0 +1,107 @@
+import logging
+import os
+from datetime import datetime, timedelta
+
+from dotenv import load_dotenv
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.cameras.models.CamerasModel import AlertsModel, CamerasModel, ZonesModel
+from app.cameras.models.IdempotencyModel import IdempotencyKeysModel
+
+
+load_dotenv()
+
+# Tiempo durante el que un Idempotency-Key devuelve la alerta original
+IDEMPOTENCY_KEY_TTL = timedelta(hours=int(os.getenv("IDEMPOTENCY_KEY_TTL_HOURS", "24")))
+# Una clave que sigue "en proceso" después de esto se considera abandonada (proceso caído)
+IDEMPOTENCY_PENDING_TIMEOUT = timedelta(seconds=int(os.getenv("IDEMPOTENCY_PENDING_TIMEOUT_SECONDS", "300")))
+
+# Columnas que comparten las alertas que apuntan al mismo clip
+SHARED_VIDEO_COLUMNS = ('video_url', 'poster_blob', 'preview_blob', 'duration', 'fps', 'width', 'height')
+
+
+def claim_idempotency_key(user_id, key):
+    """
+    Reserva la clave para esta solicitud. Devuelve:
+    ('new', None) si hay que procesarla, ('replay', alerta) si ya se procesó,
+    ('in_progress', None) si otra solicitud con la misma clave está en curso.
+    """
+    now = datetime.utcnow()
+    row = db.session.get(IdempotencyKeysModel, (user_id, key))
+    if row is not None:
+        expired = row.created_at < now - IDEMPOTENCY_KEY_TTL
+        abandoned = row.alert_id is None and row.created_at < now - IDEMPOTENCY_PENDING_TIMEOUT
+        if not expired and not abandoned:
+            if row.alert_id is None:
+                return 'in_progress', None
+            return 'replay', db.session.get(AlertsModel, row.alert_id)
+        db.session.delete(row)
+        db.session.commit()
+
+    try:
+        db.session.add(IdempotencyKeysModel(user_id=user_id, key=key, created_at=now))
+        db.session.commit()
+    except IntegrityError:
+        # Otra solicitud con la misma clave la reservó primero
+        db.session.rollback()
+        return 'in_progress', None
+    return 'new', None
+
+
+def complete_idempotency_key(user_id, key, alert_id):
+    IdempotencyKeysModel.query.filter_by(user_id=user_id, key=key).update({'alert_id': alert_id})
+    db.session.commit()
+
+
+def release_idempotency_key(user_id, key):
+    try:
+        db.session.rollback()
+        IdempotencyKeysModel.query.filter_by(user_id=user_id, key=key, alert_id=None).delete()
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Error al liberar el Idempotency-Key {key}: {e}")
+
+
+def purge_expired_idempotency_keys():
+    deleted = IdempotencyKeysModel.query.filter(
+        IdempotencyKeysModel.created_at < datetime.utcnow() - IDEMPOTENCY_KEY_TTL
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
+
+
+def find_duplicate_video(user_id, content_hash):
+    """
+    Alerta del usuario con el mismo clip (y su blob ya subido), o None.
+
+    La fila queda con un lock compartido hasta el commit de la transacción: la retención
+    (FOR UPDATE SKIP LOCKED) la saltea y un DELETE espera, así el blob no se elimina
+    mientras la nueva alerta pasa a referenciarlo.
+    """
+    return AlertsModel.query.join(ZonesModel).join(CamerasModel).filter(
+        AlertsModel.content_hash == content_hash,
+        CamerasModel.user_id == user_id,
+        AlertsModel.video_url != ''
+    ).order_by(AlertsModel.id).with_for_update(read=True, of=AlertsModel).first()
+
+
+def shared_video_columns(alert):
+    return {column: getattr(alert, column) for column in SHARED_VIDEO_COLUMNS}
+
+
+def releasable_blob_names(groups):
+    """
+    groups: [(video_url, [blobs de la alerta eliminada])]. Devuelve los blobs que se
+    pueden eliminar: los de alertas cuyo video ya no referencia ninguna otra alerta.
+    Debe llamarse después del commit que eliminó las alertas.
+    """
+    groups = list(groups)
+    videos = {video for video, _ in groups if video}
+    referenced = set()
+    if videos:
+        referenced = {row[0] for row in db.session.query(AlertsModel.video_url).filter(
+            AlertsModel.video_url.in_(videos)
+        ).distinct()}
+    return [name for video, names in groups if video not in referenced for name in names if name]
@@ -0,0 +1,163 @@
+import math
+import os
+
+import shapely
+from dotenv import load_dotenv
+from shapely.geometry import Polygon
+from shapely.geometry.polygon import orient
+
+from app import db
+from app.cameras.models.CamerasModel import ZonesModel
+from app.services.tenant_snapshot import invalidate_tenant
+
+
+load_dotenv()
+
+# Tolerancia (píxeles) de la simplificación: se eliminan los vértices que desvían el
+# contorno menos que esto
+ZONE_SIMPLIFY_TOLERANCE = float(os.getenv("ZONE_SIMPLIFY_TOLERANCE", "1.0"))
+# Vértices máximos que se guardan; por encima se simplifica con tolerancias crecientes
+ZONE_MAX_VERTICES = int(os.getenv("ZONE_MAX_VERTICES", "128"))
+# Vértices máximos que se aceptan en la solicitud
+ZONE_MAX_INPUT_VERTICES = int(os.getenv("ZONE_MAX_INPUT_VERTICES", "10000"))
+# Al reparar un polígono que se cruza consigo mismo se conserva la parte más grande; si
+# las demás suman más que esta fracción del área, se rechaza (no es un simple rulo)
+ZONE_REPAIR_MAX_LOSS = float(os.getenv("ZONE_REPAIR_MAX_LOSS", "0.05"))
+
+
+def _parse_points(coords):
+    if not isinstance(coords, list):
+        raise ValueError("coords debe ser una lista de puntos {x, y}")
+    if len(coords) > ZONE_MAX_INPUT_VERTICES:
+        raise ValueError(f"coords admite hasta {ZONE_MAX_INPUT_VERTICES} puntos")
+    points = []
+    for point in coords:
+        try:
+            x, y = float(point['x']), float(point['y'])
+        except (TypeError, KeyError, ValueError):
+            raise ValueError("coords debe ser una lista de puntos {x, y} numéricos")
+        if not (math.isfinite(x) and math.isfinite(y)):
+            raise ValueError("coords no admite valores infinitos")
+        # Puntos repetidos seguidos (doble clic al dibujar)
+        if not points or points[-1] != (x, y):
+            points.append((x, y))
+    if len(points) > 1 and points[0] == points[-1]:
+        points.pop()
+    if len(points) < 3:
+        raise ValueError("La zona necesita al menos 3 puntos distintos")
+    return points
+
+
+def _repair(polygon):
+    if polygon.is_valid:
+        return Polygon(polygon.exterior)
+    repaired = shapely.make_valid(polygon)
+    parts = [part for part in getattr(repaired, 'geoms', [repaired]) if part.geom_type == 'Polygon' and part.area > 0]
+    if not parts:
+        raise ValueError("La zona no tiene área")
+    parts.sort(key=lambda part: part.area, reverse=True)
+    total = sum(part.area for part in parts)
+    if total - parts[0].area > total * ZONE_REPAIR_MAX_LOSS:
+        raise ValueError("Los lados de la zona se cruzan; dibujarla sin cruces")
+    # Sin agujeros: una zona es un único contorno
+    return Polygon(parts[0].exterior)
+
+
+def _simplify(polygon, tolerance):
+    simplified = polygon
+    if tolerance > 0:
+        simplified = polygon.simplify(tolerance, preserve_topology=True)
+    for _ in range(16):
+        if len(simplified.exterior.coords) - 1 <= ZONE_MAX_VERTICES:
+            break
+        tolerance = max(tolerance, 0.5) * 2
+        simplified = polygon.simplify(tolerance, preserve_topology=True)
+    if simplified.is_empty or not simplified.is_valid or simplified.area <= 0:
+        return polygon
+    return simplified
+
+
+def _number(value):
+    value = round(value, 2)
+    return int(value) if value.is_integer() else value
+
+
+def normalize_zone_coords(coords, tolerance=ZONE_SIMPLIFY_TOLERANCE):
+    """
+    Valida, repara y simplifica el polígono de una zona (píxeles de la cámara). Devuelve
+    (coords normalizadas, columnas derivadas). ValueError si no es un polígono utilizable.
+
+    Las coordenadas quedan sin puntos repetidos, sin el punto de cierre, sin cruces y en
+    sentido antihorario según los ejes (horario en pantalla, con y hacia abajo).
+    """
+    polygon = _simplify(_repair(Polygon(_parse_points(coords))), tolerance)
+    polygon = orient(polygon, sign=1.0)
+    if polygon.area <= 0:
+        raise ValueError("La zona no tiene área")
+
+    points = [{'x': _number(x), 'y': _number(y)} for x, y in polygon.exterior.coords[:-1]]
+    min_x, min_y, max_x, max_y = polygon.bounds
+    return points, {
+        'bbox_min_x': min_x,
+        'bbox_min_y': min_y,
+        'bbox_max_x': max_x,
+        'bbox_max_y': max_y,
+        'area': polygon.area,
+        'vertex_count': len(points)
+    }
+
+
+def apply_zone_geometry(zone, coords):
+    """
+    Normaliza coords y las guarda en la zona junto con las columnas derivadas.
+    """
+    zone.coords, derived = normalize_zone_coords(coords)
+    for column, value in derived.items():
+        setattr(zone, column, value)
+    return zone
+
+
+def _same_value(stored, value):
+    # Una base creada con columnas REAL devuelve los float redondeados a precisión simple
+    if isinstance(stored, float) and isinstance(value, float):
+        return math.isclose(stored, value, rel_tol=1e-6)
+    return stored == value
+
+
+def normalize_stored_zones(batch_size=500, dry_run=False):
+    """
+    Normaliza las zonas ya guardadas y completa sus columnas derivadas, por lotes de
+    batch_size (una transacción por lote). Las zonas inválidas no se modifican y se
+    informan en el resultado. Requiere un contexto de la app.
+    """
+    state = {'checked': 0, 'updated': 0, 'invalid': []}
+    changed_users = set()
+    last_id = 0
+    while True:
+        zones = ZonesModel.query.filter(ZonesModel.id > last_id).order_by(ZonesModel.id).limit(batch_size).all()
+        if not zones:
+            break
+        for zone in zones:
+            state['checked'] += 1
+            try:
+                coords, derived = normalize_zone_coords(zone.coords or [])
+            except ValueError as e:
+                state['invalid'].append({'zone_id': zone.id, 'error': str(e)})
+                continue
+            if coords == zone.coords and all(_same_value(getattr(zone, column), value) for column, value in derived.items()):
+                continue
+            state['updated'] += 1
+            changed_users.add(zone.camera.user_id)
+            if not dry_run:
+                zone.coords = coords
+                for column, value in derived.items():
+                    setattr(zone, column, value)
+        last_id = zones[-1].id
+        if dry_run:
+            db.session.rollback()
+        else:
+            db.session.commit()
+    if not dry_run:
+        for user_id in changed_users:
+            invalidate_tenant(user_id)
+    return state
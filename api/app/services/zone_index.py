@@ -0,0 +1,184 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import shapely
+from dotenv import load_dotenv
+from shapely import STRtree
+from shapely.geometry import Point, Polygon, box
+
+from app.cameras.models.CamerasModel import ZonesModel
+
+
+load_dotenv()
+
+# Índices por cámara que se mantienen en memoria (LRU) y cada cuánto se rearman aunque no
+# haya cambios en este proceso (zonas editadas desde otro worker de la API)
+ZONE_INDEX_CACHE_SIZE = int(os.getenv("ZONE_INDEX_CACHE_SIZE", "1024"))
+ZONE_INDEX_TTL_SECONDS = float(os.getenv("ZONE_INDEX_TTL_SECONDS", "60"))
+
+
+def zone_polygon(coords):
+    """
+    Polígono de shapely de las coordenadas de una zona; los dibujos inválidos (lados que
+    se cruzan) se reparan con make_valid. None si no tiene área.
+    """
+    if len(coords) < 3:
+        return None
+    polygon = Polygon([(point['x'], point['y']) for point in coords])
+    if not polygon.is_valid:
+        polygon = shapely.make_valid(polygon)
+    return polygon if polygon.area > 0 else None
+
+
+def geometry_from_json(data):
+    """
+    Geometría de una consulta: {"bbox": [x1, y1, x2, y2]} o {"polygon": [{"x", "y"}, ...]}
+    en píxeles de la cámara. ValueError si falta o es inválida.
+    """
+    if data.get('bbox') is not None:
+        try:
+            x1, y1, x2, y2 = (float(value) for value in data['bbox'])
+        except (TypeError, ValueError):
+            raise ValueError("bbox debe ser [x1, y1, x2, y2]")
+        return box(min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2))
+    if data.get('polygon') is not None:
+        try:
+            polygon = zone_polygon([{'x': float(point['x']), 'y': float(point['y'])} for point in data['polygon']])
+        except (TypeError, KeyError, ValueError):
+            raise ValueError("polygon debe ser una lista de puntos {x, y}")
+        if polygon is None:
+            raise ValueError("polygon debe tener al menos 3 puntos y área")
+        return polygon
+    raise ValueError("Se requiere bbox o polygon")
+
+
+def _coords_key(coords):
+    return tuple((point['x'], point['y']) for point in coords)
+
+
+class CameraZoneIndex:
+    """
+    Índice espacial (STRtree) de las zonas de una cámara, en píxeles de la cámara. Las
+    consultas descartan por caja envolvente en el árbol y solo evalúan la geometría de
+    los candidatos.
+
+    Como STRtree, el índice es inmutable (se puede consultar desde varios hilos): al
+    cambiar las zonas se arma uno nuevo con previous, que reutiliza los polígonos de las
+    zonas cuyas coordenadas no cambiaron.
+    """
+
+    def __init__(self, camera_id, zones=(), previous=None):
+        self.camera_id = camera_id
+        reusable = previous._polygons if previous is not None else {}
+        polygons = {}  # zone_id -> (coords, polígono)
+        for zone in zones:
+            coords = _coords_key(zone.coords)
+            cached = reusable.get(zone.id)
+            if cached is not None and cached[0] == coords:
+                polygons[zone.id] = cached
+            else:
+                polygons[zone.id] = (coords, zone_polygon(zone.coords))
+        self._polygons = polygons
+        indexed = [(zone_id, polygon) for zone_id, (_, polygon) in polygons.items() if polygon is not None]
+        self.zone_ids = np.array([zone_id for zone_id, _ in indexed], dtype=np.int64)
+        self.geometries = np.array([polygon for _, polygon in indexed], dtype=object)
+        self.areas = shapely.area(self.geometries) if indexed else np.zeros(0)
+        self.tree = STRtree(self.geometries)
+        self.built_at = time.monotonic()
+        self.stale = False
+
+    def query(self, geometry, predicate="intersects"):
+        """
+        Zonas que cumplen predicate (intersects, contains, within, covers...) con
+        geometry: lista de (zone_id, área de la intersección).
+        """
+        indices = self.tree.query(geometry, predicate=predicate)
+        if not len(indices):
+            return []
+        areas = shapely.area(shapely.intersection(self.geometries[indices], geometry))
+        return [(int(self.zone_ids[index]), float(area)) for index, area in zip(indices, areas)]
+
+    def overlaps(self, min_area=0.0):
+        """
+        Pares de zonas que se superponen: lista de (zona_a, zona_b, área común), con
+        zona_a < zona_b y área mayor que min_area.
+        """
+        if not len(self.geometries):
+            return []
+        left, right = self.tree.query(self.geometries, predicate="intersects")
+        pairs = self.zone_ids[left] < self.zone_ids[right]
+        left, right = left[pairs], right[pairs]
+        areas = shapely.area(shapely.intersection(self.geometries[left], self.geometries[right]))
+        return [
+            (int(self.zone_ids[a]), int(self.zone_ids[b]), float(area))
+            for a, b, area in zip(left, right, areas) if area > min_area
+        ]
+
+    def area(self, zone_id):
+        index = np.flatnonzero(self.zone_ids == zone_id)
+        return float(self.areas[index[0]]) if len(index) else 0.0
+
+    def primary_zone(self, x1, y1, x2=None, y2=None, zone_ids=None):
+        """
+        Zona a la que se asigna una detección (caja x1, y1, x2, y2) o un punto (x1, y1),
+        entre zone_ids si se indica. Se elige la zona más chica que contiene el punto de
+        apoyo (centro del borde inferior de la caja): en zonas superpuestas gana la más
+        específica. Si ninguna lo contiene, la de mayor área en común con la caja.
+        Devuelve (zone_id o None, candidatas).
+        """
+        foot = Point(x1, y1) if x2 is None else Point((x1 + x2) / 2, y2)
+        candidates = self.tree.query(foot, predicate="intersects")
+        if zone_ids is not None:
+            candidates = candidates[np.isin(self.zone_ids[candidates], list(zone_ids))]
+        if len(candidates):
+            best = candidates[np.argmin(self.areas[candidates])]
+            return int(self.zone_ids[best]), [int(zone_id) for zone_id in self.zone_ids[candidates]]
+        if x2 is None:
+            return None, []
+
+        overlapping = self.query(box(min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2)))
+        if zone_ids is not None:
+            overlapping = [item for item in overlapping if item[0] in zone_ids]
+        overlapping = [item for item in overlapping if item[1] > 0]
+        if not overlapping:
+            return None, []
+        return max(overlapping, key=lambda item: item[1])[0], [zone_id for zone_id, _ in overlapping]
+
+
+_indexes = OrderedDict()  # camera_id -> CameraZoneIndex, del menos al más usado
+_indexes_lock = threading.Lock()
+
+
+def get_zone_index(camera_id):
+    """
+    Índice de las zonas de la cámara. Se arma en el primer uso y se rearma si se
+    invalidó o pasaron ZONE_INDEX_TTL_SECONDS. Requiere un contexto de la app.
+    """
+    with _indexes_lock:
+        index = _indexes.get(camera_id)
+        if index is not None:
+            _indexes.move_to_end(camera_id)
+            if not index.stale and time.monotonic() - index.built_at < ZONE_INDEX_TTL_SECONDS:
+                return index
+
+    zones = ZonesModel.query.filter_by(camera_id=camera_id).all()
+    index = CameraZoneIndex(camera_id, zones, previous=index)
+    with _indexes_lock:
+        _indexes[camera_id] = index
+        while len(_indexes) > ZONE_INDEX_CACHE_SIZE:
+            _indexes.popitem(last=False)
+    return index
+
+
+def invalidate_zone_index(camera_id):
+    """
+    Fuerza el rearmado del índice de la cámara en su próximo uso (al crear, editar o
+    eliminar sus zonas en este proceso).
+    """
+    with _indexes_lock:
+        index = _indexes.get(camera_id)
+        if index is not None:
+            index.stale = True
@@ -0,0 +1,150 @@
+import os
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+from dotenv import load_dotenv
+
+
+load_dotenv()
+
+# Memoria máxima de las máscaras cacheadas por proceso (una máscara de 1920x1080 ocupa
+# 253 KB empaquetada, un bit por píxel)
+ZONE_MASK_CACHE_MAX_BYTES = int(os.getenv("ZONE_MASK_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Bits en 1 de cada byte, para contar píxeles sobre máscaras empaquetadas
+POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+
+
+def count_bits(packed, axis=-1):
+    # np.bitwise_count (NumPy 2) evita la tabla intermedia
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(packed).sum(axis=axis, dtype=np.int64)
+    return POPCOUNT[packed].sum(axis=axis, dtype=np.int64)
+
+
+def rasterize_zone(coords, width, height, scale_x=1.0, scale_y=1.0):
+    """
+    Máscara de la zona (polígono en píxeles de la cámara, escalado por scale_x/scale_y)
+    de width x height, empaquetada con np.packbits: un bit por píxel, fila por fila.
+    """
+    mask = np.zeros((height, width), dtype=np.uint8)
+    if len(coords) >= 3:
+        polygon = np.array([[point['x'] * scale_x, point['y'] * scale_y] for point in coords], dtype=np.float64)
+        cv2.fillPoly(mask, [np.round(polygon).astype(np.int32)], 1)
+    return np.packbits(mask.ravel())
+
+
+def _coords_key(coords):
+    return tuple((point['x'], point['y']) for point in coords)
+
+
+class ZoneMaskCache:
+    """
+    Caché LRU de máscaras por (zona, resolución, escala), acotada en bytes. Solo la usa
+    el worker de cámaras, así que no hay invalidación explícita desde la API: cada entrada
+    guarda las coordenadas con que se rasterizó y get() la regenera si las de la zona
+    cambiaron. El worker relee las zonas cada CAMERA_CONFIG_REFRESH_SECONDS, por lo que
+    una edición se aplica en la siguiente recarga, y las máscaras de zonas eliminadas
+    dejan de pedirse y salen por LRU.
+    """
+
+    def __init__(self, max_bytes=ZONE_MASK_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # (zone_id, ancho, alto, escala) -> (coords, máscara)
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, zone, width, height, scale_x=1.0, scale_y=1.0):
+        key = (zone.id, width, height, scale_x, scale_y)
+        coords = _coords_key(zone.coords)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == coords:
+                self._entries.move_to_end(key)
+                return entry[1]
+
+        mask = rasterize_zone(zone.coords, width, height, scale_x, scale_y)
+        mask.flags.writeable = False
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= previous[1].nbytes
+            self._entries[key] = (coords, mask)
+            self._size += mask.nbytes
+            while self._size > self.max_bytes and len(self._entries) > 1:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._size -= evicted.nbytes
+        return mask
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_zone_mask_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ZoneMaskCache()
+        return _cache
+
+
+class ZoneMaskSet:
+    """
+    Máscaras de todas las zonas de una cámara a una resolución, apiladas en una matriz
+    (zonas x bytes): la evaluación de un cuadro es una sola operación vectorizada sin
+    importar cuántas zonas tenga la cámara.
+    """
+
+    def __init__(self, zones, width, height, scale_x=1.0, scale_y=1.0):
+        self.width = width
+        self.height = height
+        self.zone_ids = [zone.id for zone in zones]
+        cache = get_zone_mask_cache()
+        if zones:
+            self.masks = np.stack([cache.get(zone, width, height, scale_x, scale_y) for zone in zones])
+        else:
+            self.masks = np.zeros((0, (width * height + 7) // 8), dtype=np.uint8)
+        self.areas = count_bits(self.masks)
+
+    def occupancy(self, mask):
+        """
+        Fracción de cada zona (en el orden de zone_ids) cubierta por mask: matriz
+        height x width de movimiento o primer plano (distinto de 0 = ocupado).
+        """
+        packed = np.packbits(np.asarray(mask, dtype=bool).ravel())
+        overlap = count_bits(self.masks & packed)
+        return overlap / np.maximum(self.areas, 1)
+
+    def contains(self, points):
+        """
+        Matriz booleana zonas x puntos: qué puntos (x, y) caen dentro de cada zona. Los
+        puntos fuera del cuadro no caen en ninguna.
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        x = np.floor(points[:, 0]).astype(np.int64)
+        y = np.floor(points[:, 1]).astype(np.int64)
+        inside = (x >= 0) & (x < self.width) & (y >= 0) & (y < self.height)
+        index = np.where(inside, y * self.width + x, 0)
+        bits = (self.masks[:, index >> 3] >> (7 - (index & 7)).astype(np.uint8)) & 1
+        return bits.astype(bool) & inside
+
+    def counts(self, points, zone_ids=None, primary_only=False):
+        """
+        {zone_id: cantidad de puntos dentro de la zona}, solo de zone_ids si se indica.
+        Con primary_only cada punto cuenta en una sola zona, la más chica que lo contiene
+        (la más específica entre zonas superpuestas), como CameraZoneIndex.primary_zone.
+        """
+        wanted = self.zone_ids if zone_ids is None else [zone_id for zone_id in self.zone_ids if zone_id in zone_ids]
+        if not len(points):
+            return {zone_id: 0 for zone_id in wanted}
+        inside = self.contains(points) & np.isin(self.zone_ids, wanted)[:, None]
+        if primary_only:
+            sizes = np.where(inside, self.areas[:, None], np.iinfo(np.int64).max)
+            primary = sizes.argmin(axis=0)[inside.any(axis=0)]
+            per_zone = np.bincount(primary, minlength=len(self.zone_ids))
+        else:
+            per_zone = inside.sum(axis=1)
+        return {zone_id: int(count) for zone_id, count in zip(self.zone_ids, per_zone) if zone_id in wanted}
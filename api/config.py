@@ -1,12 +1,28 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv(override=True)
 
 class Config:
-    
+
     #Conexión a la base de datos postgres
 
     SQLALCHEMY_DATABASE_URI =  os.getenv("DATABASE_URL")
 
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Profiler opt-in para workers en producción
+    # PROFILER_SAMPLE_RATE: fracción de solicitudes perfiladas (0.0 - 1.0)
+    # PROFILER_ADMIN_TOKEN: si la solicitud trae el header X-Profile con este valor, se perfila siempre
+    # PROFILER_CONTROL_FILE: JSON opcional que sobreescribe enabled/sample_rate/mode en caliente, sin redeploy
+    PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "false").lower() == "true"
+    PROFILER_MODE = os.getenv("PROFILER_MODE", "sample")  # sample | cprofile
+    PROFILER_SAMPLE_RATE = float(os.getenv("PROFILER_SAMPLE_RATE", "0"))
+    PROFILER_INTERVAL_MS = float(os.getenv("PROFILER_INTERVAL_MS", "5"))
+    PROFILER_ADMIN_TOKEN = os.getenv("PROFILER_ADMIN_TOKEN")
+    PROFILER_CONTROL_FILE = os.getenv("PROFILER_CONTROL_FILE")
+    PROFILER_OUTPUT_DIR = os.getenv("PROFILER_OUTPUT_DIR", os.path.join(tempfile.gettempdir(), "guardvision-profiles"))
+
+    # Agrega el header X-Query-Count (consultas SQL por solicitud); pensado para benchmarks/
+    QUERY_COUNT_HEADER = os.getenv("QUERY_COUNT_HEADER", "false").lower() == "true"
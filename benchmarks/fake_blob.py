@@ -0,0 +1,281 @@
+"""
+Stand-in local de Azure Blob Storage para benchmarks.
+
+Implementa el subconjunto de la API REST que usa app/services/blob_storage.py
+(propiedades de contenedor, Put Blob, Put Block / Put Block List, Get Blob con rangos,
+Get Blob Properties, Delete Blob, Blob Batch de borrados y List Blobs con marker).
+No valida firmas.
+
+Uso:
+    python benchmarks/fake_blob.py --port 10000 --data-dir /tmp/fake-blob
+
+Cadena de conexión para la API:
+    DefaultEndpointsProtocol=http;AccountName=devstoreaccount1;
+    AccountKey=Eby8vdM02xNOcqFlqUwJPLlmEtlCDXJ1OUzFT50uSRZ6IFsuFq2UVErCz4I6tq/K1SZFPTOtr/KBHBeksoGMGw==;
+    BlobEndpoint=http://127.0.0.1:10000/devstoreaccount1;
+"""
+import argparse
+import base64
+import hashlib
+import json
+import os
+import re
+import threading
+import uuid
+from collections import Counter
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+from xml.sax.saxutils import escape
+
+
+class BlobStore:
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+        self.lock = threading.Lock()
+        self.blobs = {}           # (container, name) -> {'path', 'size', 'etag', 'last_modified', 'content_type'}
+        self.blocks = {}          # (container, name, block_id) -> bytes
+        self.stats = Counter()
+        os.makedirs(data_dir, exist_ok=True)
+
+    def path_for(self, container, name):
+        digest = hashlib.sha1(f"{container}/{name}".encode()).hexdigest()
+        return os.path.join(self.data_dir, digest[:2], digest)
+
+    def put(self, container, name, data, content_type):
+        path = self.path_for(container, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "wb") as file:
+            file.write(data)
+        os.replace(tmp, path)
+        entry = {
+            'path': path,
+            'size': len(data),
+            'etag': f'"0x{uuid.uuid4().hex[:16].upper()}"',
+            'last_modified': formatdate(usegmt=True),
+            'content_type': content_type or "application/octet-stream",
+        }
+        with self.lock:
+            self.blobs[(container, name)] = entry
+        return entry
+
+    def get(self, container, name):
+        with self.lock:
+            return self.blobs.get((container, name))
+
+    def delete(self, container, name):
+        with self.lock:
+            entry = self.blobs.pop((container, name), None)
+        if entry and os.path.exists(entry['path']):
+            os.remove(entry['path'])
+        return entry
+
+    def list(self, container, prefix, marker, max_results):
+        with self.lock:
+            names = sorted(name for (c, name) in self.blobs if c == container and name.startswith(prefix))
+        if marker:
+            names = [name for name in names if name >= marker]
+        page, rest = names[:max_results], names[max_results:]
+        return [(name, self.blobs[(container, name)]) for name in page], (rest[0] if rest else "")
+
+
+class BlobHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    store = None
+
+    def log_message(self, format, *args):
+        pass
+
+    # Utilidades ---------------------------------------------------------
+
+    def _parts(self):
+        parsed = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+        segments = parsed.path.lstrip("/").split("/", 2)
+        account = segments[0] if len(segments) > 0 else ""
+        container = segments[1] if len(segments) > 1 else ""
+        name = unquote(segments[2]) if len(segments) > 2 else ""
+        return account, container, name, query
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _send(self, status, body=b"", headers=None):
+        self.send_response(status)
+        self.send_header("x-ms-request-id", str(uuid.uuid4()))
+        self.send_header("x-ms-version", "2025-01-05")
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body and self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _error(self, status, code):
+        body = f'<?xml version="1.0" encoding="utf-8"?><Error><Code>{code}</Code><Message>{code}</Message></Error>'.encode()
+        self._send(status, body, {"x-ms-error-code": code, "Content-Type": "application/xml"})
+
+    def _blob_headers(self, entry):
+        return {
+            "ETag": entry['etag'],
+            "Last-Modified": entry['last_modified'],
+            "Content-Type": entry['content_type'],
+            "x-ms-blob-type": "BlockBlob",
+            "Accept-Ranges": "bytes",
+        }
+
+    # Verbos -------------------------------------------------------------
+
+    def do_GET(self):
+        account, container, name, query = self._parts()
+        if self.path.startswith("/_stats"):
+            return self._send(200, json.dumps(self.store.stats).encode(), {"Content-Type": "application/json"})
+
+        if not name and query.get("restype") == "container" and query.get("comp") == "list":
+            self.store.stats["list"] += 1
+            return self._list(account, container, query)
+        if not name and query.get("restype") == "container":
+            self.store.stats["container_properties"] += 1
+            return self._send(200, headers={"ETag": '"0x1"', "Last-Modified": formatdate(usegmt=True)})
+
+        self.store.stats["get"] += 1
+        entry = self.store.get(container, name)
+        if entry is None:
+            return self._error(404, "BlobNotFound")
+
+        range_header = self.headers.get("x-ms-range") or self.headers.get("Range")
+        with open(entry['path'], "rb") as file:
+            if range_header:
+                match = re.match(r"bytes=(\d+)-(\d*)", range_header)
+                start = int(match.group(1))
+                end = int(match.group(2)) if match.group(2) else entry['size'] - 1
+                if start >= entry['size']:
+                    return self._error(416, "InvalidRange")
+                end = min(end, entry['size'] - 1)
+                file.seek(start)
+                data = file.read(end - start + 1)
+                headers = self._blob_headers(entry)
+                headers["Content-Range"] = f"bytes {start}-{end}/{entry['size']}"
+                return self._send(206, data, headers)
+            data = file.read()
+        self._send(200, data, self._blob_headers(entry))
+
+    def do_HEAD(self):
+        account, container, name, query = self._parts()
+        self.store.stats["head"] += 1
+        if not name:
+            return self._send(200, headers={"ETag": '"0x1"', "Last-Modified": formatdate(usegmt=True)})
+        entry = self.store.get(container, name)
+        if entry is None:
+            return self._error(404, "BlobNotFound")
+        self.send_response(200)
+        for key, value in self._blob_headers(entry).items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(entry['size']))
+        self.end_headers()
+
+    def do_PUT(self):
+        account, container, name, query = self._parts()
+        body = self._body()
+        if not name:
+            self.store.stats["create_container"] += 1
+            return self._send(201, headers={"ETag": '"0x1"', "Last-Modified": formatdate(usegmt=True)})
+
+        if query.get("comp") == "block":
+            self.store.stats["put_block"] += 1
+            with self.store.lock:
+                self.store.blocks[(container, name, query["blockid"])] = body
+            return self._send(201)
+
+        if query.get("comp") == "blocklist":
+            self.store.stats["put_block_list"] += 1
+            block_ids = re.findall(r"<(?:Latest|Uncommitted|Committed)>([^<]+)</", body.decode())
+            with self.store.lock:
+                data = b"".join(self.store.blocks.pop((container, name, block_id)) for block_id in block_ids)
+            entry = self.store.put(container, name, data, self.headers.get("x-ms-blob-content-type"))
+            return self._send(201, headers={"ETag": entry['etag'], "Last-Modified": entry['last_modified']})
+
+        self.store.stats["put"] += 1
+        self.store.stats["bytes_in"] += len(body)
+        content_type = self.headers.get("x-ms-blob-content-type") or self.headers.get("Content-Type")
+        entry = self.store.put(container, name, body, content_type)
+        md5 = base64.b64encode(hashlib.md5(body).digest()).decode()
+        self._send(201, headers={"ETag": entry['etag'], "Last-Modified": entry['last_modified'], "Content-MD5": md5})
+
+    def do_DELETE(self):
+        account, container, name, query = self._parts()
+        self.store.stats["delete"] += 1
+        if self.store.delete(container, name) is None:
+            return self._error(404, "BlobNotFound")
+        self._send(202, headers={"x-ms-delete-type-permanent": "true"})
+
+    def do_POST(self):
+        account, container, name, query = self._parts()
+        body = self._body()
+        if query.get("comp") != "batch":
+            return self._error(400, "UnsupportedHttpVerb")
+
+        # Blob Batch: multipart/mixed con una subsolicitud DELETE por parte
+        self.store.stats["batch"] += 1
+        request_boundary = re.search(r"boundary=([^;]+)", self.headers.get("Content-Type", "")).group(1)
+        response_boundary = f"batchresponse_{uuid.uuid4()}"
+        parts = []
+        for part in body.decode().split(f"--{request_boundary}"):
+            match = re.search(r"^(DELETE) (\S+) HTTP/1\.1", part, re.MULTILINE)
+            if not match:
+                continue
+            content_id = re.search(r"Content-ID: (\d+)", part).group(1)
+            target = unquote(urlparse(match.group(2)).path.lstrip("/"))
+            target_container, _, target_name = target.partition("/")
+            if target_container != container:
+                # Rutas con el nombre de la cuenta como primer segmento
+                target_container, _, target_name = target_name.partition("/")
+            self.store.stats["delete"] += 1
+            deleted = self.store.delete(target_container, target_name) is not None
+            status = "202 Accepted" if deleted else "404 The specified blob does not exist."
+            extra = "x-ms-delete-type-permanent: true\r\n" if deleted else "x-ms-error-code: BlobNotFound\r\n"
+            parts.append(
+                f"--{response_boundary}\r\nContent-Type: application/http\r\nContent-ID: {content_id}\r\n\r\n"
+                f"HTTP/1.1 {status}\r\n{extra}x-ms-request-id: {uuid.uuid4()}\r\nx-ms-version: 2025-01-05\r\n\r\n"
+            )
+        payload = ("".join(parts) + f"--{response_boundary}--\r\n").encode()
+        self._send(202, payload, {"Content-Type": f"multipart/mixed; boundary={response_boundary}"})
+
+    def _list(self, account, container, query):
+        prefix = query.get("prefix", "")
+        marker = query.get("marker", "")
+        max_results = int(query.get("maxresults", 5000))
+        page, next_marker = self.store.list(container, prefix, marker, max_results)
+        items = "".join(
+            f"<Blob><Name>{escape(name)}</Name><Properties>"
+            f"<Last-Modified>{entry['last_modified']}</Last-Modified><Etag>{entry['etag']}</Etag>"
+            f"<Content-Length>{entry['size']}</Content-Length><Content-Type>{entry['content_type']}</Content-Type>"
+            f"<BlobType>BlockBlob</BlobType></Properties></Blob>"
+            for name, entry in page
+        )
+        body = (
+            '<?xml version="1.0" encoding="utf-8"?>'
+            f'<EnumerationResults ServiceEndpoint="http://{self.headers.get("Host")}/{account}" ContainerName="{escape(container)}">'
+            f"<Prefix>{escape(prefix)}</Prefix><Marker>{escape(marker)}</Marker><MaxResults>{max_results}</MaxResults>"
+            f"<Blobs>{items}</Blobs><NextMarker>{escape(next_marker)}</NextMarker></EnumerationResults>"
+        ).encode()
+        self._send(200, body, {"Content-Type": "application/xml"})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stand-in local de Azure Blob Storage")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=10000)
+    parser.add_argument("--data-dir", default=os.path.join(os.getcwd(), ".fake-blob"))
+    args = parser.parse_args()
+
+    BlobHandler.store = BlobStore(args.data_dir)
+    server = ThreadingHTTPServer((args.host, args.port), BlobHandler)
+    print(f"Fake Blob Storage escuchando en http://{args.host}:{args.port} (datos en {args.data_dir})")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Stand-in local de cámaras IP para probar los workers de cámaras sin hardware.
+
+Sirve cada video indicado como un stream MJPEG en vivo (multipart/x-mixed-replace) a
+su fps nativo y en bucle, como haría una cámara: GET /<n> sirve el n-ésimo video
+(desde 0). OpenCV lo abre igual que un rtsp:// (backend FFmpeg). Sin videos genera
+una escena sintética con un objeto que cruza el cuadro cada pocos segundos.
+
+Uso:
+    python benchmarks/fake_camera.py --port 8554 [video.mp4 ...]
+
+En la cámara (POST /cameras) usar rtsp_url=http://127.0.0.1:8554/0. Los workers
+también aceptan la ruta de un archivo local como rtsp_url.
+"""
+import argparse
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+import numpy as np
+
+
+BOUNDARY = "frame"
+
+
+def synthetic_frames(width=640, height=360, fps=15.0):
+    frame_index = 0
+    while True:
+        frame = np.full((height, width, 3), 60, dtype=np.uint8)
+        cv2.putText(frame, time.strftime("%H:%M:%S"), (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (200, 200, 200), 2)
+        # Un "intruso" cruza de izquierda a derecha durante 4 s de cada 8 s
+        phase = (frame_index / fps) % 8.0
+        if phase < 4.0:
+            x = int(phase / 4.0 * (width - 80))
+            cv2.rectangle(frame, (x, height // 3), (x + 60, height - 20), (30, 160, 220), -1)
+        frame_index += 1
+        yield frame, fps
+
+
+def file_frames(path):
+    while True:
+        capture = cv2.VideoCapture(path)
+        fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+        while True:
+            ok, frame = capture.read()
+            if not ok:
+                break
+            yield frame, fps
+        capture.release()
+
+
+class CameraHandler(BaseHTTPRequestHandler):
+    sources = []
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        try:
+            index = int(self.path.strip("/").split("?")[0] or 0)
+            source = self.sources[index]
+        except (ValueError, IndexError):
+            self.send_error(404)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={BOUNDARY}")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+        frames = file_frames(source) if source else synthetic_frames()
+        next_frame = time.monotonic()
+        try:
+            for frame, fps in frames:
+                ok, jpeg = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
+                if not ok:
+                    continue
+                self.wfile.write(
+                    f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\nContent-Length: {len(jpeg)}\r\n\r\n".encode()
+                )
+                self.wfile.write(jpeg.tobytes())
+                self.wfile.write(b"\r\n")
+                # Ritmo de una cámara en vivo
+                next_frame += 1.0 / fps
+                time.sleep(max(0.0, next_frame - time.monotonic()))
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("videos", nargs="*", help="Videos a servir (uno por cámara).")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8554)
+    args = parser.parse_args()
+
+    CameraHandler.sources = args.videos or [None]
+    server = ThreadingHTTPServer((args.host, args.port), CameraHandler)
+    server.daemon_threads = True
+    print(f"Cámaras simuladas en http://{args.host}:{args.port}/0..{len(CameraHandler.sources) - 1}")
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
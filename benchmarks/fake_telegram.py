@@ -0,0 +1,112 @@
+"""
+Stand-in local de la Telegram Bot API para benchmarks.
+
+Responde a los métodos que usa app/services/telegram_bot.py (getMe, deleteWebhook,
+getUpdates, sendMessage, sendVideo) sin enviar nada. Cuenta llamadas y bytes recibidos,
+expuestos en GET /_stats.
+
+Uso:
+    python benchmarks/fake_telegram.py --port 8081 [--latency-ms 150]
+
+Variables para la API:
+    TELEGRAM_API_BASE_URL=http://127.0.0.1:8081
+    TELEGRAM_BOT_TOKEN=123456:bench
+"""
+import argparse
+import itertools
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class TelegramState:
+    def __init__(self, latency):
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.stats = Counter()
+        self.message_ids = itertools.count(1)
+
+
+class TelegramHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _message(self, extra=None):
+        with self.state.lock:
+            message_id = next(self.state.message_ids)
+        message = {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": 1, "type": "private"},
+            "from": {"id": 123456, "is_bot": True, "first_name": "GuardVision Bench"},
+        }
+        message.update(extra or {})
+        return message
+
+    def _handle(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+
+        if self.path.startswith("/_stats"):
+            return self._send_json(200, dict(self.state.stats))
+
+        # /bot<token>/<method>
+        method = self.path.rstrip("/").rsplit("/", 1)[-1].split("?")[0]
+        with self.state.lock:
+            self.state.stats[method] += 1
+            self.state.stats["bytes_in"] += length
+
+        if self.state.latency:
+            time.sleep(self.state.latency)
+
+        if method == "getMe":
+            result = {"id": 123456, "is_bot": True, "first_name": "GuardVision Bench", "username": "guardvision_bench_bot"}
+        elif method in ("deleteWebhook", "setWebhook", "close", "logOut"):
+            result = True
+        elif method == "getUpdates":
+            result = []
+        elif method == "sendVideo":
+            result = self._message({
+                "video": {"file_id": "bench", "file_unique_id": "bench", "width": 640, "height": 480, "duration": 5},
+                "caption": "bench",
+            })
+        elif method == "sendMessage":
+            result = self._message({"text": "bench"})
+        else:
+            return self._send_json(404, {"ok": False, "error_code": 404, "description": "Not Found"})
+
+        self._send_json(200, {"ok": True, "result": result})
+
+    do_GET = _handle
+    do_POST = _handle
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stand-in local de la Telegram Bot API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency-ms", type=float, default=0, help="Latencia artificial por llamada")
+    args = parser.parse_args()
+
+    TelegramHandler.state = TelegramState(args.latency_ms / 1000)
+    server = ThreadingHTTPServer((args.host, args.port), TelegramHandler)
+    print(f"Fake Telegram Bot API escuchando en http://{args.host}:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+Benchmark del paso de cuadros entre procesos decodificadores y analizadores: anillo en
+memoria compartida (app.services.frame_ring.FrameRing, el de CAMERA_PIPELINE=shm)
+contra una multiprocessing.Queue por cámara (cada cuadro se serializa y se copia por
+un pipe).
+
+Los decodificadores publican cuadros sintéticos de las cámaras que les tocan (ritmo
+--fps por cámara, 0 = lo más rápido posible) con descarte del más viejo cuando el
+analizador no da abasto; los analizadores consumen el más reciente de cada cámara y
+corren un análisis del costo del filtro de movimiento (--work motion) o solo tocan el
+cuadro (--work none, mide el transporte puro).
+
+Reporta cuadros analizados por segundo, descartados, latencia decodificador ->
+analizador y cuadros por segundo por núcleo (cuadros analizados / segundos de CPU de
+todos los procesos): con CAMERA_ANALYSIS_FPS cuadros por cámara, fps por núcleo /
+CAMERA_ANALYSIS_FPS es cuántas cámaras analiza cada núcleo.
+
+Uso:
+    python benchmarks/frame_ring_bench.py --cameras 8 --decoders 2 --analyzers 2 --size 1280x720
+"""
+import argparse
+import multiprocessing
+import os
+import queue
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+
+from app.services.frame_ring import FrameRing  # noqa: E402
+
+
+def make_frames(width, height, count=8):
+    # Pocos cuadros distintos, precalculados: el benchmark no mide la decodificación
+    frames = []
+    for index in range(count):
+        frame = np.full((height, width, 3), 60, dtype=np.uint8)
+        x = int(index / count * (width - width // 8))
+        cv2.rectangle(frame, (x, height // 3), (x + width // 10, height - 20), (30, 160, 220), -1)
+        frames.append(frame)
+    return frames
+
+
+def analyze(frame, work, state):
+    if work == "none":
+        return int(frame[::64, ::64, 0].sum())
+    # Mismo costo que MotionGate.score: reducir, grises, suavizar y comparar con el fondo
+    height, width = frame.shape[:2]
+    small = cv2.resize(frame, (320, max(1, int(height * 320 / width))), interpolation=cv2.INTER_AREA)
+    gray = cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (21, 21), 0)
+    background = state.get("background")
+    if background is None or background.shape != gray.shape:
+        state["background"] = gray.astype(np.float32)
+        return 0
+    diff = cv2.absdiff(gray, cv2.convertScaleAbs(background))
+    cv2.accumulateWeighted(gray, background, 0.05)
+    return cv2.countNonZero(diff)
+
+
+def decoder(transport, channel, cameras, args, start, stop, results):
+    frames = make_frames(*args.size)
+    ring = FrameRing.attach(channel) if transport == "ring" else None
+    produced = dropped = 0
+    interval = 1.0 / args.fps if args.fps else 0.0
+    start.wait()
+    next_frame = time.monotonic()
+    cpu = time.process_time()
+    while not stop.is_set():
+        for camera in cameras:
+            frame = frames[produced % len(frames)]
+            if ring is not None:
+                ring.write(camera, frame, time.monotonic())
+            else:
+                frame_queue = channel[camera]
+                item = (time.monotonic(), frame)
+                try:
+                    frame_queue.put_nowait(item)
+                except queue.Full:
+                    # Descarte del más viejo, como el anillo
+                    try:
+                        frame_queue.get_nowait()
+                        dropped += 1
+                    except queue.Empty:
+                        pass
+                    try:
+                        frame_queue.put_nowait(item)
+                    except queue.Full:
+                        dropped += 1
+            produced += 1
+        if interval:
+            next_frame += interval
+            time.sleep(max(0.0, next_frame - time.monotonic()))
+    results.put(("decoder", produced, dropped, time.process_time() - cpu, []))
+    if ring is not None:
+        ring.close()
+    else:
+        for camera in cameras:
+            channel[camera].cancel_join_thread()
+
+
+def analyzer(transport, channel, cameras, args, start, stop, results):
+    ring = FrameRing.attach(channel) if transport == "ring" else None
+    last = {camera: 0 for camera in cameras}
+    states = {camera: {} for camera in cameras}
+    analyzed = dropped = 0
+    latencies = []
+    start.wait()
+    cpu = time.process_time()
+    while not stop.is_set():
+        idle = True
+        for camera in cameras:
+            if ring is not None:
+                item = ring.read(camera, last[camera])
+                if item is None:
+                    continue
+                seq, frame, clock = item
+                if last[camera]:
+                    dropped += seq - last[camera] - 1
+                last[camera] = seq
+            else:
+                try:
+                    clock, frame = channel[camera].get_nowait()
+                except queue.Empty:
+                    continue
+            idle = False
+            latencies.append(time.monotonic() - clock)
+            analyze(frame, args.work, states[camera])
+            analyzed += 1
+        if idle:
+            time.sleep(0.001)
+    results.put(("analyzer", analyzed, dropped, time.process_time() - cpu, latencies))
+    if ring is not None:
+        ring.close()
+
+
+def run(transport, args):
+    context = multiprocessing.get_context("spawn")
+    width, height = args.size
+    if transport == "ring":
+        ring = FrameRing(args.cameras, slots=args.slots, max_size=(width, height))
+        channel = ring.spec
+    else:
+        ring = None
+        channel = [context.Queue(maxsize=args.slots) for _ in range(args.cameras)]
+
+    # Todos los procesos arrancan la medición juntos, ya importados y conectados
+    start = context.Barrier(args.decoders + args.analyzers + 1)
+    stop = context.Event()
+    results = context.Queue()
+    cameras = list(range(args.cameras))
+    processes = [
+        context.Process(target=decoder, args=(transport, channel, cameras[i::args.decoders], args, start, stop, results))
+        for i in range(args.decoders)
+    ] + [
+        context.Process(target=analyzer, args=(transport, channel, cameras[i::args.analyzers], args, start, stop, results))
+        for i in range(args.analyzers)
+    ]
+    for process in processes:
+        process.start()
+    start.wait()
+    began = time.monotonic()
+    time.sleep(args.seconds)
+    stop.set()
+    wall = time.monotonic() - began
+    reports = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    if ring is not None:
+        ring.close()
+
+    produced = sum(report[1] for report in reports if report[0] == "decoder")
+    analyzed = sum(report[1] for report in reports if report[0] == "analyzer")
+    dropped = sum(report[2] for report in reports)
+    cpu = sum(report[3] for report in reports)
+    latencies = np.array([latency for report in reports for latency in report[4]] or [0.0]) * 1000
+    return {
+        "transport": transport,
+        "produced_fps": produced / wall,
+        "analyzed_fps": analyzed / wall,
+        "dropped_pct": 100.0 * dropped / max(1, produced),
+        "cpu_cores": cpu / wall,
+        "fps_per_core": analyzed / cpu if cpu else 0.0,
+        "latency_p50_ms": float(np.percentile(latencies, 50)),
+        "latency_p99_ms": float(np.percentile(latencies, 99)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transport", choices=["ring", "queue", "both"], default="both")
+    parser.add_argument("--cameras", type=int, default=8)
+    parser.add_argument("--decoders", type=int, default=2)
+    parser.add_argument("--analyzers", type=int, default=2)
+    parser.add_argument("--size", default="1280x720", help="Resolución de los cuadros (ANCHOxALTO).")
+    parser.add_argument("--fps", type=float, default=5.0, help="Cuadros por segundo por cámara (0 = sin límite).")
+    parser.add_argument("--slots", type=int, default=4, help="Slots por cámara (maxsize de cada Queue).")
+    parser.add_argument("--work", choices=["motion", "none"], default="motion")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    args = parser.parse_args()
+    args.size = tuple(int(part) for part in args.size.lower().split("x", 1))
+
+    transports = ["ring", "queue"] if args.transport == "both" else [args.transport]
+    print(f"{args.cameras} cámaras {args.size[0]}x{args.size[1]} a {args.fps or 'máx'} fps, "
+          f"{args.decoders} decodificadores, {args.analyzers} analizadores, trabajo: {args.work}")
+    print(f"{'transporte':<10} {'publicados/s':>12} {'analizados/s':>12} {'descarte %':>10} "
+          f"{'núcleos':>8} {'fps/núcleo':>10} {'p50 ms':>8} {'p99 ms':>8}")
+    for transport in transports:
+        result = run(transport, args)
+        print(f"{result['transport']:<10} {result['produced_fps']:>12.1f} {result['analyzed_fps']:>12.1f} "
+              f"{result['dropped_pct']:>10.1f} {result['cpu_cores']:>8.2f} {result['fps_per_core']:>10.1f} "
+              f"{result['latency_p50_ms']:>8.2f} {result['latency_p99_ms']:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,426 @@
+"""
+Prueba de carga end-to-end de la API de GuardVision.
+
+Inicia sesión con los usuarios creados por seed.py, descubre sus cámaras, zonas y alertas
+y ejecuta una mezcla ponderada de solicitudes contra todos los endpoints, con
+POST /alerts (subida de video) como carga principal, a la concurrencia indicada.
+
+Por endpoint reporta solicitudes, errores, throughput, latencia p50/p95/p99 y consultas SQL
+por solicitud (header X-Query-Count, la API debe correr con QUERY_COUNT_HEADER=true).
+El resultado se guarda como JSON; con --baseline se compara contra una corrida anterior y el
+proceso termina con código 1 si algún endpoint empeora más de --max-regression.
+
+Uso:
+    python benchmarks/loadtest.py --base-url http://127.0.0.1:5020 --users 50 \
+        --concurrency 16 --duration 60 --output benchmarks/results/baseline.json
+"""
+import argparse
+import itertools
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+import requests
+
+from seed import bench_email, random_polygon
+
+# Peso relativo de cada operación en la mezcla
+DEFAULT_MIX = {
+    "create_alert": 30,
+    "get_alerts": 4,
+    "get_alert": 8,
+    "delete_alert": 3,
+    "get_cameras": 6,
+    "get_camera": 4,
+    "camera_crud": 1,
+    "get_zones": 6,
+    "get_zone": 4,
+    "get_camera_zones": 4,
+    "zone_crud": 1,
+    "daily_count": 5,
+    "daily_alerts": 4,
+    "person_count": 5,
+    "alerts_by_zone": 4,
+    "hourly_distribution": 4,
+    "current_user": 2,
+    "account_lifecycle": 1,
+}
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    # Nearest-rank
+    index = max(0, math.ceil(p / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def make_video(path, size_kb):
+    """
+    Genera un MP4 real con OpenCV si está disponible; si no, bytes aleatorios del tamaño pedido.
+    """
+    try:
+        import cv2
+        import numpy as np
+
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), 10, (640, 360))
+        frames = max(10, size_kb // 8)
+        for i in range(frames):
+            frame = np.random.randint(0, 255, (360, 640, 3), dtype=np.uint8)
+            cv2.putText(frame, f"bench {i}", (20, 180), cv2.FONT_HERSHEY_SIMPLEX, 2, (255, 255, 255), 3)
+            writer.write(frame)
+        writer.release()
+        if os.path.getsize(path) > 0:
+            return path
+    except ImportError:
+        pass
+    with open(path, "wb") as file:
+        file.write(os.urandom(size_kb * 1024))
+    return path
+
+
+class Recorder:
+    def __init__(self, measure_from=0):
+        # Las muestras anteriores a measure_from (calentamiento) se descartan
+        self.measure_from = measure_from
+        self.lock = threading.Lock()
+        self.samples = defaultdict(list)     # endpoint -> [latencia_ms]
+        self.queries = defaultdict(list)     # endpoint -> [consultas]
+        self.errors = defaultdict(int)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    def record(self, endpoint, response, elapsed_ms):
+        if time.monotonic() < self.measure_from:
+            return
+        with self.lock:
+            self.samples[endpoint].append(elapsed_ms)
+            self.statuses[endpoint][response.status_code] += 1
+            if response.status_code >= 400:
+                self.errors[endpoint] += 1
+            query_count = response.headers.get("X-Query-Count")
+            if query_count is not None:
+                self.queries[endpoint].append(int(query_count))
+
+    def summary(self, wall_seconds):
+        endpoints = {}
+        for endpoint, latencies in sorted(self.samples.items()):
+            latencies = sorted(latencies)
+            queries = sorted(self.queries.get(endpoint, []))
+            endpoints[endpoint] = {
+                "requests": len(latencies),
+                "errors": self.errors.get(endpoint, 0),
+                "statuses": {str(k): v for k, v in self.statuses[endpoint].items()},
+                "throughput_rps": round(len(latencies) / wall_seconds, 2),
+                "latency_ms": {
+                    "mean": round(sum(latencies) / len(latencies), 2),
+                    "p50": round(percentile(latencies, 50), 2),
+                    "p95": round(percentile(latencies, 95), 2),
+                    "p99": round(percentile(latencies, 99), 2),
+                    "max": round(latencies[-1], 2),
+                },
+                "queries_per_request": {
+                    "mean": round(sum(queries) / len(queries), 2),
+                    "p95": percentile(queries, 95),
+                    "max": queries[-1],
+                } if queries else None,
+            }
+        total = sum(len(v) for v in self.samples.values())
+        return {
+            "total_requests": total,
+            "total_errors": sum(self.errors.values()),
+            "throughput_rps": round(total / wall_seconds, 2),
+            "endpoints": endpoints,
+        }
+
+
+class Client:
+    """
+    Sesión HTTP de un usuario de benchmark con su contexto (cámaras, zonas, alertas).
+    """
+
+    def __init__(self, base_url, recorder, email, password):
+        self.base_url = base_url.rstrip("/")
+        self.recorder = recorder
+        self.email = email
+        self.password = password
+        self.session = requests.Session()
+        self.camera_ids = []
+        self.zone_ids = []
+        self.alert_ids = []
+        self.created_alert_ids = []
+
+    def call(self, endpoint, method, path, record=True, **kwargs):
+        started = time.perf_counter()
+        response = self.session.request(method, f"{self.base_url}{path}", **kwargs)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if record:
+            self.recorder.record(endpoint, response, elapsed_ms)
+        return response
+
+    def login(self, record=True):
+        response = self.call("POST /login", "POST", "/login", record=record,
+                             json={"email": self.email, "password": self.password})
+        response.raise_for_status()
+        self.session.headers["Authorization"] = f"Bearer {response.json()['token']}"
+
+    def discover(self, days):
+        self.camera_ids = [c["id"] for c in self.call("", "GET", "/cameras", record=False).json()]
+        self.zone_ids = [z["id"] for z in self.call("", "GET", "/zones", record=False).json()]
+        for offset in range(days):
+            day = (date.today() - timedelta(days=offset)).isoformat()
+            alerts = self.call("", "GET", f"/stats/daily-alerts/{day}", record=False).json()
+            self.alert_ids.extend(a["id"] for a in alerts[:50])
+            if len(self.alert_ids) >= 200:
+                break
+
+
+class Scenario:
+    def __init__(self, args, video_path):
+        self.args = args
+        self.video_path = video_path
+        with open(video_path, "rb") as file:
+            self.video_bytes = file.read()
+
+    def _date_range(self, rng):
+        end = date.today() - timedelta(days=rng.randint(0, 30))
+        start = end - timedelta(days=rng.choice([1, 7, 30, 90]))
+        return {"start_date": start.isoformat(), "end_date": end.isoformat()}
+
+    def run(self, name, client, rng):
+        getattr(self, name)(client, rng)
+
+    def create_alert(self, client, rng):
+        if not client.zone_ids:
+            return
+        response = client.call(
+            "POST /alerts", "POST", "/alerts",
+            data={"zone_id": str(rng.choice(client.zone_ids))},
+            files={"video": ("clip.mp4", self.video_bytes, "video/mp4")},
+        )
+        if response.status_code == 201:
+            client.created_alert_ids.append(response.json()["id"])
+
+    def get_alerts(self, client, rng):
+        client.call("GET /alerts", "GET", "/alerts")
+
+    def get_alert(self, client, rng):
+        if client.alert_ids:
+            client.call("GET /alerts/<id>", "GET", f"/alerts/{rng.choice(client.alert_ids)}")
+
+    def delete_alert(self, client, rng):
+        if client.created_alert_ids:
+            alert_id = client.created_alert_ids.pop()
+            client.call("DELETE /alerts/<id>", "DELETE", f"/alerts/{alert_id}")
+
+    def get_cameras(self, client, rng):
+        client.call("GET /cameras", "GET", "/cameras")
+
+    def get_camera(self, client, rng):
+        if client.camera_ids:
+            client.call("GET /cameras/<id>", "GET", f"/cameras/{rng.choice(client.camera_ids)}")
+
+    def camera_crud(self, client, rng):
+        body = {"camera_name": "bench-tmp", "ip_address": "10.9.9.9", "username": "admin",
+                "password": "secret", "rtsp_url": "rtsp://10.9.9.9:554/stream", "location": "bench"}
+        response = client.call("POST /cameras", "POST", "/cameras", json=body)
+        if response.status_code != 201:
+            return
+        camera_id = response.json()["id"]
+        client.call("PUT /cameras/<id>", "PUT", f"/cameras/{camera_id}", json={"location": "bench-updated"})
+        client.call("DELETE /cameras/<id>", "DELETE", f"/cameras/{camera_id}")
+
+    def get_zones(self, client, rng):
+        client.call("GET /zones", "GET", "/zones")
+
+    def get_zone(self, client, rng):
+        if client.zone_ids:
+            client.call("GET /zones/<id>", "GET", f"/zones/{rng.choice(client.zone_ids)}")
+
+    def get_camera_zones(self, client, rng):
+        if client.camera_ids:
+            client.call("GET /camera/zones/<camera_id>", "GET", f"/camera/zones/{rng.choice(client.camera_ids)}")
+
+    def zone_crud(self, client, rng):
+        if not client.camera_ids:
+            return
+        body = {"zones": [{"id": rng.choice(client.camera_ids), "coords": random_polygon(rng), "type": "warning",
+                           "alertThreshold": 3, "scheduleStart": "00:00", "scheduleEnd": "23:59",
+                           "alertTelegram": "1", "alertEmail": "bench@bench.guardvision.local"}]}
+        response = client.call("POST /zones", "POST", "/zones", json=body)
+        if response.status_code != 201:
+            return
+        zone_id = response.json()[0]["id"]
+        client.call("PUT /zones/<id>", "PUT", f"/zones/{zone_id}", json={"coords": random_polygon(rng)})
+        client.call("DELETE /zones/<id>", "DELETE", f"/zones/{zone_id}")
+
+    def daily_count(self, client, rng):
+        client.call("GET /stats/daily-count", "GET", "/stats/daily-count", params=self._date_range(rng))
+
+    def daily_alerts(self, client, rng):
+        day = (date.today() - timedelta(days=rng.randint(0, 30))).isoformat()
+        client.call("GET /stats/daily-alerts/<date>", "GET", f"/stats/daily-alerts/{day}")
+
+    def person_count(self, client, rng):
+        client.call("GET /stats/person-count", "GET", "/stats/person-count", params=self._date_range(rng))
+
+    def alerts_by_zone(self, client, rng):
+        client.call("GET /stats/alerts-by-zone", "GET", "/stats/alerts-by-zone", params=self._date_range(rng))
+
+    def hourly_distribution(self, client, rng):
+        client.call("GET /stats/hourly-distribution", "GET", "/stats/hourly-distribution", params=self._date_range(rng))
+
+    def current_user(self, client, rng):
+        client.call("GET /current_user", "GET", "/current_user")
+
+    def account_lifecycle(self, client, rng):
+        # Usuario efímero: registro, login, cambio de contraseña y borrado de cuenta
+        email = f"tmp-{uuid.uuid4().hex[:12]}@bench.guardvision.local"
+        temp = Client(client.base_url, client.recorder, email, "tmp-password")
+        temp.call("POST /register", "POST", "/register",
+                  json={"name": "Tmp", "lastname": uuid.uuid4().hex[:12], "email": email, "password": "tmp-password"})
+        temp.login()
+        temp.call("POST /change_password", "POST", "/change_password",
+                  json={"old_password": "tmp-password", "new_password": "tmp-password-2"})
+        temp.call("DELETE /delete_account", "DELETE", "/delete_account")
+
+
+def fetch_stats(url):
+    if not url:
+        return None
+    try:
+        return requests.get(f"{url.rstrip('/')}/_stats", timeout=5).json()
+    except requests.RequestException:
+        return None
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(result, baseline, max_regression):
+    regressions = []
+    for endpoint, current in result["endpoints"].items():
+        previous = baseline.get("endpoints", {}).get(endpoint)
+        if not previous:
+            continue
+        if current["latency_ms"]["p95"] > previous["latency_ms"]["p95"] * (1 + max_regression):
+            regressions.append(f"{endpoint}: p95 {previous['latency_ms']['p95']} -> {current['latency_ms']['p95']} ms")
+        prev_q, cur_q = previous.get("queries_per_request"), current.get("queries_per_request")
+        if prev_q and cur_q and cur_q["mean"] > prev_q["mean"]:
+            regressions.append(f"{endpoint}: consultas {prev_q['mean']} -> {cur_q['mean']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de la API de GuardVision")
+    parser.add_argument("--base-url", default="http://127.0.0.1:5020")
+    parser.add_argument("--users", type=int, default=50, help="Usuarios de seed.py a usar")
+    parser.add_argument("--password", default="bench-password")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=60, help="Segundos de medición")
+    parser.add_argument("--warmup", type=float, default=5, help="Segundos de calentamiento (no se miden)")
+    parser.add_argument("--mix", help="JSON con pesos por operación; reemplaza los de DEFAULT_MIX indicados")
+    parser.add_argument("--video", help="Archivo MP4 a subir; por defecto se genera uno")
+    parser.add_argument("--video-size-kb", type=int, default=512)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--blob-url", help="URL del fake Blob (para incluir sus contadores)")
+    parser.add_argument("--telegram-url", help="URL del fake Telegram (para incluir sus contadores)")
+    parser.add_argument("--output", default=os.path.join(os.path.dirname(__file__), "results", "latest.json"))
+    parser.add_argument("--baseline", help="JSON de una corrida anterior para comparar")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Empeoramiento máximo permitido del p95")
+    args = parser.parse_args()
+
+    mix = dict(DEFAULT_MIX)
+    if args.mix:
+        mix.update(json.loads(args.mix))
+    operations = [name for name, weight in mix.items() if weight > 0]
+    weights = [mix[name] for name in operations]
+
+    video_path = args.video or make_video(os.path.join(tempfile.gettempdir(), "guardvision-bench.mp4"), args.video_size_kb)
+    scenario = Scenario(args, video_path)
+
+    recorder = Recorder()
+    clients = []
+    for i in range(args.users):
+        client = Client(args.base_url, recorder, bench_email(i), args.password)
+        client.login(record=False)
+        client.discover(days=30)
+        clients.append(client)
+    print(f"{len(clients)} usuarios listos; video de {os.path.getsize(video_path) // 1024} KB")
+
+    client_cycle = itertools.cycle(clients)
+    cycle_lock = threading.Lock()
+    measure_from = time.monotonic() + args.warmup
+    stop_at = measure_from + args.duration
+    recorder.measure_from = measure_from
+
+    def worker(worker_id):
+        rng = random.Random(args.seed * 1000 + worker_id)
+        while time.monotonic() < stop_at:
+            with cycle_lock:
+                client = next(client_cycle)
+            try:
+                scenario.run(rng.choices(operations, weights)[0], client, rng)
+            except requests.RequestException as e:
+                print(f"Error de red: {e}")
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = max(0.001, time.monotonic() - measure_from)
+
+    result = {
+        "meta": {
+            "started_at": datetime.now().isoformat(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "base_url": args.base_url,
+            "users": args.users,
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "video_bytes": os.path.getsize(video_path),
+            "mix": mix,
+        },
+        **recorder.summary(wall),
+        "fakes": {"blob": fetch_stats(args.blob_url), "telegram": fetch_stats(args.telegram_url)},
+    }
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as file:
+        json.dump(result, file, indent=2)
+
+    print(f"{'endpoint':36} {'req':>7} {'err':>5} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'q/req':>6}")
+    for endpoint, stats in result["endpoints"].items():
+        latency = stats["latency_ms"]
+        queries = stats["queries_per_request"]["mean"] if stats["queries_per_request"] else "-"
+        print(f"{endpoint:36} {stats['requests']:>7} {stats['errors']:>5} {stats['throughput_rps']:>8} "
+              f"{latency['p50']:>8} {latency['p95']:>8} {latency['p99']:>8} {queries:>6}")
+    print(f"Total: {result['total_requests']} solicitudes, {result['throughput_rps']} rps. Resultado en {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(result, json.load(file), args.max_regression)
+        if regressions:
+            print("Regresiones respecto al baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            raise SystemExit(1)
+        print("Sin regresiones respecto al baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Carga datos realistas en PostgreSQL para benchmarks.
+
+Crea usuarios, cámaras (credenciales y URL RTSP cifradas con FERNET_KEY, igual que la API),
+zonas y millones de alertas. Las alertas se generan del lado del servidor con generate_series
+en lotes, así que cargar varios millones toma segundos y no pasa filas por Python.
+
+Todos los usuarios usan el dominio bench.guardvision.local; --reset los borra (y en cascada
+sus cámaras, zonas y alertas) antes de cargar.
+
+Uso:
+    DATABASE_URL=postgresql://... FERNET_KEY=... python benchmarks/seed.py \
+        --users 50 --cameras-per-user 4 --zones-per-camera 3 --alerts 2000000 --reset
+"""
+import argparse
+import json
+import math
+import os
+import random
+import time
+
+import bcrypt
+import psycopg2
+from cryptography.fernet import Fernet
+
+BENCH_DOMAIN = "bench.guardvision.local"
+ZONE_TYPES = ["critical", "warning", "info"]
+
+
+def bench_email(index):
+    return f"bench{index}@{BENCH_DOMAIN}"
+
+
+def random_polygon(rng, width=1280, height=720):
+    cx, cy = rng.randint(100, width - 100), rng.randint(100, height - 100)
+    points = []
+    vertices = rng.randint(4, 8)
+    for i in range(vertices):
+        angle = 2 * math.pi * i / vertices
+        radius = rng.randint(40, 100)
+        points.append({
+            "x": max(0, min(width - 1, int(cx + radius * math.cos(angle)))),
+            "y": max(0, min(height - 1, int(cy + radius * math.sin(angle)))),
+        })
+    return points
+
+
+def reset(cursor):
+    cursor.execute("DELETE FROM users WHERE email LIKE %s", (f"%@{BENCH_DOMAIN}",))
+    print(f"Usuarios de benchmark eliminados: {cursor.rowcount}")
+
+
+def seed_users(cursor, args, rng, cipher):
+    password_hash = bcrypt.hashpw(args.password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+    user_ids = []
+    for i in range(args.users):
+        cursor.execute(
+            "INSERT INTO users (name, lastname, email, password) VALUES (%s, %s, %s, %s) RETURNING id",
+            (f"Bench{i}", f"User{i}", bench_email(i), password_hash),
+        )
+        user_ids.append(cursor.fetchone()[0])
+
+    encrypted_password = cipher.encrypt(b"camera-password").decode()
+    zone_count = 0
+    for user_id in user_ids:
+        for c in range(args.cameras_per_user):
+            rtsp = cipher.encrypt(f"rtsp://10.0.{user_id % 255}.{c}:554/stream".encode()).decode()
+            cursor.execute(
+                """
+                INSERT INTO cameras (user_id, camera_name, ip_address, username, password, rtsp_url, location)
+                VALUES (%s, %s, %s, %s, %s, %s, %s) RETURNING id
+                """,
+                (user_id, f"Cam {c}", f"10.0.{user_id % 255}.{c}", "admin", encrypted_password, rtsp, f"Sitio {c}"),
+            )
+            camera_id = cursor.fetchone()[0]
+            for z in range(args.zones_per_camera):
+                cursor.execute(
+                    """
+                    INSERT INTO zones (camera_id, coords, type, alert_threshold, schedule_start, schedule_end, alert_telegram, alert_email)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                    """,
+                    (camera_id, json.dumps(random_polygon(rng)), ZONE_TYPES[z % len(ZONE_TYPES)],
+                     rng.randint(1, 10), "00:00", "23:59", str(100000 + user_id), f"bench{user_id}@{BENCH_DOMAIN}"),
+                )
+                zone_count += 1
+    return user_ids, zone_count
+
+
+def seed_alerts(connection, cursor, args, user_ids):
+    cursor.execute("SELECT setseed(%s)", (args.seed % 1000 / 1000.0,))
+    remaining = args.alerts
+    started = time.perf_counter()
+    while remaining > 0:
+        batch = min(args.batch_size, remaining)
+        cursor.execute(
+            """
+            WITH z AS (
+                SELECT array_agg(zones.id ORDER BY zones.id) AS ids,
+                       array_agg(cameras.user_id ORDER BY zones.id) AS users
+                FROM zones JOIN cameras ON cameras.id = zones.camera_id
+                WHERE cameras.user_id = ANY(%(user_ids)s)
+            )
+            INSERT INTO alerts (zone_id, alert_time, video_url, person_count)
+            SELECT z.ids[r.i],
+                   r.ts,
+                   z.users[r.i] || '/' || to_char(r.ts, 'YYYY-MM-DD') || '/' || to_char(r.ts, 'YYYY-MM-DD_HH24-MI-SS') || '.mp4',
+                   1 + floor(random() * 4)::int
+            FROM z, generate_series(1, %(batch)s) AS g,
+                 LATERAL (
+                     SELECT 1 + floor(random() * cardinality(z.ids))::int AS i,
+                            now() - random() * make_interval(days => %(days)s) AS ts
+                     WHERE g > 0
+                 ) AS r
+            """,
+            {"user_ids": user_ids, "batch": batch, "days": args.days},
+        )
+        connection.commit()
+        remaining -= batch
+        done = args.alerts - remaining
+        print(f"Alertas insertadas: {done}/{args.alerts} ({done / (time.perf_counter() - started):.0f} filas/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Carga datos de benchmark en PostgreSQL")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--cameras-per-user", type=int, default=4)
+    parser.add_argument("--zones-per-camera", type=int, default=3)
+    parser.add_argument("--alerts", type=int, default=1_000_000)
+    parser.add_argument("--days", type=int, default=90, help="Ventana de tiempo en la que se reparten las alertas")
+    parser.add_argument("--batch-size", type=int, default=250_000)
+    parser.add_argument("--password", default="bench-password")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reset", action="store_true", help="Eliminar los datos de benchmark existentes antes de cargar")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    cipher = Fernet(os.environ["FERNET_KEY"])
+
+    connection = psycopg2.connect(args.database_url)
+    try:
+        with connection.cursor() as cursor:
+            if args.reset:
+                reset(cursor)
+                connection.commit()
+            user_ids, zone_count = seed_users(cursor, args, rng, cipher)
+            connection.commit()
+            print(f"Usuarios: {len(user_ids)}, cámaras: {len(user_ids) * args.cameras_per_user}, zonas: {zone_count}")
+            seed_alerts(connection, cursor, args, user_ids)
+            cursor.execute("ANALYZE alerts")
+            connection.commit()
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
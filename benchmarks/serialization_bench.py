@@ -0,0 +1,152 @@
+"""
+Micro-benchmark de la serialización de listas de alertas: el camino anterior (instancias
+del ORM, AlertsModel.to_json y jsonify) contra la proyección de columnas en tuplas
+(ALERT_JSON_COLUMNS) codificada con app.services.fast_json, con json de la biblioteca
+estándar, con orjson y transmitida por lotes como en GET /alerts.
+
+Por defecto crea una base SQLite temporal con --alerts alertas de un usuario; con
+--database-url mide contra una base ya cargada (por ejemplo con seed.py) y las alertas de
+--user-id. Todas las variantes firman las URLs con el backend local, así la diferencia es
+la lectura y la codificación. Antes de medir verifica que todas produzcan el mismo JSON.
+
+Uso:
+    python benchmarks/serialization_bench.py --alerts 50000 --repeat 5
+"""
+import argparse
+import datetime
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+
+os.environ.setdefault("STORAGE_BACKEND", "local")
+os.environ.setdefault("LOCAL_STORAGE_DIR", tempfile.mkdtemp(prefix="guardvision-bench-"))
+os.environ.setdefault("SECRET_KEY", "bench")
+if not os.getenv("FERNET_KEY"):
+    from cryptography.fernet import Fernet
+
+    os.environ["FERNET_KEY"] = Fernet.generate_key().decode()
+
+
+def seed(db, alerts):
+    from app.cameras.models.CamerasModel import AlertsModel, CamerasModel, ZonesModel
+    from app.login.models.UsersModel import UsersModel
+
+    db.create_all()
+    user = UsersModel(name="bench", lastname="serialization", email="serialization@bench.guardvision.local", password="x")
+    db.session.add(user)
+    db.session.flush()
+    camera = CamerasModel(user_id=user.id, camera_name="bench", ip_address="127.0.0.1", username="u", password="p")
+    db.session.add(camera)
+    db.session.flush()
+    zones = []
+    for index in range(4):
+        zone = ZonesModel(
+            camera_id=camera.id, coords=[{"x": 0, "y": 0}, {"x": 100, "y": 0}, {"x": 100, "y": 100}],
+            type="critical", alert_threshold=1, schedule_start=datetime.time(0, 0), schedule_end=datetime.time(23, 59)
+        )
+        db.session.add(zone)
+        zones.append(zone)
+    db.session.flush()
+
+    start = datetime.datetime(2025, 1, 1)
+    rows = []
+    for index in range(alerts):
+        when = start + datetime.timedelta(seconds=37 * index, microseconds=index % 1000)
+        blob = f"{user.id}/{when:%Y-%m-%d}/{when:%Y-%m-%d_%H-%M-%S}_{index:08x}"
+        rows.append({
+            "zone_id": zones[index % len(zones)].id, "alert_time": when, "video_url": f"{blob}.mp4",
+            "person_count": 1 + index % 3, "poster_blob": f"{blob}.poster.jpg" if index % 2 else None,
+            "preview_blob": f"{blob}.preview.webp" if index % 2 else None, "duration": 10.0, "fps": 15.0,
+            "width": 1280, "height": 720,
+        })
+    db.session.execute(AlertsModel.__table__.insert(), rows)
+    db.session.commit()
+    return user.id
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--alerts", type=int, default=50000, help="Alertas a generar en la base temporal.")
+    parser.add_argument("--database-url", default=None, help="Medir contra esta base en lugar de una temporal.")
+    parser.add_argument("--user-id", type=int, default=None, help="Usuario cuyas alertas se leen (con --database-url).")
+    parser.add_argument("--repeat", type=int, default=5, help="Repeticiones de cada variante (se informa la mediana).")
+    args = parser.parse_args()
+
+    from config import Config
+
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = database_url
+
+    from flask import jsonify
+    from sqlalchemy import select
+
+    from app import create_app, db
+    from app.cameras.models.CamerasModel import AlertsModel, CamerasModel, ZonesModel
+    from app.services import fast_json
+    from app.services.alert_serialization import ALERT_JSON_COLUMNS, alert_rows_to_json
+    from app.services.blob_storage import get_blob_sas_urls
+
+    app = create_app(BenchConfig)
+    with app.test_request_context():
+        user_id = args.user_id if args.database_url else seed(db, args.alerts)
+        camera_ids = [camera_id for (camera_id,) in db.session.query(CamerasModel.id).filter_by(user_id=user_id)]
+        statement = select(*ALERT_JSON_COLUMNS).join(ZonesModel).where(ZonesModel.camera_id.in_(camera_ids))
+        orjson = fast_json.orjson
+
+        def orm_to_json():
+            alerts = AlertsModel.query.join(ZonesModel).filter(ZonesModel.camera_id.in_(camera_ids)).all()
+            signed_urls = get_blob_sas_urls([name for alert in alerts for name in alert.blob_names()])
+            return jsonify([alert.to_json(signed_urls) for alert in alerts]).get_data()
+
+        def rows_stdlib():
+            fast_json.orjson = None
+            try:
+                return fast_json.dumps(alert_rows_to_json(db.session.execute(statement).all()))
+            finally:
+                fast_json.orjson = orjson
+
+        def rows_orjson():
+            return fast_json.dumps(alert_rows_to_json(db.session.execute(statement).all()))
+
+        def rows_streamed():
+            result = db.session.execute(statement.execution_options(yield_per=fast_json.JSON_STREAM_CHUNK_SIZE))
+            response = fast_json.stream_json_array(alert_rows_to_json(rows) for rows in result.partitions())
+            return b"".join(response.response)
+
+        variants = [("orm + to_json + jsonify", orm_to_json), ("filas + json stdlib", rows_stdlib)]
+        if orjson is not None:
+            variants += [("filas + orjson", rows_orjson), ("filas + orjson por lotes", rows_streamed)]
+        else:
+            print("orjson no está instalado: se omiten sus variantes")
+
+        # Todas las variantes deben devolver lo mismo (el orden de las claves puede cambiar)
+        expected = json.loads(orm_to_json())
+        for name, variant in variants[1:]:
+            if json.loads(variant()) != expected:
+                raise SystemExit(f"{name} no produce el mismo JSON que to_json")
+
+        count = len(expected)
+        print(f"{count} alertas, mediana de {args.repeat} repeticiones")
+        print(f"{'variante':<26} {'ms':>9} {'µs/alerta':>10} {'KB':>9} {'vs orm':>7}")
+        baseline = None
+        for name, variant in variants:
+            timings = []
+            for _ in range(args.repeat):
+                db.session.expunge_all()
+                began = time.perf_counter()
+                body = variant()
+                timings.append(time.perf_counter() - began)
+            elapsed = sorted(timings)[len(timings) // 2]
+            baseline = baseline or elapsed
+            print(f"{name:<26} {elapsed * 1000:>9.1f} {elapsed * 1e6 / max(1, count):>10.2f} "
+                  f"{len(body) / 1024:>9.0f} {baseline / elapsed:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
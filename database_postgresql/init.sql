@@ -33,6 +33,12 @@ CREATE TABLE zones (
     schedule_end TIME NOT NULL,
     alert_telegram VARCHAR(255),
     alert_email VARCHAR(255),
+    bbox_min_x DOUBLE PRECISION,
+    bbox_min_y DOUBLE PRECISION,
+    bbox_max_x DOUBLE PRECISION,
+    bbox_max_y DOUBLE PRECISION,
+    area DOUBLE PRECISION,
+    vertex_count INTEGER,
     FOREIGN KEY (camera_id) REFERENCES cameras(id) ON DELETE CASCADE
 );
 
@@ -40,10 +46,91 @@ CREATE TABLE alerts (
     id SERIAL PRIMARY KEY,
     zone_id INTEGER NOT NULL,
     alert_time TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP NOT NULL,
-    video_url VARCHAR(255) NOT NULL,
+    video_url VARCHAR(255) NOT NULL, -- nombre del blob; la SAS URL se genera al leer
     person_count INTEGER DEFAULT 1 NOT NULL,
+    -- Derivados generados por el media worker
+    poster_blob VARCHAR(255),
+    preview_blob VARCHAR(255),
+    duration REAL,
+    fps REAL,
+    width INTEGER,
+    height INTEGER,
+    content_hash CHAR(64), -- SHA-256 del clip (deduplicación de reintentos)
     CONSTRAINT fk_zone
         FOREIGN KEY (zone_id)
         REFERENCES zones(id)
         ON DELETE CASCADE
 );
+
+CREATE INDEX idx_alerts_alert_time ON alerts (alert_time);
+CREATE INDEX idx_alerts_zone_time ON alerts (zone_id, alert_time);
+CREATE INDEX idx_alerts_content_hash ON alerts (content_hash);
+CREATE INDEX idx_alerts_video_url ON alerts (video_url);
+
+-- Políticas de retención: por usuario (zone_id NULL) o por zona, la de zona tiene prioridad
+CREATE TABLE retention_policies (
+    id SERIAL PRIMARY KEY,
+    user_id INT NOT NULL,
+    zone_id INT,
+    retention_days INT NOT NULL CHECK (retention_days > 0),
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    FOREIGN KEY (zone_id) REFERENCES zones(id) ON DELETE CASCADE
+);
+
+CREATE UNIQUE INDEX uq_retention_policies_user ON retention_policies (user_id) WHERE zone_id IS NULL;
+CREATE UNIQUE INDEX uq_retention_policies_zone ON retention_policies (zone_id);
+
+-- Progreso de los trabajos de mantenimiento (retención, reconciliación, ...)
+CREATE TABLE job_checkpoints (
+    job VARCHAR(50) PRIMARY KEY,
+    cursor BIGINT NOT NULL DEFAULT 0,
+    state JSON NOT NULL DEFAULT '{}',
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Idempotency-Key de POST /alerts: los reintentos con la misma clave devuelven la alerta original
+CREATE TABLE idempotency_keys (
+    user_id INT NOT NULL,
+    key VARCHAR(255) NOT NULL,
+    alert_id INT, -- NULL mientras la solicitud original se procesa
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    PRIMARY KEY (user_id, key),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    FOREIGN KEY (alert_id) REFERENCES alerts(id) ON DELETE CASCADE
+);
+
+-- Subidas directas: el detector sube el clip con una URL firmada y confirma; la confirmación crea la alerta
+CREATE TABLE upload_sessions (
+    id VARCHAR(32) PRIMARY KEY,
+    user_id INT NOT NULL,
+    zone_id INT NOT NULL,
+    blob_name VARCHAR(255) NOT NULL,
+    status VARCHAR(20) DEFAULT 'pending' NOT NULL, -- pending | completed
+    alert_id INT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    expires_at TIMESTAMP NOT NULL,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    FOREIGN KEY (zone_id) REFERENCES zones(id) ON DELETE CASCADE,
+    FOREIGN KEY (alert_id) REFERENCES alerts(id) ON DELETE SET NULL
+);
+
+CREATE INDEX idx_upload_sessions_expires_at ON upload_sessions (expires_at);
+
+-- Subidas por partes para enlaces inestables: los bytes recibidos quedan en disco y se retoma desde upload_offset
+CREATE TABLE resumable_uploads (
+    id VARCHAR(32) PRIMARY KEY,
+    user_id INT NOT NULL,
+    zone_id INT NOT NULL,
+    upload_length BIGINT NOT NULL,
+    upload_offset BIGINT DEFAULT 0 NOT NULL,
+    status VARCHAR(20) DEFAULT 'pending' NOT NULL, -- pending | finalizing | completed
+    alert_id INT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    FOREIGN KEY (zone_id) REFERENCES zones(id) ON DELETE CASCADE,
+    FOREIGN KEY (alert_id) REFERENCES alerts(id) ON DELETE SET NULL
+);
+
+CREATE INDEX idx_resumable_uploads_updated_at ON resumable_uploads (updated_at);
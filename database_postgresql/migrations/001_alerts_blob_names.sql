@@ -0,0 +1,5 @@
+-- alerts.video_url pasa a guardar solo el nombre del blob (<user_id>/<YYYY-MM-DD>/<archivo>.mp4);
+-- la API firma SAS URL de corta duración al leer. Convierte las SAS URL guardadas previamente.
+UPDATE alerts
+SET video_url = regexp_replace(video_url, '^https?://[^/]+/[^/]+/([^?]+).*$', '\1')
+WHERE video_url LIKE 'http%';
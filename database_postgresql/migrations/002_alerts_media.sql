@@ -0,0 +1,8 @@
+-- Poster, preview animado y metadata de los clips de alertas (media worker)
+ALTER TABLE alerts
+    ADD COLUMN IF NOT EXISTS poster_blob VARCHAR(255),
+    ADD COLUMN IF NOT EXISTS preview_blob VARCHAR(255),
+    ADD COLUMN IF NOT EXISTS duration REAL,
+    ADD COLUMN IF NOT EXISTS fps REAL,
+    ADD COLUMN IF NOT EXISTS width INTEGER,
+    ADD COLUMN IF NOT EXISTS height INTEGER;
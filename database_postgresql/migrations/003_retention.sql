@@ -0,0 +1,22 @@
+-- Políticas de retención (por usuario o por zona) y checkpoints de trabajos de mantenimiento
+CREATE TABLE IF NOT EXISTS retention_policies (
+    id SERIAL PRIMARY KEY,
+    user_id INT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    zone_id INT REFERENCES zones(id) ON DELETE CASCADE,
+    retention_days INT NOT NULL CHECK (retention_days > 0),
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_retention_policies_user ON retention_policies (user_id) WHERE zone_id IS NULL;
+CREATE UNIQUE INDEX IF NOT EXISTS uq_retention_policies_zone ON retention_policies (zone_id);
+
+CREATE TABLE IF NOT EXISTS job_checkpoints (
+    job VARCHAR(50) PRIMARY KEY,
+    cursor BIGINT NOT NULL DEFAULT 0,
+    state JSON NOT NULL DEFAULT '{}',
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Recorridos de alertas por fecha y por zona
+CREATE INDEX IF NOT EXISTS idx_alerts_alert_time ON alerts (alert_time);
+CREATE INDEX IF NOT EXISTS idx_alerts_zone_time ON alerts (zone_id, alert_time);
@@ -0,0 +1,14 @@
+-- Deduplicación de clips por SHA-256 e Idempotency-Key en POST /alerts
+ALTER TABLE alerts ADD COLUMN IF NOT EXISTS content_hash CHAR(64);
+
+CREATE INDEX IF NOT EXISTS idx_alerts_content_hash ON alerts (content_hash);
+-- Antes de eliminar un blob se verifica que ninguna otra alerta lo use
+CREATE INDEX IF NOT EXISTS idx_alerts_video_url ON alerts (video_url);
+
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    user_id INT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    key VARCHAR(255) NOT NULL,
+    alert_id INT REFERENCES alerts(id) ON DELETE CASCADE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    PRIMARY KEY (user_id, key)
+);
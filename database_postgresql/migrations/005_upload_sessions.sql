@@ -0,0 +1,13 @@
+-- Subidas directas al almacenamiento (POST /alerts/uploads y /alerts/uploads/<id>/complete)
+CREATE TABLE IF NOT EXISTS upload_sessions (
+    id VARCHAR(32) PRIMARY KEY,
+    user_id INT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    zone_id INT NOT NULL REFERENCES zones(id) ON DELETE CASCADE,
+    blob_name VARCHAR(255) NOT NULL,
+    status VARCHAR(20) DEFAULT 'pending' NOT NULL,
+    alert_id INT REFERENCES alerts(id) ON DELETE SET NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    expires_at TIMESTAMP NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_upload_sessions_expires_at ON upload_sessions (expires_at);
@@ -0,0 +1,14 @@
+-- Subidas por partes (POST/HEAD/PATCH /alerts/resumable y /alerts/resumable/<id>/finalize)
+CREATE TABLE IF NOT EXISTS resumable_uploads (
+    id VARCHAR(32) PRIMARY KEY,
+    user_id INT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    zone_id INT NOT NULL REFERENCES zones(id) ON DELETE CASCADE,
+    upload_length BIGINT NOT NULL,
+    upload_offset BIGINT DEFAULT 0 NOT NULL,
+    status VARCHAR(20) DEFAULT 'pending' NOT NULL,
+    alert_id INT REFERENCES alerts(id) ON DELETE SET NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_resumable_uploads_updated_at ON resumable_uploads (updated_at);
@@ -0,0 +1,11 @@
+-- Columnas derivadas de coords que se calculan al guardar la zona (normalización de la
+-- geometría): caja envolvente, área en píxeles² y cantidad de vértices, en DOUBLE
+-- PRECISION para guardar sin redondeo los float que calcula shapely. Las zonas existentes
+-- se normalizan y completan con `flask --app app zones normalize`.
+ALTER TABLE zones
+    ADD COLUMN IF NOT EXISTS bbox_min_x DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS bbox_min_y DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS bbox_max_x DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS bbox_max_y DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS area DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS vertex_count INTEGER;